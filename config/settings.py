@@ -1,10 +1,28 @@
 import os
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _tier_numbers(name: str, default: str, minimum: int = 0) -> dict:
+    """Read an env var like 'pro:4,free:1' as {'pro': 4, 'free': 1}; blank items are skipped."""
+    value = os.getenv(name) or default
+    numbers = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        tier, _, number = (part.strip() for part in item.partition(':'))
+        if not tier or not number.isdigit() or int(number) < minimum:
+            raise ImproperlyConfigured(
+                f"{name}={value!r}: expected comma-separated tier:number pairs (numbers >= {minimum}), e.g. {default!r}"
+            )
+        numbers[tier] = int(number)
+    return numbers
+
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
@@ -93,30 +111,97 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Store user media (originals, results, profile images) once per distinct content, named by hash
+MEDIA_CONTENT_ADDRESSED = os.getenv('MEDIA_CONTENT_ADDRESSED', 'True') == 'True'
+# Link redesign and guest images through the access-checked /api/media/ views with signed,
+# expiring URLs instead of the public MEDIA_URL
+MEDIA_SIGNED_URLS = os.getenv('MEDIA_SIGNED_URLS', 'False') == 'True'
+MEDIA_SIGNED_URL_TTL = int(os.getenv('MEDIA_SIGNED_URL_TTL', '3600'))
+# How the media views hand off the bytes: 'nginx' (X-Accel-Redirect to MEDIA_ACCEL_PREFIX, an
+# `internal` location aliased to MEDIA_ROOT), 'sendfile' (X-Sendfile) or '' (Django streams them)
+MEDIA_ACCEL = os.getenv('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Shared cache for counters and metrics. Use a shared backend (e.g. Redis) when running
+# more than one process; the local-memory default is per process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Reverse proxies in front of the app that append to X-Forwarded-For. Client IPs (rate limits,
+    # guest quotas) come from REMOTE_ADDR when 0, else from that many hops back in the header.
+    # Never leave this unset: DRF would then trust whatever X-Forwarded-For the client sends.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 
 from rest_framework.settings import api_settings  # noqa: E402
 
 CORS_ALLOW_ALL_ORIGINS = True
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# e.g. django.core.mail.backends.locmem.EmailBackend for tests, or .filebased.EmailBackend
+# with EMAIL_FILE_PATH to write messages to files locally
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
 EMAIL_HOST = os.getenv('EMAIL_HOST', '')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '10'))
+
+# Per-endpoint brute-force limits (throttle_scope -> rate per client IP and per account email),
+# sliding windows counted in the cache; rates look like '10/15m' (s, m, h or d)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    'login': {
+        'ip': os.getenv('RATE_LIMIT_LOGIN_IP', '30/m'),
+        'account': os.getenv('RATE_LIMIT_LOGIN_ACCOUNT', '10/15m'),
+    },
+    'verify_otp': {
+        'ip': os.getenv('RATE_LIMIT_VERIFY_OTP_IP', '20/m'),
+        'account': os.getenv('RATE_LIMIT_VERIFY_OTP_ACCOUNT', '5/15m'),
+    },
+    'reset_password': {
+        'ip': os.getenv('RATE_LIMIT_RESET_PASSWORD_IP', '20/m'),
+        'account': os.getenv('RATE_LIMIT_RESET_PASSWORD_ACCOUNT', '5/15m'),
+    },
+    'forgot_password': {
+        'ip': os.getenv('RATE_LIMIT_FORGOT_PASSWORD_IP', '10/m'),
+        'account': os.getenv('RATE_LIMIT_FORGOT_PASSWORD_ACCOUNT', '3/h'),
+    },
+    'guest_generate': {
+        'ip': os.getenv('RATE_LIMIT_GUEST_GENERATE_IP', '10/m'),
+    },
+}
+
+# One-time codes: lifetime, and whether live codes are kept (hashed) in the cache instead of
+# the OTP table, so verification needs no SQL (needs a shared CACHE_BACKEND across processes)
+OTP_TTL = int(os.getenv('OTP_TTL', '300'))
+OTP_CACHE_ENABLED = os.getenv('OTP_CACHE_ENABLED', 'False') == 'True'
+
+# Outbound mail queue, drained by `manage.py run_mail_worker`
+MAIL_QUEUE_EAGER = os.getenv('MAIL_QUEUE_EAGER', 'False') == 'True'
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', '50'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '5'))
+# Seconds before the first retry; doubles with every failed attempt
+MAIL_RETRY_DELAY = int(os.getenv('MAIL_RETRY_DELAY', '30'))
+# How long a claimed message stays reserved if its worker dies before sending it
+MAIL_CLAIM_TIMEOUT = int(os.getenv('MAIL_CLAIM_TIMEOUT', '300'))
+MAIL_WORKER_POLL_INTERVAL = float(os.getenv('MAIL_WORKER_POLL_INTERVAL', '1.0'))
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -124,7 +209,128 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Authenticated users are looked up from a snapshot cached per process (LRU) and in the shared
+# cache instead of a User query per request (core.authentication)
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+AUTH_USER_LOCAL_TTL = int(os.getenv('AUTH_USER_LOCAL_TTL', '5'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '10000'))
+
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+# 'openai' calls the real Images API; 'stub' returns the input photo locally (development/tests).
+OPENAI_IMAGE_BACKEND = os.getenv('OPENAI_IMAGE_BACKEND', 'openai')
+OPENAI_STUB_DELAY = float(os.getenv('OPENAI_STUB_DELAY', '0'))
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+# Connection pool shared by the sync and async clients
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '50'))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '120'))
+# Timeouts (seconds): per attempt, TCP/TLS connect, and total budget including retries
+OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', '90'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+OPENAI_DEADLINE = float(os.getenv('OPENAI_DEADLINE', '150'))
+# Retries on 429/5xx/connection errors: jittered exponential backoff, Retry-After wins
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '3'))
+OPENAI_BACKOFF_BASE = float(os.getenv('OPENAI_BACKOFF_BASE', '1.0'))
+OPENAI_BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', '20'))
+# Circuit breaker around image generation: opens when either rate over the last
+# CIRCUIT_WINDOW calls reaches its threshold, then fails fast for CIRCUIT_OPEN_SECONDS.
+CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '5'))
+CIRCUIT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '60'))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', '0.5'))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+# Load shedding: concurrent generations allowed per process
+IMAGE_MAX_INFLIGHT = int(os.getenv('IMAGE_MAX_INFLIGHT', '16'))
+IMAGE_SHED_RETRY_AFTER = int(os.getenv('IMAGE_SHED_RETRY_AFTER', '5'))
+
+# Serve the redesign and guest-generate endpoints with native async views (run under ASGI,
+# e.g. `uvicorn config.asgi:application`). The sync DRF views are used otherwise.
+AI_ASYNC_VIEWS = os.getenv('AI_ASYNC_VIEWS', 'False') == 'True'
+
+# Redesign job queue
+REDESIGN_JOB_BACKEND = os.getenv('REDESIGN_JOB_BACKEND', 'core.services.redesign_jobs.DatabaseJobBackend')
+REDESIGN_JOBS_EAGER = os.getenv('REDESIGN_JOBS_EAGER', 'False') == 'True'
+REDESIGN_JOB_TIMEOUT = int(os.getenv('REDESIGN_JOB_TIMEOUT', '300'))
+REDESIGN_JOB_MAX_ATTEMPTS = int(os.getenv('REDESIGN_JOB_MAX_ATTEMPTS', '3'))
+REDESIGN_WORKER_CONCURRENCY = int(os.getenv('REDESIGN_WORKER_CONCURRENCY', '4'))
+REDESIGN_WORKER_POLL_INTERVAL = float(os.getenv('REDESIGN_WORKER_POLL_INTERVAL', '1.0'))
+# Queued jobs by plan: workers serve tiers in proportion to their weights (weighted fair
+# queuing), and each tier runs at most its limit of jobs at once across workers (0 = no limit)
+REDESIGN_TIER_WEIGHTS = _tier_numbers('REDESIGN_TIER_WEIGHTS', 'pro:4,free:1', minimum=1)
+REDESIGN_TIER_MAX_RUNNING = _tier_numbers('REDESIGN_TIER_MAX_RUNNING', 'pro:0,free:0')
+# Seconds between recounts of the queue per tier (shared by all workers through the cache;
+# 0 = every poll). Tier limits are always checked against a live count.
+REDESIGN_DEPTH_REFRESH_INTERVAL = int(os.getenv('REDESIGN_DEPTH_REFRESH_INTERVAL', '5'))
+# Max generations of one batch run at the same time when batches run inline (eager / async views)
+REDESIGN_BATCH_MAX_PARALLEL = int(os.getenv('REDESIGN_BATCH_MAX_PARALLEL', '3'))
+
+# Guest generation inputs/outputs are deleted this long after creation (purge_guest_artifacts)
+GUEST_ARTIFACT_TTL = int(os.getenv('GUEST_ARTIFACT_TTL', str(7 * 24 * 3600)))
+
+# Limits for uploaded room photos, enforced while the upload streams in
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', '50000000'))
+IMAGE_UPLOAD_MAX_DIMENSION = int(os.getenv('IMAGE_UPLOAD_MAX_DIMENSION', '12000'))
+
+# Input preprocessing before the OpenAI edit call (PNG or WEBP)
+IMAGE_PREPROCESS_SIZE = int(os.getenv('IMAGE_PREPROCESS_SIZE', '1024'))
+IMAGE_PREPROCESS_FORMAT = os.getenv('IMAGE_PREPROCESS_FORMAT', 'WEBP')
+IMAGE_PREPROCESS_QUALITY = int(os.getenv('IMAGE_PREPROCESS_QUALITY', '90'))
+
+# Thumbnail renditions (WebP) for originals, results and profile images
+IMAGE_RENDITION_SIZES = [int(s) for s in os.getenv('IMAGE_RENDITION_SIZES', '128,256,512').split(',')]
+IMAGE_RENDITION_QUALITY = int(os.getenv('IMAGE_RENDITION_QUALITY', '80'))
+IMAGE_RENDITION_CACHE_TTL = int(os.getenv('IMAGE_RENDITION_CACHE_TTL', str(24 * 3600)))
+
+# How long a user's subscription entitlement (is_pro) stays cached; saving the subscription
+# drops it sooner
+ENTITLEMENT_CACHE_TTL = int(os.getenv('ENTITLEMENT_CACHE_TTL', '3600'))
+
+# Generation quotas per tier, per UTC day and calendar month (0 = unlimited). Guests are
+# counted per IP and per device token; counters live in the (shared) Django cache
+QUOTA_ENABLED = os.getenv('QUOTA_ENABLED', 'True') == 'True'
+QUOTA_GUEST_DAILY = int(os.getenv('QUOTA_GUEST_DAILY', '3'))
+QUOTA_GUEST_MONTHLY = int(os.getenv('QUOTA_GUEST_MONTHLY', '10'))
+QUOTA_GUEST_IP_DAILY = int(os.getenv('QUOTA_GUEST_IP_DAILY', '20'))
+QUOTA_GUEST_IP_MONTHLY = int(os.getenv('QUOTA_GUEST_IP_MONTHLY', '100'))
+QUOTA_FREE_DAILY = int(os.getenv('QUOTA_FREE_DAILY', '5'))
+QUOTA_FREE_MONTHLY = int(os.getenv('QUOTA_FREE_MONTHLY', '30'))
+QUOTA_PRO_DAILY = int(os.getenv('QUOTA_PRO_DAILY', '100'))
+QUOTA_PRO_MONTHLY = int(os.getenv('QUOTA_PRO_MONTHLY', '1000'))
+
+# Stored result format (WEBP, AVIF or PNG; anything else fails at startup, and AVIF becomes WEBP
+# where Pillow cannot write it), plus an AVIF copy and the API's PNG as a master copy; clients
+# get the format their Accept header prefers
+RESULT_IMAGE_FORMAT = os.getenv('RESULT_IMAGE_FORMAT', 'WEBP').upper()
+RESULT_IMAGE_QUALITY = int(os.getenv('RESULT_IMAGE_QUALITY', '85'))
+RESULT_AVIF_ENABLED = os.getenv('RESULT_AVIF_ENABLED', 'True') == 'True'
+RESULT_AVIF_QUALITY = int(os.getenv('RESULT_AVIF_QUALITY', '60'))
+RESULT_KEEP_PNG_MASTER = os.getenv('RESULT_KEEP_PNG_MASTER', 'False') == 'True'
+
+# Job status events (SSE at /api/redesign-room/<id>/events/)
+JOB_EVENTS_TTL = int(os.getenv('JOB_EVENTS_TTL', '3600'))
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv('JOB_EVENTS_POLL_INTERVAL', '0.5'))
+JOB_EVENTS_HEARTBEAT = float(os.getenv('JOB_EVENTS_HEARTBEAT', '15'))
+JOB_EVENTS_STREAM_TIMEOUT = float(os.getenv('JOB_EVENTS_STREAM_TIMEOUT', '600'))
+
+# Idempotency-Key store (needs a shared CACHE_BACKEND when running several processes)
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', str(24 * 3600)))
+# How long a claimed key stays reserved if its request dies before recording anything
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '300'))
+# How long a retry waits for the in-flight original before answering 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '30'))
+# The same for the sync (WSGI) views, where waiting blocks a worker; 0 answers 409 right away
+IDEMPOTENCY_SYNC_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_SYNC_WAIT_TIMEOUT', '0'))
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv('IDEMPOTENCY_POLL_INTERVAL', '0.5'))
+
+# Result cache for identical (image, style) requests
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True') == 'True'
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '10000'))
+# Stores run the expiry and size sweep about once in this many (0 = only
+# `manage.py evict_result_cache`)
+RESULT_CACHE_EVICT_EVERY = int(os.getenv('RESULT_CACHE_EVICT_EVERY', '100'))
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Django Backend API',
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, OTP, RoomRedesign
+from .models import User, OTP, GuestGeneration, RedesignBatch, RoomRedesign, ResultCacheEntry, StoredBlob, OutboundEmail
 
 
 @admin.register(User)
@@ -33,6 +33,40 @@ class OTPAdmin(admin.ModelAdmin):
 
 @admin.register(RoomRedesign)
 class RoomRedesignAdmin(admin.ModelAdmin):
-    list_display = ('user', 'style_choice', 'status', 'created_at')
+    list_display = ('user', 'style_choice', 'status', 'attempts', 'batch', 'created_at', 'finished_at')
     list_filter = ('style_choice', 'status')
     search_fields = ('user__email',)
+
+
+@admin.register(RedesignBatch)
+class RedesignBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'created_at')
+    search_fields = ('user__email',)
+
+
+@admin.register(ResultCacheEntry)
+class ResultCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'style_choice', 'hits', 'created_at', 'last_used_at')
+    list_filter = ('style_choice',)
+    search_fields = ('key', 'result_path')
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'created_at')
+    search_fields = ('name',)
+
+
+@admin.register(GuestGeneration)
+class GuestGenerationAdmin(admin.ModelAdmin):
+    list_display = ('uid', 'style_choice', 'created_at', 'expires_at')
+    list_filter = ('style_choice',)
+    search_fields = ('uid',)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'created_at', 'next_attempt_at')
+    list_filter = ('status',)
+    search_fields = ('to',)
+    exclude = ('body',)
@@ -1,10 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from .views_ai import RedesignRoomView, HistoryView
+from .views_ai import RedesignRoomView, RedesignJobView, RedesignBatchView, RedesignBatchDetailView, HistoryView
 from .views_auth import GuestGenerateView, GuestHistoryView
+from .views_metrics import MetricsView
+from .views_media import GuestMediaView, RedesignMediaView
+from .views_async import AsyncRedesignRoomView, AsyncRedesignBatchView, AsyncGuestGenerateView, RedesignEventsView
+
+if settings.AI_ASYNC_VIEWS:
+    redesign_room_view = AsyncRedesignRoomView.as_view()
+    redesign_batch_view = AsyncRedesignBatchView.as_view()
+    guest_generate_view = AsyncGuestGenerateView.as_view()
+else:
+    redesign_room_view = RedesignRoomView.as_view()
+    redesign_batch_view = RedesignBatchView.as_view()
+    guest_generate_view = GuestGenerateView.as_view()
 
 urlpatterns = [
-    path('redesign-room/', RedesignRoomView.as_view(), name='redesign-room'),
+    path('redesign-room/', redesign_room_view, name='redesign-room'),
+    path('redesign-room/batch/', redesign_batch_view, name='redesign-batch'),
+    path('redesign-room/batch/<int:pk>/', RedesignBatchDetailView.as_view(), name='redesign-batch-detail'),
+    path('redesign-room/<int:pk>/', RedesignJobView.as_view(), name='redesign-job'),
+    path('redesign-room/<int:pk>/events/', RedesignEventsView.as_view(), name='redesign-events'),
     path('history/', HistoryView.as_view(), name='history'),
-    path('guest/generate/', GuestGenerateView.as_view(), name='guest generate'),
+    path('guest/generate/', guest_generate_view, name='guest generate'),
     path('guest/history/', GuestHistoryView.as_view(), name='guest history'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('media/redesign/<int:key>/<str:kind>/', RedesignMediaView.as_view(), name='redesign-media'),
+    path('media/redesign/<int:key>/<str:kind>/<int:size>/', RedesignMediaView.as_view(), name='redesign-media'),
+    path('media/guest/<str:key>/<str:kind>/', GuestMediaView.as_view(), name='guest-media'),
+    path('media/guest/<str:key>/<str:kind>/<int:size>/', GuestMediaView.as_view(), name='guest-media'),
 ]
@@ -1,6 +1,31 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_init, post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Imported for their settings checks, so misconfiguration fails at startup.
+        from .services import image_pipeline  # noqa: F401
+        from .services import result_encoding  # noqa: F401
+        from . import throttling  # noqa: F401
+        from .models import RedesignBatch, RoomRedesign, User
+        from .services import media
+        from .services.job_events import publish_on_save
+        from .authentication import forget_user
+        from .subscriptions import entitlements
+        from .subscriptions.models import UserSubscription
+        post_save.connect(publish_on_save, sender=RoomRedesign, dispatch_uid='core.redesign_events')
+        post_save.connect(entitlements.forget, sender=UserSubscription, dispatch_uid='core.entitlement')
+        post_delete.connect(entitlements.forget, sender=UserSubscription, dispatch_uid='core.entitlement')
+        for model in (User, UserSubscription):
+            uid = f"core.auth_user.{model.__name__}"
+            post_save.connect(forget_user, sender=model, dispatch_uid=uid)
+            post_delete.connect(forget_user, sender=model, dispatch_uid=uid)
+        for model in (User, RedesignBatch, RoomRedesign):
+            uid = f"core.media_refs.{model.__name__}"
+            post_init.connect(media.track_loaded_files, sender=model, dispatch_uid=uid)
+            post_save.connect(media.release_replaced_files, sender=model, dispatch_uid=uid)
+            post_delete.connect(media.release_deleted_files, sender=model, dispatch_uid=uid)
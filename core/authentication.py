@@ -0,0 +1,149 @@
+"""JWT authentication without a User query per request.
+
+simplejwt's JWTAuthentication loads the User row on every call. CachedJWTAuthentication looks
+up a compact snapshot (id, is_active, tier) instead: first in a small per-process LRU
+(AUTH_USER_LOCAL_TTL seconds), then in the shared cache (AUTH_USER_CACHE_TTL seconds), and only
+then in the database. request.user is a CachedUser: id, pk, is_active and tier come from the
+snapshot, and anything else loads the full row once, on first use, like Django's lazy
+request.user.
+
+Saving or deleting a User (password change, profile update, admin edit) and subscription
+changes drop the shared entry; other processes' local copies expire within the local TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import metrics
+from .subscriptions.entitlements import user_tier
+
+# Hit/miss counts are added to the shared counters every this many lookups per process.
+FLUSH_EVERY = 100
+
+
+def _key(user_id) -> str:
+    return f"auth-user:{user_id}"
+
+
+class CachedUser(SimpleLazyObject):
+    """request.user backed by a snapshot; other attributes load the User on first use."""
+
+    def __init__(self, snapshot: dict):
+        user_id = snapshot['id']
+        super().__init__(lambda: get_user_model().objects.get(pk=user_id))
+        self.__dict__['_snapshot'] = snapshot
+
+    def __bool__(self):
+        return True
+
+    id = pk = property(lambda self: self._snapshot['id'])
+    is_active = property(lambda self: self._snapshot['is_active'])
+    tier = property(lambda self: self._snapshot['tier'])
+    is_authenticated = True
+    is_anonymous = False
+
+
+class SnapshotCache:
+    """Per-process LRU in front of the shared cache."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def get(self, user_id) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+            else:
+                entry = None
+        if entry is not None:
+            self._count('local_hits')
+            return entry[0]
+        snapshot = cache.get(_key(user_id))
+        if snapshot is not None:
+            self._remember(user_id, snapshot)
+            self._count('shared_hits')
+        else:
+            self._count('misses')
+        return snapshot
+
+    def put(self, user_id, snapshot: dict):
+        cache.set(_key(user_id), snapshot, timeout=settings.AUTH_USER_CACHE_TTL)
+        self._remember(user_id, snapshot)
+
+    def forget(self, user_id):
+        cache.delete(_key(user_id))
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _remember(self, user_id, snapshot: dict):
+        with self._lock:
+            self._entries[user_id] = (snapshot, time.monotonic() + settings.AUTH_USER_LOCAL_TTL)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+            if sum(self._counts.values()) < FLUSH_EVERY:
+                return
+            counts, self._counts = self._counts, dict.fromkeys(self._counts, 0)
+        _flush(counts)
+
+
+def _flush(counts: dict):
+    for outcome, count in counts.items():
+        metrics.incr(f"auth.user_cache.{outcome}", count)
+    total = sum(metrics.get(f"auth.user_cache.{outcome}") for outcome in counts)
+    if total:
+        hits = metrics.get('auth.user_cache.local_hits') + metrics.get('auth.user_cache.shared_hits')
+        metrics.set_gauge('auth.user_cache.hit_rate', round(hits / total, 4))
+
+
+snapshots = SnapshotCache(settings.AUTH_USER_CACHE_SIZE)
+
+
+def load_snapshot(user_id) -> dict | None:
+    row = get_user_model().objects.filter(pk=user_id).values('id', 'is_active').first()
+    if row is None:
+        return None
+    snapshot = {**row, 'tier': user_tier(row['id'])}
+    snapshots.put(user_id, snapshot)
+    return snapshot
+
+
+def forget_user(sender, instance, **kwargs):
+    # post_save/post_delete receiver for User and UserSubscription (see CoreConfig.ready).
+    snapshots.forget(str(getattr(instance, 'user_id', instance.pk)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # Not every simplejwt release requirements.txt allows defines these; use their defaults.
+        if getattr(jwt_settings, 'CHECK_REVOKE_TOKEN', False):
+            # Needs the password hash, which the snapshot leaves out.
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+        # Tokens may carry the id as a string; key the caches on that form.
+        user_id = str(user_id)
+        snapshot = snapshots.get(user_id) or load_snapshot(user_id)
+        if snapshot is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if getattr(jwt_settings, 'CHECK_USER_IS_ACTIVE', True) and not snapshot['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return CachedUser(snapshot)
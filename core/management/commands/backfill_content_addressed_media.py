@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import ResultCacheEntry
+from core.services.media import cas_fields
+from core.services.renditions import delete_renditions
+
+
+class Command(BaseCommand):
+    help = ('Move media saved before content addressing into ContentAddressedStorage: each distinct '
+            'file is hashed and stored once, every row pointing at it is repointed, and the '
+            'reference counts are set to match.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be moved without changing anything.')
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Leave the old files in place after their rows are repointed.')
+
+    def handle(self, *args, **options):
+        fields = [(model, field) for model in apps.get_app_config('core').get_models() for field in cas_fields(model)]
+        if not fields:
+            raise CommandError('No media fields use ContentAddressedStorage (is MEDIA_CONTENT_ADDRESSED off?)')
+        dry_run = options['dry_run']
+        moved = {}
+        missing = 0
+        for model, field in fields:
+            storage = field.storage
+            rows = model.objects.exclude(**{field.name: ''}).exclude(**{f"{field.name}__isnull": True})
+            legacy = rows.exclude(**{f"{field.name}__startswith": storage.prefix + '/'})
+            for old in list(legacy.values_list(field.name, flat=True).distinct()):
+                refs = legacy.filter(**{field.name: old}).count()
+                if dry_run:
+                    self.stdout.write(f"{model.__name__}.{field.name}: {old} ({refs} rows)")
+                    continue
+                new = moved.get(old)
+                if new is None:
+                    if not storage.base.exists(old):
+                        self.stderr.write(f"Missing file, left as is: {old}")
+                        missing += 1
+                        continue
+                    with storage.base.open(old, 'rb') as f:
+                        new = storage.save(old, f)
+                    storage.retain(new, refs - 1)
+                    moved[old] = new
+                else:
+                    # Already moved for another field (e.g. a batch and its members).
+                    storage.retain(new, refs)
+                with transaction.atomic():
+                    legacy.filter(**{field.name: old}).update_without_refcounts(**{field.name: new})
+                    ResultCacheEntry.objects.filter(result_path=old).update(result_path=new)
+        if dry_run:
+            return
+        if not options['keep_old']:
+            base = fields[0][1].storage.base
+            for old in moved:
+                base.delete(old)
+                delete_renditions(old, base)
+        duplicates = len(moved) - len(set(moved.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(moved)} files ({duplicates} were duplicates), {missing} missing."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.services.result_cache import evict
+
+
+class Command(BaseCommand):
+    help = ('Drop expired result cache entries and the least recently used ones above '
+            'RESULT_CACHE_MAX_ENTRIES. Run it periodically (e.g. hourly from cron).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Evicted {evict()} result cache entries."))
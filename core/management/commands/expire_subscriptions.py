@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import metrics
+from core.subscriptions.models import UserSubscription
+
+
+class Command(BaseCommand):
+    help = ('Mark subscriptions past expires_at inactive in one bulk UPDATE. Run it periodically '
+            '(e.g. every few minutes from cron) so UserSubscription.active can be trusted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count expired subscriptions without changing them.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = UserSubscription.objects.filter(active=True, expires_at__lte=now)
+        if options['dry_run']:
+            self.stdout.write(f"Would expire {expired.count()} subscriptions.")
+            return
+        # Bypasses the post_save signal on purpose; cached entitlements already apply expires_at
+        # when read, so they need no invalidation here.
+        count = expired.update(active=False, updated_at=now)
+        metrics.incr('subscriptions.expired', count)
+        self.stdout.write(self.style.SUCCESS(f"Expired {count} subscriptions."))
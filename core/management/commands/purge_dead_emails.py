@@ -0,0 +1,40 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import metrics
+from core.models import OutboundEmail
+
+
+class Command(BaseCommand):
+    help = ("Delete outbound emails marked 'dead' more than --days ago, in batches. Run it "
+            'periodically (e.g. daily from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Keep dead emails this many days for inspection.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Emails deleted per query.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count what would be deleted without deleting it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        stale = OutboundEmail.objects.filter(status='dead', created_at__lte=cutoff)
+        deleted = 0
+        last_id = 0
+        while True:
+            # Walk by id so a dry run (which deletes nothing) still moves forward.
+            ids = list(stale.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            if not dry_run:
+                OutboundEmail.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+        if not dry_run:
+            metrics.incr('mail.purged', deleted)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} dead emails."))
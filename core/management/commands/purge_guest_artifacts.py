@@ -0,0 +1,71 @@
+import os
+import time
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import metrics
+from core.models import GuestGeneration
+from core.services.renditions import delete_renditions
+from core.services.result_encoding import delete_variants
+
+LEGACY_DIRS = (os.path.join('uploads', 'guest', 'inputs'), os.path.join('uploads', 'guest', 'outputs'))
+
+
+class Command(BaseCommand):
+    help = 'Delete expired guest generation files and their records, in batches. Run it periodically (e.g. hourly from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Records deleted per query.')
+        parser.add_argument('--include-untracked', action='store_true',
+                            help=('Also delete files older than GUEST_ARTIFACT_TTL left directly in '
+                                  'uploads/guest/inputs|outputs from before guest files were tracked.'))
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count what would be deleted without deleting it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        expired = GuestGeneration.objects.filter(expires_at__lte=timezone.now())
+        records = files = 0
+        last_id = 0
+        while True:
+            # Walk by id so a dry run (which deletes nothing) still moves forward.
+            batch = list(expired.filter(id__gt=last_id).order_by('id').values_list('id', 'input_path', 'output_path')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            for _, *paths in batch:
+                for path in filter(None, paths):
+                    if not dry_run:
+                        default_storage.delete(path)
+                        delete_renditions(path, default_storage)
+                        delete_variants(path, default_storage)
+                    files += 1
+            if not dry_run:
+                GuestGeneration.objects.filter(id__in=[row[0] for row in batch]).delete()
+            records += len(batch)
+        if options['include_untracked']:
+            files += self.purge_untracked(dry_run)
+        if not dry_run:
+            metrics.incr('guest_artifacts.purged', files)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {files} files from {records} expired guest generations."))
+
+    def purge_untracked(self, dry_run: bool) -> int:
+        cutoff = time.time() - settings.GUEST_ARTIFACT_TTL
+        deleted = 0
+        for directory in LEGACY_DIRS:
+            if not default_storage.exists(directory):
+                continue
+            # Only the files directly inside; tracked files live in the shard subdirectories.
+            _, names = default_storage.listdir(directory)
+            for name in names:
+                path = os.path.join(directory, name)
+                if default_storage.get_modified_time(path).timestamp() < cutoff:
+                    if not dry_run:
+                        default_storage.delete(path)
+                    deleted += 1
+        return deleted
@@ -0,0 +1,47 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import metrics
+from core.services.media import delete_derived
+from core.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = ('Delete content-addressed files that no StoredBlob row accounts for, left behind when the '
+            'transaction that saved them rolled back. Run it periodically (e.g. daily from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Only files older than this many seconds (newer ones may belong to an open transaction).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List what would be deleted without deleting it.')
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        dry_run = options['dry_run']
+        deleted = 0
+        for name in self._blob_names(storage):
+            if not storage.is_orphan(name) or storage.base.get_modified_time(name) > cutoff:
+                continue
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                storage.base.delete(name)
+                delete_derived(storage, name)
+            deleted += 1
+        if not dry_run:
+            metrics.incr('media.orphans_purged', deleted)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} orphaned files."))
+
+    def _blob_names(self, storage):
+        # cas/<aa>/<bb>/<digest>.<ext>
+        if not storage.base.exists(storage.prefix):
+            return
+        for first in storage.base.listdir(storage.prefix)[0]:
+            for second in storage.base.listdir(f"{storage.prefix}/{first}")[0]:
+                directory = f"{storage.prefix}/{first}/{second}"
+                for filename in storage.base.listdir(directory)[1]:
+                    yield f"{directory}/{filename}"
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core import metrics
+from core.models import OTP
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used one-time codes, in batches. Run it periodically (e.g. hourly from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Codes deleted per query.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count what would be deleted without deleting it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        stale = OTP.objects.filter(Q(expires_at__lte=timezone.now()) | Q(is_used=True))
+        deleted = 0
+        last_id = 0
+        while True:
+            # Walk by id so a dry run (which deletes nothing) still moves forward.
+            ids = list(stale.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            if not dry_run:
+                OTP.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+        if not dry_run:
+            metrics.incr('otp.purged', deleted)
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} expired or used codes."))
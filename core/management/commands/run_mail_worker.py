@@ -0,0 +1,34 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.mail_queue import work
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound emails, in batches over one mail server connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=settings.MAIL_WORKER_POLL_INTERVAL,
+                            help='Seconds to wait between polls when nothing is due.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once nothing is due instead of polling forever.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping mail worker after the current batch...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        thread = threading.Thread(target=work, args=(stop, options['poll_interval'], options['burst']), daemon=True)
+        thread.start()
+        self.stdout.write('Started mail worker')
+        # Join with a timeout so the main thread stays responsive to signals.
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+        self.stdout.write(self.style.SUCCESS('Mail worker stopped'))
@@ -0,0 +1,48 @@
+import os
+import signal
+import socket
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.redesign_jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of workers that process queued room redesign jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.REDESIGN_WORKER_CONCURRENCY,
+                            help='Number of concurrent worker threads.')
+        parser.add_argument('--poll-interval', type=float, default=settings.REDESIGN_WORKER_POLL_INTERVAL,
+                            help='Seconds to wait between polls when the queue is empty.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is drained instead of polling forever.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping workers after their current job...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=work,
+                args=(f"{prefix}:{i}", stop, options['poll_interval'], options['burst']),
+                daemon=True,
+            )
+            for i in range(options['workers'])
+        ]
+        for t in threads:
+            t.start()
+        self.stdout.write(f"Started {len(threads)} redesign workers")
+        # Join with a timeout so the main thread stays responsive to signals.
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=0.5)
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
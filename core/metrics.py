@@ -0,0 +1,55 @@
+from django.core.cache import cache
+
+PREFIX = 'metrics:'
+# Metric names are listed in numbered slots, so that processes registering new names at the same
+# time never overwrite each other: a name's marker is claimed with cache.add, and the slot
+# number comes from an atomic counter.
+COUNT_KEY = PREFIX + '_names:count'
+
+_registered = set()
+
+
+def _slot_key(index: int) -> str:
+    return f"{PREFIX}_names:{index}"
+
+
+def _register(name: str):
+    # Remember metric names in the shared cache so snapshot() can list them from any process.
+    if name in _registered:
+        return
+    if cache.add(f"{PREFIX}_name:{name}", True, timeout=None):
+        cache.add(COUNT_KEY, 0, timeout=None)
+        cache.set(_slot_key(cache.incr(COUNT_KEY)), name, timeout=None)
+    _registered.add(name)
+
+
+def names() -> list:
+    count = cache.get(COUNT_KEY, 0)
+    slots = cache.get_many([_slot_key(i) for i in range(1, count + 1)])
+    return sorted(set(slots.values()))
+
+
+def incr(name: str, value: int = 1):
+    """Atomically add value to a shared counter."""
+    key = PREFIX + name
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        if not cache.add(key, value, timeout=None):
+            cache.incr(key, value)
+    _register(name)
+
+
+def set_gauge(name: str, value):
+    cache.set(PREFIX + name, value, timeout=None)
+    _register(name)
+
+
+def get(name: str, default=0):
+    return cache.get(PREFIX + name, default)
+
+
+def snapshot() -> dict:
+    metric_names = names()
+    values = cache.get_many([PREFIX + n for n in metric_names])
+    return {n: values.get(PREFIX + n, 0) for n in metric_names}
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomredesign',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='worker_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='roomredesign',
+            name='status',
+            field=models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('completed', 'completed'), ('failed', 'failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='roomredesign',
+            index=models.Index(fields=['status', 'created_at'], name='redesign_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_roomredesign_job_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('style_choice', models.CharField(max_length=32)),
+                ('result_path', models.CharField(max_length=255)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:29
+
+import base64
+from django.core.files.base import ContentFile
+from django.db import migrations
+
+
+def move_result_base64_to_files(apps, schema_editor):
+    RoomRedesign = apps.get_model('core', 'RoomRedesign')
+    pending = RoomRedesign.objects.exclude(result_base64='')
+    # Fetch ids first so each multi-megabyte column is read one row at a time.
+    for pk in list(pending.values_list('pk', flat=True)):
+        redesign = RoomRedesign.objects.only('id', 'result_image', 'result_base64').get(pk=pk)
+        if not redesign.result_image:
+            decoded = base64.b64decode(redesign.result_base64)
+            redesign.result_image.save(f"redesign_{redesign.id}.png", ContentFile(decoded), save=False)
+        redesign.result_base64 = ''
+        redesign.save(update_fields=['result_image', 'result_base64'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_resultcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_result_base64_to_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_move_result_base64_to_files'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='roomredesign',
+            name='result_base64',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_remove_roomredesign_result_base64'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='roomredesign',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='redesign_user_created_idx'),
+        ),
+    ]
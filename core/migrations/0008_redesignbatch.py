@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_roomredesign_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedesignBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_image', models.ImageField(upload_to='uploads/originals/')),
+                ('prepared_image', models.FileField(blank=True, null=True, upload_to='uploads/prepared/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redesign_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.redesignbatch'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:45
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_redesignbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='redesignbatch',
+            name='original_image',
+            field=models.ImageField(storage=core.storage.media_storage, upload_to='uploads/originals/'),
+        ),
+        migrations.AlterField(
+            model_name='redesignbatch',
+            name='prepared_image',
+            field=models.FileField(blank=True, null=True, storage=core.storage.media_storage, upload_to='uploads/prepared/'),
+        ),
+        migrations.AlterField(
+            model_name='roomredesign',
+            name='original_image',
+            field=models.ImageField(storage=core.storage.media_storage, upload_to='uploads/originals/'),
+        ),
+        migrations.AlterField(
+            model_name='roomredesign',
+            name='result_image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.media_storage, upload_to='uploads/results/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.media_storage, upload_to='uploads/profiles/'),
+        ),
+    ]
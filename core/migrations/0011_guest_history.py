@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_guestgeneration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guestgeneration',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='guestgeneration',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='guest_generations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='guestgeneration',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='guestgeneration',
+            index=models.Index(fields=['device_id', 'created_at', 'id'], name='guest_device_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guestgeneration',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='guest_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_guest_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guestgeneration',
+            name='output_formats',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='roomredesign',
+            name='result_formats',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_result_formats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomredesign',
+            name='tier',
+            field=models.CharField(choices=[('free', 'free'), ('pro', 'pro')], default='free', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='roomredesign',
+            index=models.Index(fields=['status', 'tier', 'created_at'], name='redesign_status_tier_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+def redact_dead_emails(apps, schema_editor):
+    # Dead rows used to keep their text, one-time codes included.
+    OutboundEmail = apps.get_model('core', 'OutboundEmail')
+    OutboundEmail.objects.filter(status='dead').exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_otp_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(redact_dead_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_outbound_email_expiry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resultcacheentry',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -2,8 +2,11 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
 
+from .services.media import MediaQuerySet
+from .storage import media_storage
 
-class UserManager(BaseUserManager):
+
+class UserManager(BaseUserManager.from_queryset(MediaQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('Users must have an email address')
@@ -28,7 +31,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=150, blank=True)
     last_name = models.CharField(max_length=150, blank=True)
-    profile_image = models.ImageField(upload_to='uploads/profiles/', blank=True, null=True)
+    profile_image = models.ImageField(upload_to='uploads/profiles/', storage=media_storage, blank=True, null=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -54,6 +57,13 @@ class OTP(models.Model):
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Verification: a user's latest unused code with a given value and purpose.
+            models.Index(fields=['user', 'code', 'purpose', 'is_used', 'created_at'], name='otp_lookup_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
+
     def is_valid(self):
         return (not self.is_used) and timezone.now() <= self.expires_at
 
@@ -61,6 +71,20 @@ class OTP(models.Model):
         return f"OTP({self.user.email}, {self.purpose})"
 
 
+class RedesignBatch(models.Model):
+    """One uploaded photo redesigned in several styles; the members are RoomRedesign rows."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='redesign_batches')
+    original_image = models.ImageField(upload_to='uploads/originals/', storage=media_storage)
+    # The preprocessed source, computed once and sent to the backend by every member.
+    prepared_image = models.FileField(upload_to='uploads/prepared/', storage=media_storage, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = MediaQuerySet.as_manager()
+
+    def __str__(self):
+        return f"RedesignBatch({self.user.email}, {self.created_at:%Y-%m-%d})"
+
+
 class RoomRedesign(models.Model):
     STYLE_CHOICES = [
         ('modern', 'modern'),
@@ -69,14 +93,126 @@ class RoomRedesign(models.Model):
         ('industrial', 'industrial'),
         ('scandinavian', 'scandinavian'),
     ]
+    STATUS_CHOICES = [
+        ('pending', 'pending'),
+        ('processing', 'processing'),
+        ('completed', 'completed'),
+        ('failed', 'failed'),
+    ]
+    TIER_CHOICES = [
+        ('free', 'free'),
+        ('pro', 'pro'),
+    ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='redesigns')
-    original_image = models.ImageField(upload_to='uploads/originals/')
+    batch = models.ForeignKey(RedesignBatch, on_delete=models.CASCADE, related_name='items', null=True, blank=True)
+    original_image = models.ImageField(upload_to='uploads/originals/', storage=media_storage)
     style_choice = models.CharField(max_length=32, choices=STYLE_CHOICES)
     prompt = models.TextField(blank=True)
-    result_image = models.ImageField(upload_to='uploads/results/', blank=True, null=True)
-    result_base64 = models.TextField(blank=True)
-    status = models.CharField(max_length=20, default='pending')
+    result_image = models.ImageField(upload_to='uploads/results/', storage=media_storage, blank=True, null=True)
+    # Formats stored for the result, primary first (e.g. 'webp,avif'); see services.result_encoding.
+    result_formats = models.CharField(max_length=32, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # The owner's plan when the job was queued; workers schedule by it (see services.job_scheduler).
+    tier = models.CharField(max_length=16, choices=TIER_CHOICES, default='free')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker_id = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = MediaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest pending job; keep that lookup off a table scan.
+            models.Index(fields=['status', 'created_at'], name='redesign_status_created_idx'),
+            # Claiming the oldest pending job of the tier the scheduler picked.
+            models.Index(fields=['status', 'tier', 'created_at'], name='redesign_status_tier_idx'),
+            # Backs the keyset-paginated history: WHERE user_id = ? ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['user', 'created_at', 'id'], name='redesign_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Redesign({self.user.email}, {self.style_choice}, {self.created_at:%Y-%m-%d})"
+
+
+class GuestGeneration(models.Model):
+    """Files written by a guest generation, kept until expires_at (see purge_guest_artifacts).
+    Rows are listed per device as the guest history; verifying an account moves them to the user,
+    which also clears expires_at.
+    """
+    uid = models.CharField(max_length=32, unique=True)
+    device_id = models.CharField(max_length=64, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='guest_generations', null=True, blank=True)
+    style_choice = models.CharField(max_length=32)
+    input_path = models.CharField(max_length=255)
+    output_path = models.CharField(max_length=255, blank=True)
+    output_formats = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset-paginated guest history: WHERE device_id = ? ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['device_id', 'created_at', 'id'], name='guest_device_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='guest_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"GuestGeneration({self.uid}, {self.style_choice})"
+
+
+class StoredBlob(models.Model):
+    """A file in ContentAddressedStorage and the number of media fields referencing it."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"StoredBlob({self.name}, refs={self.refcount})"
+
+
+class ResultCacheEntry(models.Model):
+    """Maps a digest of (normalized input image, style, prompt template) to a generated result file."""
+    key = models.CharField(max_length=64, unique=True)
+    style_choice = models.CharField(max_length=32)
+    result_path = models.CharField(max_length=255)
+    hits = models.PositiveIntegerField(default=0)
+    # Indexed for the TTL sweep in result_cache.evict.
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"ResultCacheEntry({self.style_choice}, {self.key[:12]})"
+
+
+class OutboundEmail(models.Model):
+    """An email waiting to be sent by run_mail_worker. Sent rows are deleted; rows that used up
+    their attempts or outlived expires_at stay behind as 'dead', with the body blanked (it may
+    hold a one-time code), until purge_dead_emails deletes them.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'pending'),
+        ('dead', 'dead'),
+    ]
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a worker may (re)try it; claiming pushes it out by MAIL_CLAIM_TIMEOUT.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Not worth sending after this (e.g. an OTP past OTP_TTL); null = no deadline.
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"OutboundEmail({self.to}, {self.subject}, {self.status})"
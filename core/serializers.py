@@ -1,7 +1,11 @@
+import base64
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from rest_framework import serializers
-from .models import User, OTP, RoomRedesign
+from drf_spectacular.utils import extend_schema_field
+from .models import User, OTP, GuestGeneration, RedesignBatch, RoomRedesign
+from .services.media_delivery import guest_file_url, guest_rendition_urls, redesign_file_url, redesign_rendition_urls
+from .services.renditions import ensure_renditions, rendition_urls
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -57,18 +61,146 @@ class RoomRedesignRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RoomRedesignResponseSerializer(serializers.ModelSerializer):
+class StyleListField(serializers.ListField):
+    """List of styles; also accepts a single comma-separated value (e.g. from a form field)."""
+    child = serializers.ChoiceField(choices=RoomRedesign.STYLE_CHOICES)
+
+    def get_value(self, dictionary):
+        value = super().get_value(dictionary)
+        if isinstance(value, list) and len(value) == 1 and ',' in value[0]:
+            value = value[0].split(',')
+        return value
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = data.split(',')
+        styles = super().to_internal_value([s.strip() for s in data])
+        # Keep the first occurrence of each style, in request order.
+        return list(dict.fromkeys(styles))
+
+
+class RedesignBatchRequestSerializer(serializers.Serializer):
+    original_image = serializers.ImageField()
+    styles = StyleListField(min_length=1, max_length=len(RoomRedesign.STYLE_CHOICES))
+
+
+def redesign_response_context(request) -> dict:
+    # Results are returned as URLs; clients opt into inline bytes with ?include_base64=true
+    # and can trim the payload with ?fields=id,status,...
+    params = getattr(request, 'query_params', request.GET)  # DRF or plain Django request
+    include_base64 = params.get('include_base64', '').lower() in ('1', 'true')
+    fields = [f.strip() for f in params.get('fields', '').split(',') if f.strip()]
+    return {'request': request, 'include_base64': include_base64, 'fields': fields}
+
+
+class FieldSelectionMixin:
+    """Drops every field not listed in context['fields'] (when given)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class RoomRedesignResponseSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    result_image = serializers.SerializerMethodField()
+    result_base64 = serializers.SerializerMethodField()
+    result_renditions = serializers.SerializerMethodField()
+    original_renditions = serializers.SerializerMethodField()
+
+    # Model columns each output field reads; used to build .only() projections.
+    FIELD_COLUMNS = {
+        'result_image': ('result_image', 'result_formats'),
+        'result_base64': 'result_image',
+        'result_renditions': 'result_image',
+        'original_renditions': 'original_image',
+    }
+
     class Meta:
         model = RoomRedesign
-        fields = ('id', 'style_choice', 'result_image', 'result_base64', 'status', 'created_at')
+        fields = (
+            'id', 'style_choice', 'result_image', 'result_base64', 'result_renditions',
+            'original_renditions', 'status', 'error', 'batch', 'created_at',
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_base64'):
+            self.fields.pop('result_base64', None)
+
+    @classmethod
+    def columns_for(cls, field_names) -> set:
+        columns = set()
+        for name in field_names:
+            column = cls.FIELD_COLUMNS.get(name, name)
+            columns.update((column,) if isinstance(column, str) else column)
+        return columns
+
+    def get_result_image(self, obj) -> str | None:
+        return redesign_file_url(obj, 'result', self.context.get('request'))
+
+    def get_result_base64(self, obj) -> str | None:
+        if not obj.result_image:
+            return None
+        with obj.result_image.open('rb') as f:
+            return base64.b64encode(f.read()).decode()
+
+    def get_result_renditions(self, obj) -> dict:
+        return redesign_rendition_urls(obj, 'result', self.context.get('request'))
+
+    def get_original_renditions(self, obj) -> dict:
+        return redesign_rendition_urls(obj, 'original', self.context.get('request'))
+
+
+class RedesignBatchResponseSerializer(serializers.ModelSerializer):
+    items = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RedesignBatch
+        fields = ('id', 'created_at', 'items')
+
+    @extend_schema_field(RoomRedesignResponseSerializer(many=True))
+    def get_items(self, obj):
+        items = self.context.get('items')
+        if items is None:
+            items = obj.items.order_by('id')
+        return RoomRedesignResponseSerializer(items, many=True, context=self.context).data
+
+
+class GuestGenerationSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(source='uid')
+    style = serializers.CharField(source='style_choice')
+    input_image_url = serializers.SerializerMethodField()
+    output_image_url = serializers.SerializerMethodField()
+    output_renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GuestGeneration
+        fields = ('id', 'style', 'input_image_url', 'output_image_url', 'output_renditions', 'created_at')
+
+    def get_input_image_url(self, obj) -> str | None:
+        return guest_file_url(obj.uid, 'input', obj.input_path, self.context.get('request'))
+
+    def get_output_image_url(self, obj) -> str | None:
+        return guest_file_url(obj.uid, 'output', obj.output_path, self.context.get('request'), obj.output_formats)
+
+    def get_output_renditions(self, obj) -> dict:
+        return guest_rendition_urls(obj.uid, 'output', obj.output_path, self.context.get('request'))
 
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'first_name', 'last_name', 'profile_image', 'date_joined')
+        fields = ('id', 'email', 'first_name', 'last_name', 'profile_image', 'profile_image_renditions', 'date_joined')
         read_only_fields = ('id', 'email', 'date_joined')
 
+    def get_profile_image_renditions(self, obj) -> dict:
+        return rendition_urls(obj.profile_image, self.context.get('request'))
+
 
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(write_only=True)
@@ -98,3 +230,9 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
             'last_name': {'required': False, 'allow_blank': True},
             'profile_image': {'required': False, 'allow_null': True},
         }
+
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        if validated_data.get('profile_image'):
+            ensure_renditions(instance.profile_image.name, instance.profile_image.storage)
+        return instance
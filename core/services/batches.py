@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from ..models import RedesignBatch, RoomRedesign
+from .circuit_breaker import BackendUnavailable
+from .image_pipeline import prepare_for_edit
+from .media import retain
+from .openai_service import build_redesign_prompt
+from .redesign_jobs import arun_redesign_job, enqueue_redesign
+
+logger = logging.getLogger(__name__)
+
+
+def create_batch(user, original_image, styles, **job_fields):
+    """Store the original and its preprocessed form once, then create one redesign per style
+    pointing at the same files. job_fields are set on every member (status defaults to pending).
+    Returns (batch, prepared, redesigns).
+    """
+    job_fields.setdefault('status', 'pending')
+    original_field = RedesignBatch._meta.get_field('original_image')
+    prepared_field = RedesignBatch._meta.get_field('prepared_image')
+    # Files are stored and preprocessed before the transaction, so the encode holds no row locks;
+    # each save() takes the batch's reference to its file.
+    saved = []
+    try:
+        original_name = original_field.storage.save(
+            original_field.generate_filename(None, original_image.name), original_image,
+        )
+        saved.append((original_field.storage, original_name))
+        prepared = prepare_for_edit(original_field.storage.path(original_name))
+        prepared_name = prepared_field.storage.save(
+            prepared_field.generate_filename(None, f"batch.{prepared.extension}"), ContentFile(prepared.content),
+        )
+        saved.append((prepared_field.storage, prepared_name))
+        with transaction.atomic():
+            batch = RedesignBatch.objects.create(
+                user=user, original_image=original_name, prepared_image=prepared_name,
+            )
+            redesigns = [
+                RoomRedesign.objects.create(
+                    user=user,
+                    batch=batch,
+                    original_image=original_name,
+                    style_choice=style,
+                    prompt=build_redesign_prompt(style),
+                    **job_fields,
+                )
+                for style in styles
+            ]
+            # The members point at the batch's stored original too.
+            retain(batch.original_image, len(redesigns))
+    except Exception:
+        # Nothing points at the files; drop the references their saves took.
+        for storage, name in saved:
+            storage.delete(name)
+        raise
+    return batch, prepared, redesigns
+
+
+def _enqueue_in_thread(redesign):
+    try:
+        enqueue_redesign(redesign)
+    except BackendUnavailable:
+        pass  # already recorded as failed on the row
+    finally:
+        connection.close()
+
+
+def enqueue_batch(redesigns):
+    """Hand the members to the job queue. In eager mode run them inline, at most
+    REDESIGN_BATCH_MAX_PARALLEL at a time.
+    """
+    if not settings.REDESIGN_JOBS_EAGER:
+        for redesign in redesigns:
+            enqueue_redesign(redesign)
+        return
+    with ThreadPoolExecutor(max_workers=settings.REDESIGN_BATCH_MAX_PARALLEL) as pool:
+        list(pool.map(_enqueue_in_thread, redesigns))
+
+
+async def arun_batch(redesigns, prepared):
+    """Run the members concurrently on the event loop with bounded fan-out, sharing prepared."""
+    semaphore = asyncio.Semaphore(settings.REDESIGN_BATCH_MAX_PARALLEL)
+
+    async def run(redesign):
+        async with semaphore:
+            try:
+                await arun_redesign_job(redesign, prepared=prepared)
+            except BackendUnavailable:
+                pass  # recorded as failed on the row
+
+    await asyncio.gather(*(run(redesign) for redesign in redesigns))
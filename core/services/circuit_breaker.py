@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+class BackendUnavailable(Exception):
+    """Raised instead of calling the backend while it is shedding load or the circuit is open."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, int(retry_after + 0.5))
+
+
+class CircuitBreaker:
+    """Error-rate / slow-call circuit breaker.
+    Outcomes are tracked over the last CIRCUIT_WINDOW calls of this process. The open state
+    lives in the shared cache, so one process tripping the breaker makes every process fail
+    fast. After CIRCUIT_OPEN_SECONDS a single probe call is let through (half-open); its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, is_failure):
+        self.name = name
+        self.is_failure = is_failure
+        self._open_key = f"circuit:{name}:open_until"
+        self._probe_key = f"circuit:{name}:probe"
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=settings.CIRCUIT_WINDOW)
+
+    def state(self) -> str:
+        open_until = cache.get(self._open_key)
+        if open_until is None:
+            return 'closed'
+        return 'open' if time.time() < open_until else 'half_open'
+
+    def _transition(self, state: str):
+        logger.warning('Circuit %s -> %s', self.name, state)
+        metrics.incr(f"circuit.{self.name}.{state}")
+        metrics.set_gauge(f"circuit.{self.name}.state", STATE_VALUES[state])
+
+    def _open(self):
+        cache.set(self._open_key, time.time() + settings.CIRCUIT_OPEN_SECONDS, timeout=None)
+        cache.delete(self._probe_key)
+        with self._lock:
+            self._outcomes.clear()
+        self._transition('open')
+
+    def _close(self):
+        cache.delete_many([self._open_key, self._probe_key])
+        with self._lock:
+            self._outcomes.clear()
+        self._transition('closed')
+
+    def before_call(self) -> bool:
+        """Raise BackendUnavailable if the call must not go through. Returns True for a probe call."""
+        open_until = cache.get(self._open_key)
+        if open_until is None:
+            return False
+        remaining = open_until - time.time()
+        if remaining <= 0:
+            # Half-open: the first caller across all processes becomes the probe.
+            if cache.add(self._probe_key, 1, timeout=int(settings.OPENAI_DEADLINE) + 5):
+                self._transition('half_open')
+                return True
+            remaining = settings.CIRCUIT_OPEN_SECONDS
+        metrics.incr(f"circuit.{self.name}.rejected")
+        raise BackendUnavailable('Image generation is temporarily unavailable', remaining)
+
+    def record(self, failed: bool, duration: float, probe: bool = False):
+        slow = duration >= settings.CIRCUIT_SLOW_CALL_SECONDS
+        if probe:
+            if failed or slow:
+                self._open()
+            else:
+                self._close()
+            return
+        with self._lock:
+            self._outcomes.append((failed, slow))
+            outcomes = list(self._outcomes)
+        if len(outcomes) < settings.CIRCUIT_MIN_CALLS:
+            return
+        error_rate = sum(f for f, _ in outcomes) / len(outcomes)
+        slow_rate = sum(s for _, s in outcomes) / len(outcomes)
+        if error_rate >= settings.CIRCUIT_ERROR_RATE or slow_rate >= settings.CIRCUIT_SLOW_CALL_RATE:
+            if self.state() == 'closed':
+                self._open()
+
+    @contextmanager
+    def guard(self):
+        """Wrap one backend call. Works around `await` expressions as well, since nothing here blocks."""
+        probe = self.before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            self.record(self.is_failure(exc), time.monotonic() - start, probe)
+            raise
+        self.record(False, time.monotonic() - start, probe)
+
+
+class InflightLimiter:
+    """Caps concurrent calls in this process; callers beyond the cap are shed immediately."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = 0
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self._inflight >= settings.IMAGE_MAX_INFLIGHT:
+                metrics.incr(f"{self.name}.shed")
+                raise BackendUnavailable('Too many generations in progress', settings.IMAGE_SHED_RETRY_AFTER)
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._inflight -= 1
@@ -0,0 +1,50 @@
+import base64
+from dataclasses import dataclass
+
+from . import result_cache
+from .image_pipeline import PreparedImage, prepare_for_edit
+from .openai_service import agenerate_redesign_image, generate_redesign_image
+
+
+@dataclass
+class Generation:
+    """A preprocessed input plus its result cache lookup, ready to be generated."""
+    prepared: PreparedImage
+    style_choice: str
+    cache_key: str
+    cached_bytes: bytes | None
+
+    @property
+    def cache_hit(self) -> bool:
+        return self.cached_bytes is not None
+
+    def store(self, result_path: str):
+        # Index a freshly generated result so identical requests can reuse it.
+        if not self.cache_hit:
+            result_cache.store(self.cache_key, self.style_choice, result_path)
+
+
+def lookup_generation(prepared: PreparedImage, style_choice: str) -> Generation:
+    cache_key = result_cache.make_key(prepared.content, style_choice)
+    return Generation(prepared, style_choice, cache_key, result_cache.get_bytes(cache_key))
+
+
+def prepare_generation(image_path: str, style_choice: str) -> Generation:
+    return lookup_generation(prepare_for_edit(image_path), style_choice)
+
+
+def _decode(result: dict) -> bytes | None:
+    return base64.b64decode(result['image_bytes']) if result.get('image_bytes') else None
+
+
+def generate_result_bytes(generation: Generation, prompt: str) -> bytes | None:
+    """Result image bytes, from the cache or from the image backend."""
+    if generation.cache_hit:
+        return generation.cached_bytes
+    return _decode(generate_redesign_image(prompt=prompt, image=generation.prepared.as_upload()))
+
+
+async def agenerate_result_bytes(generation: Generation, prompt: str) -> bytes | None:
+    if generation.cache_hit:
+        return generation.cached_bytes
+    return _decode(await agenerate_redesign_image(prompt=prompt, image=generation.prepared.as_upload()))
@@ -0,0 +1,131 @@
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from ..models import GuestGeneration, RoomRedesign
+from .media_delivery import guest_file_url
+from .renditions import ensure_renditions
+from .result_encoding import encode_result, save_variants
+
+STYLE_VALUES = [c[0] for c in RoomRedesign.STYLE_CHOICES]
+
+# Guest generate hands out a device id signed with SECRET_KEY; the app sends it back in this
+# header. A device is whatever holds the token, so nobody can claim another device's rows by
+# naming its id.
+DEVICE_HEADER = 'X-Device-Token'
+DEVICE_TOKEN_SALT = 'core.guest-device'
+
+
+@dataclass
+class GuestJob:
+    uid: str
+    style_choice: str
+    input_rel_path: str
+    device_id: str = ''
+
+    @property
+    def input_abs_path(self) -> str:
+        return os.path.join(settings.MEDIA_ROOT, self.input_rel_path)
+
+
+def device_token(device_id: str) -> str:
+    return signing.Signer(salt=DEVICE_TOKEN_SALT).sign(device_id)
+
+
+def device_id_from(request) -> str:
+    """The device id in a valid X-Device-Token header, or '' if there is none."""
+    token = request.headers.get(DEVICE_HEADER, '').strip()
+    if not token or len(token) > 128:
+        return ''
+    try:
+        return signing.Signer(salt=DEVICE_TOKEN_SALT).unsign(token)
+    except signing.BadSignature:
+        return ''
+
+
+def validate_guest_form(style_choice, image) -> dict:
+    """Field errors for a guest generation form, in DRF's error shape."""
+    if not style_choice:
+        return {'style_choice': ['This field is required.']}
+    if style_choice not in STYLE_VALUES:
+        return {'style_choice': ['Invalid choice.']}
+    if not image:
+        return {'original_image': ['This field is required.']}
+    return {}
+
+
+def guest_path(kind: str, uid: str, filename: str) -> str:
+    # uploads/guest/<kind>/3f/a2/<filename>: the random uid spreads files over 65536 directories.
+    return os.path.join('uploads', 'guest', kind, uid[:2], uid[2:4], filename)
+
+
+def save_guest_input(image, style_choice: str, device_id: str = '') -> GuestJob:
+    """Store the upload. Guests without a device token are given a new device here."""
+    uid = uuid.uuid4().hex
+    device_id = device_id or uuid.uuid4().hex
+    in_path = guest_path('inputs', uid, f"guest_{uid}_{image.name}")
+    # Save input image to MEDIA_ROOT
+    input_rel_path = default_storage.save(in_path, image)
+    GuestGeneration.objects.create(
+        uid=uid,
+        device_id=device_id,
+        style_choice=style_choice,
+        input_path=input_rel_path,
+        expires_at=timezone.now() + timedelta(seconds=settings.GUEST_ARTIFACT_TTL),
+    )
+    return GuestJob(uid=uid, style_choice=style_choice, input_rel_path=input_rel_path, device_id=device_id)
+
+
+def complete_guest_job(job: GuestJob, image_bytes: bytes | None, generation, request=None) -> dict:
+    """Store the output image and build the response payload. With a request the URLs are
+    absolute, as in the guest history.
+    """
+    output_url = None
+    if image_bytes:
+        encoded = encode_result(image_bytes)
+        out_name = f"guest_{job.uid}.{encoded.extension}"
+        out_rel_path = guest_path('outputs', job.uid, out_name)
+        out_rel_path = default_storage.save(out_rel_path, ContentFile(encoded.content, name=out_name))
+        save_variants(out_rel_path, default_storage, encoded)
+        output_url = guest_file_url(job.uid, 'output', out_rel_path, request, formats=','.join(encoded.formats))
+        generation.store(out_rel_path)
+        GuestGeneration.objects.filter(uid=job.uid).update(
+            output_path=out_rel_path, output_formats=','.join(encoded.formats),
+        )
+        # Guest history lists thumbnails; build them now rather than on the first history read.
+        ensure_renditions(out_rel_path, default_storage)
+    return {
+        'id': job.uid,
+        'input_image_url': guest_file_url(job.uid, 'input', job.input_rel_path, request),
+        'output_image_url': output_url,
+        'style': job.style_choice,
+        'created_at': timezone.now().isoformat(),
+        'status': 'completed' if output_url else 'processing',
+        'device_token': device_token(job.device_id),
+    }
+
+
+def guest_history(user=None, device_id: str = ''):
+    """Guest generations of a signed-in user (merged when they verified their email), else of a
+    device.
+    """
+    if user is not None and user.is_authenticated:
+        return GuestGeneration.objects.filter(user_id=user.pk)
+    if not device_id:
+        return GuestGeneration.objects.none()
+    return GuestGeneration.objects.filter(device_id=device_id, user__isnull=True, expires_at__gt=timezone.now())
+
+
+def merge_guest_history(user_id: int, device_id: str) -> int:
+    """Move a device's guest generations to a user in one UPDATE; they stop expiring."""
+    if not device_id:
+        return 0
+    return GuestGeneration.objects.filter(
+        device_id=device_id, user__isnull=True, expires_at__gt=timezone.now(),
+    ).update(user_id=user_id, expires_at=None)
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import metrics
+from ..utils import client_ip
+from .guest_generation import device_id_from
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    def __init__(self, detail: str, status_code: int, retry_after: int | None = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def fingerprint(*parts) -> str:
+    """Digest of the request fields a retry must repeat unchanged."""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def upload_fingerprint(style_choice, upload) -> str:
+    # The uploaded bytes, not just name and size: a retry must send the same photo.
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return fingerprint(style_choice, digest.hexdigest())
+
+
+def guest_owner(request) -> str:
+    """Key namespace for a guest: the client IP plus device id, so one guest's key never
+    replays another guest's response.
+    """
+    return f"guest:{client_ip(request)}:{device_id_from(request)}"
+
+
+class IdempotentRequest:
+    """One Idempotency-Key, stored in the shared cache as
+    {'fingerprint', 'job_id', 'response': {'status', 'body'} | None}.
+
+    The first request claims the key with cache.add, which is atomic on the shared cache
+    backends, so concurrent duplicates on other workers see the claim instead of racing
+    past it. Retries get claimed=False and the stored record.
+    """
+
+    def __init__(self, scope: str, owner, key: str, request_fingerprint: str):
+        self.cache_key = self.key_for(scope, owner, key)
+        self.fingerprint = request_fingerprint
+        self.claimed = False
+        self.record = None
+
+    @staticmethod
+    def key_for(scope: str, owner, key: str) -> str:
+        # owner: a user id, or guest_owner(request).
+        return f"idempotency:{scope}:{owner}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    @classmethod
+    def begin(cls, request, scope: str, owner, request_fingerprint: str):
+        """None if the request has no Idempotency-Key header. Raises IdempotencyError for
+        malformed keys or a key reused with a different request.
+        """
+        key = request.headers.get(HEADER)
+        if key is None:
+            return None
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters", 400)
+        idem = cls(scope, owner, key, request_fingerprint)
+        record = {'fingerprint': request_fingerprint, 'job_id': None, 'response': None}
+        if cache.add(idem.cache_key, record, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            idem.claimed = True
+            idem.record = record
+            return idem
+        idem.record = cache.get(idem.cache_key)
+        if idem.record is None:
+            # Expired between add() and get(); treat it as a fresh claim.
+            return cls.begin(request, scope, owner, request_fingerprint)
+        if idem.record['fingerprint'] != request_fingerprint:
+            raise IdempotencyError(f"{HEADER} was already used for a different request", 422)
+        metrics.incr(f"idempotency.{scope}.replayed")
+        return idem
+
+    def _save(self):
+        cache.set(self.cache_key, self.record, timeout=settings.IDEMPOTENCY_TTL)
+
+    def attach_job(self, job_id: int):
+        self.record['job_id'] = job_id
+        self._save()
+
+    def save_response(self, status_code: int, body):
+        self.record['response'] = {'status': status_code, 'body': dict(body)}
+        self._save()
+
+    def release(self):
+        # Let a retry start over (e.g. the backend refused the work).
+        if self.claimed:
+            cache.delete(self.cache_key)
+
+    def _refresh(self, ready) -> bool:
+        record = cache.get(self.cache_key)
+        if record is None:
+            raise IdempotencyError('The original request did not complete; retry it', 409, retry_after=1)
+        self.record = record
+        return ready(record)
+
+    def wait(self, ready, timeout: float | None = None):
+        """Poll until ready(record) holds for the in-flight original, or raise a 409. Sync views
+        hold a worker while polling, so they wait IDEMPOTENCY_SYNC_WAIT_TIMEOUT only.
+        """
+        deadline = time.monotonic() + (settings.IDEMPOTENCY_SYNC_WAIT_TIMEOUT if timeout is None else timeout)
+        while not self._refresh(ready):
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+        return self.record
+
+    async def await_ready(self, ready, timeout: float | None = None):
+        deadline = time.monotonic() + (settings.IDEMPOTENCY_WAIT_TIMEOUT if timeout is None else timeout)
+        while not await sync_to_async(self._refresh)(ready):
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+        return self.record
+
+    @staticmethod
+    def _in_progress() -> IdempotencyError:
+        return IdempotencyError('A request with this Idempotency-Key is still in progress', 409,
+                                retry_after=max(1, int(settings.IDEMPOTENCY_POLL_INTERVAL + 0.5)))
+
+
+def has_record(request, scope: str, owner) -> bool:
+    """Whether the request's Idempotency-Key already has a record (a claim or a result)."""
+    key = request.headers.get(HEADER, '').strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return False
+    return cache.get(IdempotentRequest.key_for(scope, owner, key)) is not None
+
+
+def has_response(record) -> bool:
+    return record['response'] is not None
+
+
+def has_job_or_response(record) -> bool:
+    return record['job_id'] is not None or record['response'] is not None
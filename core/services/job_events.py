@@ -0,0 +1,116 @@
+"""Status notifications for redesign jobs.
+
+Every status change is published to the shared cache under one key per job. Each process
+runs a single JobEventHub that reads the keys of all jobs its clients are watching in one
+get_many() per tick and fans the changes out to the subscribers. A thousand clients cost
+one cache round trip per tick and no database queries at all.
+"""
+import asyncio
+import json
+import time
+import weakref
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .media_delivery import redesign_file_url
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def _key(job_id) -> str:
+    return f"redesign-events:{job_id}"
+
+
+def event_for(redesign) -> dict:
+    return {
+        'id': redesign.id,
+        'status': redesign.status,
+        'result_image': redesign_file_url(redesign, 'result'),
+        'error': redesign.error,
+    }
+
+
+def publish(redesign):
+    cache.set(_key(redesign.id), event_for(redesign), timeout=settings.JOB_EVENTS_TTL)
+
+
+def publish_on_save(sender, instance, **kwargs):
+    # post_save receiver (see CoreConfig.ready) so every status transition is published.
+    publish(instance)
+
+
+class JobEventHub:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._last = {}
+        self._task = None
+
+    @asynccontextmanager
+    async def subscribe(self, job_id):
+        queue = asyncio.Queue()
+        self._subscribers[job_id].add(queue)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        try:
+            yield queue
+        finally:
+            self._subscribers[job_id].discard(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+                self._last.pop(job_id, None)
+
+    async def _run(self):
+        try:
+            while self._subscribers:
+                keys = {_key(job_id): job_id for job_id in list(self._subscribers)}
+                events = await sync_to_async(cache.get_many, thread_sensitive=False)(list(keys))
+                for key, event in events.items():
+                    job_id = keys[key]
+                    if event == self._last.get(job_id):
+                        continue
+                    self._last[job_id] = event
+                    for queue in self._subscribers.get(job_id, ()):
+                        queue.put_nowait(event)
+                await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+        finally:
+            self._task = None
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub() -> JobEventHub:
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = JobEventHub()
+    return hub
+
+
+def _sse(event: dict) -> str:
+    return f"event: status\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream(redesign):
+    """Server-Sent Events for one job: the current state, then every transition until it finishes."""
+    event = event_for(redesign)
+    yield _sse(event)
+    if event['status'] in TERMINAL_STATUSES:
+        return
+    deadline = time.monotonic() + settings.JOB_EVENTS_STREAM_TIMEOUT
+    async with get_hub().subscribe(redesign.id) as queue:
+        while time.monotonic() < deadline:
+            try:
+                next_event = await asyncio.wait_for(queue.get(), timeout=settings.JOB_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if next_event == event:
+                continue
+            event = next_event
+            yield _sse(event)
+            if event['status'] in TERMINAL_STATUSES:
+                return
@@ -0,0 +1,71 @@
+"""Tier-aware ordering of queued redesign jobs.
+
+Workers pick the tier to claim from with smooth weighted round-robin (REDESIGN_TIER_WEIGHTS):
+among tiers that have claimable jobs and are under their REDESIGN_TIER_MAX_RUNNING limit,
+each pick adds every tier's weight to its credit and serves the tier with the most credit,
+which then pays the total. With pro:4,free:1 a saturated queue runs four pro jobs per free
+one, yet free jobs keep moving; idle tiers take no part and build up no credit for later.
+
+The credits live in the shared cache so all workers take turns from one schedule. Updates
+are not atomic across workers, so under contention the ratio is approximate, never starving.
+So do the per-tier queue depths the weights are applied to: one worker recounts them every
+REDESIGN_DEPTH_REFRESH_INTERVAL seconds and the others reuse that snapshot.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import metrics
+
+CREDITS_KEY = 'job-scheduler:credits'
+DEPTHS_KEY = 'job-scheduler:depths'
+
+
+def tier_limit(tier: str) -> int:
+    # 0 = no limit of its own.
+    return settings.REDESIGN_TIER_MAX_RUNNING.get(tier, 0)
+
+
+def eligible_tiers(queued: dict, running: dict) -> list[str]:
+    return [
+        tier for tier, count in queued.items()
+        if count and (not tier_limit(tier) or running.get(tier, 0) < tier_limit(tier))
+    ]
+
+
+def pick_order(tiers: list[str]) -> list[str]:
+    """tiers in the order to try claiming from; the first one is charged for the pick."""
+    if not tiers:
+        return []
+    weights = {tier: settings.REDESIGN_TIER_WEIGHTS.get(tier, 1) for tier in tiers}
+    credits = cache.get(CREDITS_KEY) or {}
+    credits = {tier: credits.get(tier, 0) + weight for tier, weight in weights.items()}
+    order = sorted(tiers, key=lambda tier: (-credits[tier], tier))
+    credits[order[0]] -= sum(weights.values())
+    cache.set(CREDITS_KEY, credits, timeout=None)
+    return order
+
+
+def depths(count) -> tuple[dict, dict]:
+    """(queued, running) jobs per tier from the shared snapshot, refreshed with count() once it
+    is older than REDESIGN_DEPTH_REFRESH_INTERVAL. The gauges are set on each refresh.
+    """
+    snapshot = cache.get(DEPTHS_KEY)
+    if snapshot is None:
+        snapshot = count()
+        cache.set(DEPTHS_KEY, snapshot, timeout=settings.REDESIGN_DEPTH_REFRESH_INTERVAL)
+        record_depths(*snapshot)
+    return snapshot
+
+
+def record_depths(queued: dict, running: dict):
+    for tier in set(settings.REDESIGN_TIER_WEIGHTS) | set(queued) | set(running):
+        metrics.set_gauge(f"jobs.{tier}.queued", queued.get(tier, 0))
+        metrics.set_gauge(f"jobs.{tier}.running", running.get(tier, 0))
+
+
+def record_start(job):
+    """Count a claimed job's time in the queue (created to claimed) under its tier."""
+    wait_ms = int((job.started_at - job.created_at).total_seconds() * 1000)
+    metrics.incr(f"jobs.{job.tier}.started")
+    metrics.incr(f"jobs.{job.tier}.wait_ms_total", wait_ms)
+    metrics.set_gauge(f"jobs.{job.tier}.last_wait_ms", wait_ms)
@@ -0,0 +1,147 @@
+"""Outbound email queue.
+
+Views call enqueue_email(), which only inserts an OutboundEmail row, so a request never waits
+on the SMTP server. run_mail_worker claims due rows in batches (SELECT ... FOR UPDATE SKIP
+LOCKED, like the redesign queue) and sends each batch over one EMAIL_BACKEND connection.
+A message that fails is retried with exponential backoff (MAIL_RETRY_DELAY, doubling per
+attempt); after MAIL_MAX_ATTEMPTS, or once its expires_at has passed (OTP mail expires with the
+code), it is marked 'dead' with its body blanked and left in the table for
+`manage.py purge_dead_emails`.
+
+With MAIL_QUEUE_EAGER the batch is sent right after the row is inserted, in the request, for
+development setups without a worker. Tests can point EMAIL_BACKEND at the locmem or
+file-based backend.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .. import metrics
+from ..models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Dead rows keep who and what, not the text (which may hold a one-time code).
+REDACTED = ''
+
+
+def enqueue_email(to: str, subject: str, body: str, expires_at=None) -> OutboundEmail:
+    email = OutboundEmail.objects.create(to=to, subject=subject, body=body, expires_at=expires_at)
+    metrics.incr('mail.enqueued')
+    if settings.MAIL_QUEUE_EAGER:
+        transaction.on_commit(lambda: deliver_batch(claim_batch([email.pk])))
+    return email
+
+
+def claim_batch(ids: list | None = None) -> list[OutboundEmail]:
+    """Lease up to MAIL_BATCH_SIZE due messages to this worker. A lease runs out after
+    MAIL_CLAIM_TIMEOUT, so messages of a worker that died are picked up again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+            status='pending', next_attempt_at__lte=now,
+        )
+        if ids is not None:
+            due = due.filter(pk__in=ids)
+        batch = list(due.order_by('next_attempt_at', 'id')[:settings.MAIL_BATCH_SIZE])
+        expired = [e.pk for e in batch if e.expires_at is not None and e.expires_at <= now]
+        if expired:
+            OutboundEmail.objects.filter(pk__in=expired).update(
+                status='dead', body=REDACTED, last_error='Expired before it was sent',
+            )
+            metrics.incr('mail.expired', len(expired))
+            batch = [e for e in batch if e.pk not in expired]
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[e.pk for e in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.MAIL_CLAIM_TIMEOUT),
+            )
+    if batch:
+        lag_ms = int((now - batch[0].created_at).total_seconds() * 1000)
+        metrics.set_gauge('mail.queue_lag_ms', lag_ms)
+    return batch
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.MAIL_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def _failed(email: OutboundEmail, error: str):
+    email.attempts += 1
+    email.last_error = error
+    retry_at = timezone.now() + _retry_delay(email.attempts)
+    if email.attempts >= settings.MAIL_MAX_ATTEMPTS or (email.expires_at is not None and retry_at >= email.expires_at):
+        email.status = 'dead'
+        email.body = REDACTED
+        metrics.incr('mail.dead')
+        logger.error('Giving up on email %s to %s after %d attempts: %s', email.pk, email.to, email.attempts, error)
+    else:
+        email.next_attempt_at = retry_at
+        metrics.incr('mail.retried')
+        logger.warning('Email %s to %s failed (attempt %d), retrying: %s', email.pk, email.to, email.attempts, error)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'body', 'next_attempt_at'])
+
+
+def deliver_batch(batch: list[OutboundEmail]) -> int:
+    """Send a claimed batch over a single connection; returns the number sent."""
+    if not batch:
+        return 0
+    sent = []
+    conn = get_connection(fail_silently=False)
+    pending = list(batch)
+    try:
+        while pending:
+            try:
+                conn.open()
+            except Exception as e:
+                # Nothing more can go out over this connection; the rest count as failed attempts.
+                for email in pending:
+                    _failed(email, f"connection: {e}")
+                break
+            email = pending.pop(0)
+            msg = EmailMessage(
+                subject=email.subject, body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL, to=[email.to], connection=conn,
+            )
+            try:
+                msg.send()
+            except Exception as e:
+                _failed(email, str(e) or e.__class__.__name__)
+                # The server may have dropped us; the next message reconnects.
+                conn.close()
+                continue
+            sent.append(email)
+    finally:
+        conn.close()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=[e.pk for e in sent]).delete()
+        metrics.incr('mail.sent', len(sent))
+        delivered_ms = int((timezone.now() - sent[-1].created_at).total_seconds() * 1000)
+        metrics.set_gauge('mail.last_delivery_ms', delivered_ms)
+    return len(sent)
+
+
+def record_depth():
+    metrics.set_gauge('mail.queued', OutboundEmail.objects.filter(status='pending').count())
+
+
+def work(stop_event, poll_interval: float, burst: bool = False):
+    """Worker loop: send due messages until stop_event is set.
+    With burst=True the loop exits as soon as nothing is due.
+    """
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            record_depth()
+            batch = claim_batch()
+            if not batch:
+                if burst:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            deliver_batch(batch)
+    finally:
+        connection.close()
@@ -0,0 +1,95 @@
+"""Reference bookkeeping for media fields on ContentAddressedStorage.
+
+Model saves and deletes keep StoredBlob.refcount in step with the rows pointing at a file:
+replacing a field's file or deleting its row releases the old name, and the file (with its
+renditions) goes once nothing references it and the transaction has committed.
+
+The bookkeeping runs in post_save/post_delete signals. QuerySet.delete() still sends them (the
+receivers stop Django from fast-deleting), but QuerySet.update() and bulk_create() do not, so
+MediaQuerySet refuses update() on a media field: save the rows, or adjust the counts yourself and
+use update_without_refcounts().
+"""
+from functools import cache
+from django.db import models, transaction
+from django.db.models import FileField
+
+from ..storage import ContentAddressedStorage
+from .renditions import delete_renditions
+from .result_encoding import delete_variants
+
+LOADED_ATTR = '_media_names'
+
+
+@cache
+def cas_fields(model) -> list:
+    return [
+        f for f in model._meta.concrete_fields
+        if isinstance(f, FileField) and isinstance(f.storage, ContentAddressedStorage)
+    ]
+
+
+def _name(value) -> str:
+    return getattr(value, 'name', value) or ''
+
+
+def retain(field_file, count: int = 1):
+    """Record count more rows pointing at field_file's name (e.g. batch members sharing it)."""
+    if field_file and isinstance(field_file.storage, ContentAddressedStorage):
+        field_file.storage.retain(field_file.name, count)
+
+
+def release(storage, name: str):
+    # Media saved before the switch to content addressing is left alone, as it always was.
+    if storage.is_blob(name) and storage.release(name):
+        # Registered after the storage's own callback, so this runs once the file is gone.
+        transaction.on_commit(lambda: delete_derived(storage, name))
+
+
+def delete_derived(storage, name: str):
+    if not storage.base.exists(name):
+        delete_renditions(name, storage.base)
+        delete_variants(name, storage.base)
+
+
+class MediaQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        fields = {f.name for f in cas_fields(self.model)} | {f.attname for f in cas_fields(self.model)}
+        if fields.intersection(kwargs):
+            raise TypeError(
+                f"{self.model.__name__}.objects.update() would bypass the StoredBlob reference counts "
+                f"of {', '.join(sorted(fields.intersection(kwargs)))}; save the rows instead, or use "
+                "update_without_refcounts() and retain()/release() the names yourself"
+            )
+        return super().update(**kwargs)
+
+    def update_without_refcounts(self, **kwargs):
+        return super().update(**kwargs)
+
+
+def track_loaded_files(sender, instance, **kwargs):
+    # Remember the stored names an instance was loaded with. Only plain strings count: that is
+    # how rows arrive from the database, and deferred fields are left alone (not in __dict__).
+    names = {}
+    for field in cas_fields(sender):
+        value = instance.__dict__.get(field.attname)
+        if isinstance(value, str) and value:
+            names[field.attname] = value
+    setattr(instance, LOADED_ATTR, names)
+
+
+def release_replaced_files(sender, instance, created, **kwargs):
+    loaded = getattr(instance, LOADED_ATTR, {})
+    current = {}
+    for field in cas_fields(sender):
+        if field.attname not in instance.__dict__:
+            continue
+        current[field.attname] = _name(instance.__dict__[field.attname])
+        old = loaded.get(field.attname)
+        if not created and old and old != current[field.attname]:
+            release(field.storage, old)
+    setattr(instance, LOADED_ATTR, {k: v for k, v in current.items() if v})
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field in cas_fields(sender):
+        release(field.storage, _name(getattr(instance, field.attname)))
@@ -0,0 +1,195 @@
+"""URLs and responses for protected media.
+
+With MEDIA_SIGNED_URLS on, API payloads link to the media views (core.views_media) instead of
+the public /media/ tree. Those URLs carry an expiry and an HMAC over path and expiry, so they
+work from <img> tags without an Authorization header. The views check access and answer with
+X-Accel-Redirect (nginx) or X-Sendfile (Apache/lighttpd) headers, leaving the bytes, Range
+requests included, to the front proxy.
+"""
+import hmac
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .renditions import ensure_renditions, rendition_name, rendition_urls_for
+from .result_encoding import negotiated_name
+
+SIGNING_SALT = 'core.media_delivery'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def signature(path: str, expires: int) -> str:
+    return salted_hmac(SIGNING_SALT, f"{path}|{expires}", algorithm='sha256').hexdigest()
+
+
+def sign(path: str) -> str:
+    ttl = settings.MEDIA_SIGNED_URL_TTL
+    # Round the expiry up to a TTL boundary so repeated requests get the same (cacheable) URL;
+    # every URL stays valid for at least one TTL.
+    expires = (int(time.time()) // ttl + 2) * ttl
+    return f"{path}?expires={expires}&sig={signature(path, expires)}"
+
+
+def has_valid_signature(request) -> bool:
+    try:
+        expires = int(request.GET.get('expires', ''))
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(request.GET.get('sig', ''), signature(request.path, expires))
+
+
+def _absolute(url: str, request=None) -> str:
+    return request.build_absolute_uri(url) if request else url
+
+
+def _view_url(url_name: str, key, kind: str, size: int | None, request) -> str:
+    kwargs = {'key': key, 'kind': kind}
+    if size:
+        kwargs['size'] = size
+    return _absolute(sign(reverse(url_name, kwargs=kwargs)), request)
+
+
+def _file_url(url_name, key, kind, name, storage, request=None, formats=None) -> str | None:
+    if not name:
+        return None
+    if not settings.MEDIA_SIGNED_URLS:
+        # Results are stored in several formats; link the one the client's Accept header prefers.
+        # (The media views negotiate per request instead.)
+        if formats is not None:
+            name = negotiated_name(name, formats, request)
+        return _absolute(storage.url(name), request)
+    return _view_url(url_name, key, kind, None, request)
+
+
+def _rendition_urls(url_name, key, kind, name, storage, request=None) -> dict:
+    if not settings.MEDIA_SIGNED_URLS:
+        return rendition_urls_for(name, storage, request)
+    if not name or not ensure_renditions(name, storage):
+        return {}
+    return {str(size): _view_url(url_name, key, kind, size, request) for size in settings.IMAGE_RENDITION_SIZES}
+
+
+def redesign_file_url(redesign, kind: str, request=None) -> str | None:
+    field_file = getattr(redesign, f"{kind}_image")
+    formats = redesign.result_formats if kind == 'result' else None
+    return _file_url('redesign-media', redesign.pk, kind, field_file.name, field_file.storage, request, formats)
+
+
+def redesign_rendition_urls(redesign, kind: str, request=None) -> dict:
+    field_file = getattr(redesign, f"{kind}_image")
+    return _rendition_urls('redesign-media', redesign.pk, kind, field_file.name, field_file.storage, request)
+
+
+def guest_file_url(uid: str, kind: str, name: str, request=None, formats: str | None = None) -> str | None:
+    return _file_url('guest-media', uid, kind, name, default_storage, request, formats)
+
+
+def guest_rendition_urls(uid: str, kind: str, name: str, request=None) -> dict:
+    return _rendition_urls('guest-media', uid, kind, name, default_storage, request)
+
+
+def resolve_name(name: str, storage, size: int | None, formats: str | None = None, request=None) -> str | None:
+    """The stored name to serve: the file itself, the variant of a result matching the request's
+    Accept header (formats given), or one of its renditions.
+    """
+    if not size:
+        return name if formats is None else negotiated_name(name, formats, request)
+    if size not in settings.IMAGE_RENDITION_SIZES or not ensure_renditions(name, storage):
+        return None
+    return rendition_name(name, size)
+
+
+def _etag(name: str, storage, size: int, mtime) -> str:
+    # Content-addressed names (and their renditions and variants) already carry the digest of the
+    # bytes; the extension tells the formats of one blob apart.
+    if getattr(storage, 'is_blob', None) and storage.is_blob(name):
+        return quote_etag(os.path.basename(name))
+    return quote_etag(f"{size:x}-{int(mtime.timestamp()):x}")
+
+
+def _parse_range(header: str, length: int):
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(0, length - int(last)), length - 1
+    else:
+        start, end = int(first), min(int(last), length - 1) if last else length - 1
+    if start > end or start >= length:
+        return 'unsatisfiable'
+    return start, end
+
+
+def serve(request, name: str, storage) -> HttpResponse:
+    """Respond with name from storage, handing the transfer to the front proxy when configured
+    (MEDIA_ACCEL). Validators are always set and conditional requests get a 304.
+    """
+    base = getattr(storage, 'base', storage)
+    if not base.exists(name):
+        return HttpResponse(status=404)
+    length = base.size(name)
+    modified = base.get_modified_time(name)
+    etag = _etag(name, storage, length, modified)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(modified.timestamp()),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, max-age=%d' % settings.MEDIA_SIGNED_URL_TTL,
+    }
+    if _not_modified(request, etag, modified):
+        response = HttpResponse(status=304)
+    elif settings.MEDIA_ACCEL == 'nginx':
+        # nginx serves the internal location (and any Range) itself.
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name)
+    elif settings.MEDIA_ACCEL == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = base.path(name)
+    else:
+        response = _python_response(request, base, name, length)
+    for header, value in headers.items():
+        response[header] = value
+    if response.status_code in (200, 206):
+        response['Content-Type'] = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return response
+
+
+def _not_modified(request, etag: str, modified) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    since = request.headers.get('If-Modified-Since')
+    if since:
+        since_ts = parse_http_date_safe(since)
+        return since_ts is not None and int(modified.timestamp()) <= since_ts
+    return False
+
+
+def _python_response(request, storage, name: str, length: int) -> HttpResponse:
+    # Fallback without a front proxy (development): Django sends the bytes itself.
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    byte_range = _parse_range(request.headers.get('Range', ''), length) if request.headers.get('Range') else None
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{length}"
+        return response
+    if byte_range is None:
+        return FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    start, end = byte_range
+    with storage.open(name, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start + 1)
+    response = HttpResponse(body, status=206, content_type=content_type)
+    response['Content-Range'] = f"bytes {start}-{end}/{length}"
+    return response
@@ -0,0 +1,164 @@
+import asyncio
+import random
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+import httpx
+from django.conf import settings
+from django.utils import timezone
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI
+
+from .. import metrics
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_transport = None
+_async_transport = None
+_client = None
+# httpx async pools belong to the event loop that opened them, so keep one client per loop.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def configure_transport(transport=None, async_transport=None):
+    """Route OpenAI traffic through custom httpx transports (e.g. httpx.MockTransport in tests).
+    Passing nothing restores the default network transports.
+    """
+    global _transport, _async_transport, _client
+    _transport = transport
+    _async_transport = async_transport
+    _client = None
+    _async_clients.clear()
+
+
+def _limits() -> httpx.Limits:
+    # The sync and async clients use the same pool sizing and keep-alive policy. The long
+    # keep-alive spares a fresh TLS handshake after short idle periods.
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.OPENAI_REQUEST_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+
+def _client_kwargs() -> dict:
+    return {
+        'api_key': settings.OPENAI_API_KEY or None,
+        'base_url': settings.OPENAI_BASE_URL or None,
+        'timeout': _timeout(),
+        # Retries are handled by call_with_retry so they share one deadline.
+        'max_retries': 0,
+    }
+
+
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        http_client = httpx.Client(limits=_limits(), timeout=_timeout(), transport=_transport)
+        _client = OpenAI(http_client=http_client, **_client_kwargs())
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout(), transport=_async_transport)
+        client = AsyncOpenAI(http_client=http_client, **_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+def _retry_after(exc) -> float | None:
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(exc) -> bool:
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS
+    return isinstance(exc, APIConnectionError)
+
+
+def is_backend_error(exc) -> bool:
+    """True for failures that say the backend is unhealthy (as opposed to a bad request)."""
+    return _is_retryable(exc) or isinstance(exc, DeadlineExceeded)
+
+
+def _next_delay(exc, attempt: int, deadline: float) -> float | None:
+    """Seconds to wait before retrying, or None if the error should be raised."""
+    if not _is_retryable(exc) or attempt >= settings.OPENAI_MAX_RETRIES:
+        return None
+    delay = _retry_after(exc)
+    if delay is None:
+        # Full jitter: uniform over [0, min(cap, base * 2^attempt)].
+        delay = random.uniform(0, min(settings.OPENAI_BACKOFF_MAX, settings.OPENAI_BACKOFF_BASE * 2 ** attempt))
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def _attempt_timeout(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('OpenAI call deadline exceeded')
+    return min(settings.OPENAI_REQUEST_TIMEOUT, remaining)
+
+
+def call_with_retry(fn):
+    """Call fn(timeout) until it succeeds, retrying 429/5xx/connection errors with
+    jittered exponential backoff (or Retry-After) within OPENAI_DEADLINE seconds.
+    """
+    deadline = time.monotonic() + settings.OPENAI_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            return fn(_attempt_timeout(deadline))
+        except Exception as exc:
+            delay = _next_delay(exc, attempt, deadline)
+            if delay is None:
+                raise
+        metrics.incr('openai.retries')
+        time.sleep(delay)
+        attempt += 1
+
+
+async def acall_with_retry(fn):
+    """Async counterpart of call_with_retry; fn(timeout) returns an awaitable."""
+    deadline = time.monotonic() + settings.OPENAI_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            return await fn(_attempt_timeout(deadline))
+        except Exception as exc:
+            delay = _next_delay(exc, attempt, deadline)
+            if delay is None:
+                raise
+        metrics.incr('openai.retries')
+        await asyncio.sleep(delay)
+        attempt += 1
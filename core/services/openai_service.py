@@ -1,30 +1,101 @@
+import asyncio
 import base64
+import io
+import mimetypes
 import os
-from openai import OpenAI
+import time
+from django.conf import settings
+from PIL import Image, ImageOps
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+from .circuit_breaker import CircuitBreaker, InflightLimiter
+from .openai_client import acall_with_retry, call_with_retry, get_async_client, get_client, is_backend_error
 
+PROMPT_TEMPLATE = (
+    "Redesign this interior room photo into a {style} style. High realism, photorealistic, "
+    "maintain room layout, professional interior design render."
+)
 
-def generate_redesign_image(prompt: str, image_path: str | None = None) -> dict:
+IMAGE_MODEL = "gpt-image-1"
+IMAGE_SIZE = "1024x1024"
+
+image_breaker = CircuitBreaker('openai', is_failure=is_backend_error)
+image_limiter = InflightLimiter('openai')
+
+
+def build_redesign_prompt(style_choice: str) -> str:
+    return PROMPT_TEMPLATE.format(style=style_choice)
+
+
+def _read_image(image_path: str) -> tuple:
+    # Read the file up front so a retried request can send the same bytes again.
+    content_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+    with open(image_path, 'rb') as f:
+        return os.path.basename(image_path), f.read(), content_type
+
+
+def _parse_response(resp) -> dict:
+    if not resp.data:
+        raise RuntimeError('No image generated')
+    return {"image_bytes": resp.data[0].b64_json}
+
+
+def generate_redesign_image(prompt: str, image_path: str | None = None, image: tuple | None = None) -> dict:
     """Generate an image using OpenAI Images API.
-    If image_path is provided, perform an edit using the input image.
+    If image (a (filename, bytes, content_type) tuple) or image_path is provided,
+    perform an edit using the input image.
     Returns dict with keys: image_url or image_bytes (base64 string)
+    Raises BackendUnavailable when load is being shed or the circuit is open.
+    """
+    with image_limiter.slot(), image_breaker.guard():
+        if settings.OPENAI_IMAGE_BACKEND == 'stub':
+            return _generate_stub_image(prompt, image_path, image)
+        if image is None and image_path:
+            image = _read_image(image_path)
+        client = get_client()
+
+        def request(timeout):
+            if image:
+                return client.images.edit(model=IMAGE_MODEL, image=image, prompt=prompt, size=IMAGE_SIZE, timeout=timeout)
+            return client.images.generate(model=IMAGE_MODEL, prompt=prompt, size=IMAGE_SIZE, timeout=timeout)
+
+        return _parse_response(call_with_retry(request))
+
+
+async def agenerate_redesign_image(prompt: str, image_path: str | None = None, image: tuple | None = None) -> dict:
+    """Async version of generate_redesign_image for ASGI views."""
+    with image_limiter.slot(), image_breaker.guard():
+        if settings.OPENAI_IMAGE_BACKEND == 'stub':
+            if settings.OPENAI_STUB_DELAY:
+                await asyncio.sleep(settings.OPENAI_STUB_DELAY)
+            return await asyncio.to_thread(_render_stub_image, image_path, image)
+        if image is None and image_path:
+            image = await asyncio.to_thread(_read_image, image_path)
+        client = get_async_client()
+
+        def request(timeout):
+            if image:
+                return client.images.edit(model=IMAGE_MODEL, image=image, prompt=prompt, size=IMAGE_SIZE, timeout=timeout)
+            return client.images.generate(model=IMAGE_MODEL, prompt=prompt, size=IMAGE_SIZE, timeout=timeout)
+
+        return _parse_response(await acall_with_retry(request))
+
+
+def _generate_stub_image(prompt: str, image_path: str | None = None, image: tuple | None = None) -> dict:
+    """Local stand-in for the Images API (OPENAI_IMAGE_BACKEND=stub).
+    Returns the input photo cropped to 1024x1024 after OPENAI_STUB_DELAY seconds.
     """
-    if image_path:
-        with open(image_path, 'rb') as f:
-            resp = client.images.edits(
-                model="gpt-image-1",
-                image=f,
-                prompt=prompt,
-                size="1024x1024",
-            )
+    if settings.OPENAI_STUB_DELAY:
+        time.sleep(settings.OPENAI_STUB_DELAY)
+    return _render_stub_image(image_path, image)
+
+
+def _render_stub_image(image_path: str | None = None, image: tuple | None = None) -> dict:
+    source = io.BytesIO(image[1]) if image else image_path
+    if source:
+        with Image.open(source) as src:
+            result = ImageOps.fit(src.convert('RGB'), (1024, 1024))
     else:
-        resp = client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            size="1024x1024"
-        )
-    if not resp.data:
-        raise RuntimeError('No image generated')
-    image_b64 = resp.data[0].b64_json
-    return {"image_bytes": image_b64}
+        result = Image.new('RGB', (1024, 1024), (200, 200, 200))
+    buf = io.BytesIO()
+    result.save(buf, format='PNG')
+    return {"image_bytes": base64.b64encode(buf.getvalue()).decode()}
@@ -0,0 +1,69 @@
+"""Issuing and checking one-time codes.
+
+By default codes are OTP rows, looked up through the otp_lookup_idx index and deleted by
+`manage.py purge_otps` once expired or used. With OTP_CACHE_ENABLED they live only in the
+cache instead: one entry per live code, keyed by an HMAC of (purpose, email, code) and holding
+the user id, expiring after OTP_TTL. Verifying then needs no SQL: the code is consumed by
+deleting its entry, which succeeds for one caller only.
+
+Switching modes invalidates the codes issued in the other one.
+"""
+import hashlib
+import hmac
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .. import metrics
+from ..models import OTP
+from ..utils import generate_otp
+
+
+def _cache_key(email: str, code: str, purpose: str) -> str:
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), f"{purpose}:{email.lower()}:{code}".encode(), hashlib.sha256,
+    ).hexdigest()
+    return f"otp:{digest}"
+
+
+def issue(user, purpose: str) -> str:
+    """Create a code for user and return it (to be emailed)."""
+    code = generate_otp()
+    if settings.OTP_CACHE_ENABLED:
+        cache.set(_cache_key(user.email, code, purpose), user.pk, timeout=settings.OTP_TTL)
+    else:
+        OTP.objects.create(
+            user=user,
+            code=code,
+            purpose=purpose,
+            expires_at=timezone.now() + timedelta(seconds=settings.OTP_TTL),
+        )
+    metrics.incr(f"otp.{purpose}.issued")
+    return code
+
+
+def consume(email: str, code: str, purpose: str):
+    """Use up a live code; returns the id of the user it was issued to, or None if the code is
+    wrong, expired or already used.
+    """
+    if settings.OTP_CACHE_ENABLED:
+        key = _cache_key(email, code, purpose)
+        user_id = cache.get(key)
+        if user_id is not None and not cache.delete(key):
+            # Another request used it in between.
+            user_id = None
+    else:
+        user_id = None
+        otp = (
+            OTP.objects.filter(user__email=email, code=code, purpose=purpose, is_used=False)
+            .order_by('-created_at')
+            .values('id', 'user_id', 'expires_at')
+            .first()
+        )
+        if otp and timezone.now() <= otp['expires_at']:
+            # Conditional update, so concurrent requests cannot both use the same code.
+            if OTP.objects.filter(id=otp['id'], is_used=False).update(is_used=True):
+                user_id = otp['user_id']
+    metrics.incr(f"otp.{purpose}.{'accepted' if user_id is not None else 'rejected'}")
+    return user_id
@@ -0,0 +1,206 @@
+"""Daily and monthly generation quotas per tier.
+
+Guests are counted per client IP and per device (X-Device-Token), signed-in users per account,
+with the limits of their tier: 'free', or 'pro' while their UserSubscription is active. Counters are
+fixed UTC calendar windows in the Django cache, incremented atomically with cache.incr. The
+tier comes from the cached entitlement, read with the counters in a single get_many().
+
+Views check the quota before reading the upload (check) and take units when the work is
+actually started (consume), handing them back if the backend refuses it (refund). Redesign
+jobs are refunded wherever they fail, including in the worker (refund_job).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .. import metrics
+from ..utils import client_ip, quota_exceeded_response
+from ..subscriptions import entitlements
+from .guest_generation import device_id_from
+from .idempotency import guest_owner, has_record
+
+PERIODS = ('day', 'month')
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, tier: str, period: str, limit: int, reset_at: datetime):
+        detail = f"Generation limit reached: {limit} per {period} on the {tier} plan."
+        super().__init__(detail)
+        self.detail = detail
+        self.tier = tier
+        self.period = period
+        self.limit = limit
+        self.reset_at = reset_at
+        self.retry_after = max(1, int((reset_at - timezone.now()).total_seconds() + 0.5))
+
+
+def limits_for(tier: str) -> dict:
+    return {
+        'day': getattr(settings, f"QUOTA_{tier.upper()}_DAILY"),
+        'month': getattr(settings, f"QUOTA_{tier.upper()}_MONTHLY"),
+    }
+
+
+def window(period: str, now: datetime) -> tuple[str, datetime]:
+    """(id, end) of the UTC calendar day or month containing now."""
+    now = now.astimezone(dt_timezone.utc)
+    if period == 'day':
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime('%Y%m%d'), start + timedelta(days=1)
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start.strftime('%Y%m'), (start + timedelta(days=32)).replace(day=1)
+
+
+@dataclass
+class Counter:
+    period: str
+    limit: int
+    key: str
+    reset_at: datetime
+
+
+class GenerationQuota:
+    """The counters one generation request is charged against. The tier of a signed-in user
+    is looked up on first use.
+    """
+
+    def __init__(self, subjects: list[str], tier: str | None = None, user_id=None):
+        self.subjects = subjects
+        self.tier = tier
+        self.user_id = user_id
+        self.consumed = 0
+        self.charged_at = None
+
+    @classmethod
+    def for_request(cls, request, user=None):
+        user = user if user is not None else getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            # CachedJWTAuthentication users carry their tier.
+            return cls([f"user:{user.pk}"], tier=getattr(user, 'tier', None), user_id=user.pk)
+        subjects = [f"ip:{client_ip(request)}"]
+        device_id = device_id_from(request)
+        if device_id:
+            subjects.append(f"device:{device_id}")
+        return cls(subjects, tier='guest')
+
+    def counters(self, now: datetime | None = None) -> list[Counter]:
+        # Keys depend only on the subject and the window; the tier sets the limits (0 = none).
+        now = now or timezone.now()
+        counters = []
+        for subject in self.subjects:
+            # An IP can be shared by many guests (NAT, carrier networks); it gets its own limits.
+            tier = f"{self.tier}_ip" if subject.startswith('ip:') else self.tier
+            limits = limits_for(tier) if tier else {}
+            for period in PERIODS:
+                window_id, reset_at = window(period, now)
+                counters.append(Counter(period, limits.get(period, 0), f"quota:{subject}:{period}:{window_id}", reset_at))
+        return counters
+
+    def _load(self) -> dict:
+        """Current counts, and the tier if it is not known yet, in one cache round trip."""
+        keys = [c.key for c in self.counters()]
+        if self.tier is not None:
+            return cache.get_many(keys)
+        entitlement_key = entitlements.cache_key(self.user_id)
+        values = cache.get_many([entitlement_key, *keys])
+        self.tier = entitlements.tier_of(values.get(entitlement_key) or entitlements.load(self.user_id))
+        return values
+
+    def _exceeded(self, counter: Counter) -> QuotaExceeded:
+        metrics.incr(f"quota.{self.tier}.rejected")
+        return QuotaExceeded(self.tier, counter.period, counter.limit, counter.reset_at)
+
+    def check(self, cost: int = 1):
+        """Raise QuotaExceeded if cost more generations would go over a limit. Read-only."""
+        values = self._load()
+        for counter in self.counters():
+            if counter.limit and values.get(counter.key, 0) + cost > counter.limit:
+                raise self._exceeded(counter)
+
+    def consume(self, cost: int = 1):
+        """Atomically take cost units from every counter, or none if that would go over a limit."""
+        if self.tier is None:
+            self._load()
+        now = timezone.now()
+        taken = []
+        try:
+            for counter in self.counters(now):
+                if not counter.limit:
+                    continue
+                timeout = int((counter.reset_at - timezone.now()).total_seconds()) + 60
+                cache.add(counter.key, 0, timeout=timeout)
+                taken.append(counter)
+                if cache.incr(counter.key, cost) > counter.limit:
+                    raise self._exceeded(counter)
+        except QuotaExceeded:
+            for counter in taken:
+                cache.decr(counter.key, cost)
+            raise
+        self.consumed += cost
+        self.charged_at = now
+        metrics.incr(f"quota.{self.tier}.consumed", cost)
+
+    def refund(self, cost: int | None = None):
+        """Give back units for work that never ran (e.g. the backend refused it)."""
+        cost = self.consumed if cost is None else min(cost, self.consumed)
+        if not cost:
+            return
+        self.release(cost, self.charged_at)
+        self.consumed -= cost
+
+    def release(self, cost: int, charged_at: datetime):
+        """Take cost units off the counters of the windows containing charged_at. Windows that
+        have ended since are left alone; their units were never carried over.
+        """
+        now = timezone.now()
+        for counter in self.counters(charged_at):
+            if not counter.limit or counter.reset_at <= now:
+                continue
+            try:
+                cache.decr(counter.key, cost)
+            except ValueError:
+                # Expired along with its window.
+                pass
+
+
+def check_request_quota(request, user=None, idempotency_scope: str | None = None) -> GenerationQuota | None:
+    """The quota a generation request is charged against (None with QUOTA_ENABLED off).
+    Raises QuotaExceeded if it is already used up.
+    """
+    if not settings.QUOTA_ENABLED:
+        return None
+    quota = GenerationQuota.for_request(request, user)
+    # A retry of a request that used the last unit is answered from its stored record, so it
+    # skips the check; a key with no record yet is a new request like any other.
+    if not idempotency_scope or not has_record(request, idempotency_scope, quota.user_id or guest_owner(request)):
+        quota.check()
+    return quota
+
+
+def refund_job(redesign):
+    """Give back the unit a failed redesign was charged when it was created."""
+    if settings.QUOTA_ENABLED:
+        GenerationQuota([f"user:{redesign.user_id}"], tier=redesign.tier).release(1, redesign.created_at)
+
+
+class GenerationQuotaMixin:
+    """For DRF generation views: reject over-quota requests with 429 after authentication,
+    before the upload is read (list it after BoundedImageUploadMixin). The view consumes the
+    quota (request.quota) once it starts work. Views that take an Idempotency-Key name its
+    scope in idempotency_scope.
+    """
+    idempotency_scope = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        request.quota = (
+            check_request_quota(request, idempotency_scope=self.idempotency_scope)
+            if request.method == 'POST' else None
+        )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, QuotaExceeded):
+            return quota_exceeded_response(exc)
+        return super().handle_exception(exc)
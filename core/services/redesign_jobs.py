@@ -0,0 +1,209 @@
+import asyncio
+import logging
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ..models import RoomRedesign
+from . import job_scheduler
+from .circuit_breaker import BackendUnavailable
+from .generation import agenerate_result_bytes, generate_result_bytes, lookup_generation
+from .image_pipeline import PreparedImage, prepare_for_edit
+from .openai_service import image_breaker
+from .quotas import refund_job
+from .renditions import ensure_renditions
+from .result_encoding import encode_result, save_variants
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseJobBackend:
+    """Uses the RoomRedesign table itself as the queue.
+    Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    worker processes can poll the same table without handing out a job twice.
+    Within a tier jobs run oldest first; which tier goes next is up to job_scheduler.
+    """
+
+    def enqueue(self, redesign):
+        # The pending row is the job; there is nothing else to publish.
+        pass
+
+    def claim(self, worker_id: str):
+        """The next job, taken from the tier job_scheduler picks, or None if nothing can run."""
+        stale_before = timezone.now() - timedelta(seconds=settings.REDESIGN_JOB_TIMEOUT)
+        claimable = Q(status='pending') | Q(status='processing', started_at__lt=stale_before)
+        running_now = Q(status='processing', started_at__gte=stale_before)
+
+        def count():
+            counts = (
+                RoomRedesign.objects.filter(status__in=('pending', 'processing'))
+                .values('tier')
+                .annotate(queued=Count('id', filter=claimable), running=Count('id', filter=running_now))
+            )
+            return {row['tier']: row['queued'] for row in counts}, {row['tier']: row['running'] for row in counts}
+
+        queued, running = job_scheduler.depths(count)
+        eligible = job_scheduler.eligible_tiers(queued, running)
+        # The snapshot may be a few seconds old: tiers it shows as idle or full are tried last
+        # rather than skipped, so new work is not held back until the next recount.
+        others = [tier for tier, _ in RoomRedesign.TIER_CHOICES if tier not in eligible]
+        for tier in job_scheduler.pick_order(eligible) + others:
+            limit = job_scheduler.tier_limit(tier)
+            # Racing workers can still overshoot a limit by one job each.
+            if limit and RoomRedesign.objects.filter(running_now, tier=tier).count() >= limit:
+                continue
+            job = self._claim_from(tier, claimable, worker_id)
+            if job is not None:
+                job_scheduler.record_start(job)
+                return job
+        return None
+
+    def _claim_from(self, tier: str, claimable, worker_id: str):
+        while True:
+            with transaction.atomic():
+                job = (
+                    RoomRedesign.objects.select_for_update(skip_locked=True)
+                    .filter(claimable, tier=tier)
+                    .order_by('created_at', 'id')
+                    .first()
+                )
+                if job is None:
+                    return None
+                if job.attempts >= settings.REDESIGN_JOB_MAX_ATTEMPTS:
+                    # A worker died or hung on this job too many times; give up on it.
+                    _fail(job, 'Job timed out')
+                    continue
+                job.status = 'processing'
+                job.attempts += 1
+                job.worker_id = worker_id
+                job.started_at = timezone.now()
+                job.save(update_fields=['status', 'attempts', 'worker_id', 'started_at'])
+                return job
+
+
+def get_job_backend():
+    return import_string(settings.REDESIGN_JOB_BACKEND)()
+
+
+def enqueue_redesign(redesign):
+    """Queue a pending redesign, or run it inline when REDESIGN_JOBS_EAGER is set."""
+    if settings.REDESIGN_JOBS_EAGER:
+        redesign.status = 'processing'
+        redesign.attempts += 1
+        redesign.started_at = timezone.now()
+        redesign.save(update_fields=['status', 'attempts', 'started_at'])
+        try:
+            run_redesign_job(redesign)
+        except BackendUnavailable as exc:
+            # No worker will pick it up later in eager mode.
+            _fail(redesign, exc.detail)
+            raise
+        return
+    get_job_backend().enqueue(redesign)
+
+
+def _complete(redesign, image_bytes: bytes | None, generation):
+    if image_bytes:
+        encoded = encode_result(image_bytes)
+        image_file = ContentFile(encoded.content, name=f"redesign_{redesign.id}.{encoded.extension}")
+        redesign.result_image.save(image_file.name, image_file, save=False)
+        save_variants(redesign.result_image.name, redesign.result_image.storage, encoded)
+        redesign.result_formats = ','.join(encoded.formats)
+        generation.store(redesign.result_image.name)
+    redesign.status = 'completed'
+    redesign.error = ''
+    redesign.finished_at = timezone.now()
+    redesign.save()
+    # Pre-build the history thumbnails; the serializer would otherwise do it on first read.
+    ensure_renditions(redesign.original_image.name, redesign.original_image.storage)
+    if redesign.result_image:
+        ensure_renditions(redesign.result_image.name, redesign.result_image.storage)
+
+
+def _fail(redesign, error: str):
+    redesign.status = 'failed'
+    redesign.error = error
+    redesign.finished_at = timezone.now()
+    redesign.save(update_fields=['status', 'error', 'finished_at'])
+    # Failed generations, inline or in a worker, do not count against the quota.
+    refund_job(redesign)
+
+
+def _prepared_input(redesign):
+    # Batch members share the source their batch preprocessed once.
+    if redesign.batch_id:
+        batch = redesign.batch
+        if batch.prepared_image:
+            return PreparedImage.from_stored(batch.prepared_image)
+    return prepare_for_edit(redesign.original_image.path)
+
+
+def run_redesign_job(redesign):
+    """Generate the result for a claimed job and record the outcome on the row.
+    If the backend is unavailable the job goes back to pending and BackendUnavailable is raised.
+    """
+    try:
+        generation = lookup_generation(_prepared_input(redesign), redesign.style_choice)
+        image_bytes = generate_result_bytes(generation, redesign.prompt)
+        _complete(redesign, image_bytes, generation)
+    except BackendUnavailable:
+        # Not the job's fault; put it back without using up an attempt.
+        redesign.status = 'pending'
+        redesign.attempts = max(0, redesign.attempts - 1)
+        redesign.worker_id = ''
+        redesign.save(update_fields=['status', 'attempts', 'worker_id'])
+        raise
+    except Exception as e:
+        logger.exception('Redesign job %s failed', redesign.id)
+        _fail(redesign, str(e))
+
+
+async def arun_redesign_job(redesign, prepared=None):
+    """Run a redesign inline on the event loop (ASGI views).
+    CPU and storage work goes to threads; the backend call is awaited. There is no worker
+    to retry later, so BackendUnavailable fails the job and is re-raised.
+    """
+    try:
+        if prepared is None:
+            prepared = await asyncio.to_thread(prepare_for_edit, redesign.original_image.path)
+        generation = await sync_to_async(lookup_generation)(prepared, redesign.style_choice)
+        image_bytes = await agenerate_result_bytes(generation, redesign.prompt)
+        await sync_to_async(_complete)(redesign, image_bytes, generation)
+    except BackendUnavailable as exc:
+        await sync_to_async(_fail)(redesign, exc.detail)
+        raise
+    except Exception as e:
+        logger.exception('Redesign job %s failed', redesign.id)
+        await sync_to_async(_fail)(redesign, str(e))
+
+
+def work(worker_id: str, stop_event, poll_interval: float, burst: bool = False):
+    """Worker loop: claim and run jobs until stop_event is set.
+    With burst=True the loop exits as soon as the queue is empty.
+    """
+    backend = get_job_backend()
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if image_breaker.state() == 'open':
+                stop_event.wait(poll_interval)
+                continue
+            job = backend.claim(worker_id)
+            if job is None:
+                if burst:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            logger.info('Worker %s processing redesign %s', worker_id, job.id)
+            try:
+                run_redesign_job(job)
+            except BackendUnavailable as exc:
+                logger.warning('Worker %s backing off for %ss: %s', worker_id, exc.retry_after, exc.detail)
+                stop_event.wait(exc.retry_after)
+    finally:
+        connection.close()
@@ -0,0 +1,78 @@
+import hashlib
+import io
+import logging
+import posixpath
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def rendition_name(name: str, size: int) -> str:
+    # uploads/results/redesign_1.png -> uploads/results/renditions/redesign_1_256.webp
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', f"{stem}_{size}.webp")
+
+
+def _cache_key(name: str) -> str:
+    return 'renditions:' + hashlib.sha1(name.encode()).hexdigest()
+
+
+def ensure_renditions(name: str, storage) -> bool:
+    """Make sure every IMAGE_RENDITION_SIZES rendition of name exists, generating the missing ones
+    from a single decode of the source. Returns False if the source cannot be read.
+    """
+    key = _cache_key(name)
+    if cache.get(key):
+        return True
+    # Renditions are derived files named after their source; write them next to it, outside any
+    # content addressing the source's storage applies.
+    storage = getattr(storage, 'base', storage)
+    sizes = settings.IMAGE_RENDITION_SIZES
+    missing = [size for size in sizes if not storage.exists(rendition_name(name, size))]
+    if missing:
+        try:
+            with storage.open(name, 'rb') as f, Image.open(f) as src:
+                image = ImageOps.exif_transpose(src).convert('RGB')
+        except (OSError, ValueError):
+            logger.warning('Cannot build renditions for %s', name, exc_info=True)
+            return False
+        # Shrink largest-first so each step resamples an already smaller image.
+        for size in sorted(missing, reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            image.save(buf, format='WEBP', quality=settings.IMAGE_RENDITION_QUALITY, method=4)
+            target = rendition_name(name, size)
+            saved = storage.save(target, ContentFile(buf.getvalue()))
+            if saved != target:
+                # Another request generated it concurrently; keep theirs.
+                storage.delete(saved)
+    cache.set(key, True, timeout=settings.IMAGE_RENDITION_CACHE_TTL)
+    return True
+
+
+def delete_renditions(name: str, storage):
+    for size in settings.IMAGE_RENDITION_SIZES:
+        storage.delete(rendition_name(name, size))
+    cache.delete(_cache_key(name))
+
+
+def rendition_urls_for(name: str, storage, request=None) -> dict:
+    """{size: url} for a stored image, generating renditions lazily on first use."""
+    if not name or not ensure_renditions(name, storage):
+        return {}
+    urls = {}
+    for size in settings.IMAGE_RENDITION_SIZES:
+        url = storage.url(rendition_name(name, size))
+        urls[str(size)] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def rendition_urls(field_file, request=None) -> dict:
+    """{size: url} for an ImageField value."""
+    if not field_file:
+        return {}
+    return rendition_urls_for(field_file.name, field_file.storage, request)
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+
+from .. import metrics
+from ..models import ResultCacheEntry
+from .openai_service import PROMPT_TEMPLATE
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(image_bytes: bytes, style_choice: str) -> str:
+    """Digest of the preprocessed input (already upright, cropped and metadata-free),
+    the style and the prompt template.
+    """
+    digest = hashlib.sha256()
+    digest.update(image_bytes)
+    digest.update(b'\0' + style_choice.encode())
+    digest.update(b'\0' + PROMPT_TEMPLATE.encode())
+    return digest.hexdigest()
+
+
+def get_bytes(key: str) -> bytes | None:
+    """Return the cached result for key, or None on a miss."""
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    entry = ResultCacheEntry.objects.filter(key=key).first()
+    if entry is not None:
+        expired = entry.created_at < timezone.now() - timedelta(seconds=settings.RESULT_CACHE_TTL)
+        if expired or not default_storage.exists(entry.result_path):
+            entry.delete()
+            entry = None
+    if entry is None:
+        metrics.incr('result_cache.miss')
+        return None
+    ResultCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    metrics.incr('result_cache.hit')
+    with default_storage.open(entry.result_path, 'rb') as f:
+        return f.read()
+
+
+def store(key: str, style_choice: str, result_path: str):
+    if not settings.RESULT_CACHE_ENABLED:
+        return
+    ResultCacheEntry.objects.update_or_create(
+        key=key,
+        defaults={'style_choice': style_choice, 'result_path': result_path, 'last_used_at': timezone.now()},
+    )
+    # The sweep counts the table; run it on a sample of stores, not on every generation.
+    every = settings.RESULT_CACHE_EVICT_EVERY
+    if every and random.randrange(every) == 0:
+        evict()
+
+
+def evict() -> int:
+    """Drop expired entries, then the least recently used ones above RESULT_CACHE_MAX_ENTRIES,
+    and return how many went. Only the index rows are removed; the result files belong to the
+    redesigns that produced them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RESULT_CACHE_TTL)
+    expired, _ = ResultCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+    overflow = ResultCacheEntry.objects.count() - settings.RESULT_CACHE_MAX_ENTRIES
+    evicted = 0
+    if overflow > 0:
+        ids = list(ResultCacheEntry.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow])
+        evicted, _ = ResultCacheEntry.objects.filter(id__in=ids).delete()
+    if expired or evicted:
+        metrics.incr('result_cache.evicted', expired + evicted)
+    return expired + evicted
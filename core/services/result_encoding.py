@@ -0,0 +1,163 @@
+import io
+import logging
+import posixpath
+from dataclasses import dataclass, field
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .. import metrics
+
+try:
+    # Optional: AVIF for Pillow versions without built-in support.
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'webp': 'image/webp', 'avif': 'image/avif', 'png': 'image/png', 'jpg': 'image/jpeg'}
+# Formats RESULT_IMAGE_FORMAT can name.
+RESULT_FORMATS = ('webp', 'avif', 'png')
+# Smallest first: the order in which formats are offered to clients that accept them.
+PREFERENCE = ('avif', 'webp')
+
+
+def avif_supported() -> bool:
+    Image.init()
+    return 'AVIF' in Image.SAVE
+
+
+def result_format() -> str:
+    """RESULT_IMAGE_FORMAT, lowercased; AVIF falls back to WebP where Pillow cannot write it."""
+    fmt = settings.RESULT_IMAGE_FORMAT.lower()
+    if fmt not in RESULT_FORMATS:
+        raise ImproperlyConfigured(
+            f"RESULT_IMAGE_FORMAT must be one of {', '.join(f.upper() for f in RESULT_FORMATS)}, "
+            f"not {settings.RESULT_IMAGE_FORMAT!r}"
+        )
+    if fmt == 'avif' and not avif_supported():
+        return 'webp'
+    return fmt
+
+
+# Fail at startup rather than on every result.
+if result_format() != settings.RESULT_IMAGE_FORMAT.lower():
+    logger.warning('RESULT_IMAGE_FORMAT is AVIF but this Pillow cannot write it; storing WebP instead '
+                   '(pip install pillow-avif-plugin)')
+
+
+@dataclass
+class EncodedResult:
+    """A generated result ready to store: the primary file plus extra formats kept next to it."""
+    extension: str
+    content: bytes
+    source_bytes: int
+    variants: dict = field(default_factory=dict)
+
+    @property
+    def formats(self) -> list:
+        return [self.extension, *self.variants]
+
+
+def _encode(image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buf, format='WEBP', quality=settings.RESULT_IMAGE_QUALITY, method=4)
+    elif fmt == 'avif':
+        image.save(buf, format='AVIF', quality=settings.RESULT_AVIF_QUALITY)
+    else:
+        image.save(buf, format='PNG', compress_level=6)
+    return buf.getvalue()
+
+
+def encode_result(image_bytes: bytes) -> EncodedResult:
+    """Encode a result (PNG from the Images API, or cached bytes) as RESULT_IMAGE_FORMAT, plus
+    AVIF when enabled and supported, plus the PNG itself when RESULT_KEEP_PNG_MASTER is on.
+    """
+    primary = result_format()
+    with Image.open(io.BytesIO(image_bytes)) as src:
+        source_format = (src.format or '').lower()
+        image = src.convert('RGB')
+    content = image_bytes if source_format == primary else _encode(image, primary)
+    encoded = EncodedResult(extension=primary, content=content, source_bytes=len(image_bytes))
+    if settings.RESULT_AVIF_ENABLED and primary != 'avif' and avif_supported():
+        encoded.variants['avif'] = _encode(image, 'avif')
+    if settings.RESULT_KEEP_PNG_MASTER and primary != 'png' and source_format == 'png':
+        encoded.variants['png'] = image_bytes
+
+    metrics.incr('results.bytes_source', encoded.source_bytes)
+    metrics.incr(f"results.bytes_{primary}", len(content))
+    metrics.incr('results.bytes_saved', encoded.source_bytes - len(content))
+    for fmt, data in encoded.variants.items():
+        metrics.incr(f"results.bytes_{fmt}", len(data))
+    logger.info('Encoded result: %s %d bytes -> %s', source_format or 'unknown', encoded.source_bytes,
+                ', '.join(f"{fmt} {len(data)}" for fmt, data in [(primary, content), *encoded.variants.items()]))
+    return encoded
+
+
+def variant_name(name: str, fmt: str) -> str:
+    # uploads/results/redesign_1.webp -> uploads/results/variants/redesign_1.avif
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'variants', f"{posixpath.splitext(filename)[0]}.{fmt}")
+
+
+def save_variants(name: str, storage, encoded: EncodedResult):
+    """Store the extra formats next to the primary file saved as name."""
+    # Variants are derived from the primary; write them outside any content addressing.
+    storage = getattr(storage, 'base', storage)
+    for fmt, data in encoded.variants.items():
+        target = variant_name(name, fmt)
+        if not storage.exists(target):
+            storage.save(target, ContentFile(data))
+
+
+def delete_variants(name: str, storage):
+    for fmt in CONTENT_TYPES:
+        storage.delete(variant_name(name, fmt))
+
+
+def formats_of(name: str, formats: str) -> list:
+    """Stored formats of a result: the comma-separated field value, or the file's own extension."""
+    if formats:
+        return formats.split(',')
+    return [posixpath.splitext(name)[1].lstrip('.').lower()]
+
+
+def _quality(params: list) -> float:
+    for param in params:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate(accept: str, formats: list) -> str:
+    """Pick the format to send a client: AVIF or WebP if its Accept header lists them, PNG if it
+    lists other image types only, else the primary format. Types with q=0 count as refused.
+    """
+    image_types = set()
+    for part in accept.split(','):
+        media_type, *params = [p.strip() for p in part.split(';')]
+        media_type = media_type.lower()
+        if media_type.startswith('image/') and _quality(params) > 0:
+            image_types.add(media_type)
+    for fmt in PREFERENCE:
+        if fmt in formats and CONTENT_TYPES[fmt] in image_types:
+            return fmt
+    if image_types and 'png' in formats:
+        return 'png'
+    return formats[0]
+
+
+def negotiated_name(name: str, formats: str, request=None) -> str:
+    """name, or the stored variant of it best matching the request's Accept header."""
+    if not name:
+        return name
+    available = formats_of(name, formats)
+    fmt = negotiate(request.headers.get('Accept', '') if request is not None else '', available)
+    return name if fmt == available[0] else variant_name(name, fmt)
@@ -0,0 +1,146 @@
+import hashlib
+import posixpath
+from django.conf import settings
+from django.core.files.storage import Storage, default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from . import metrics
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    """Wraps another storage (default_storage) and names every saved file after the SHA-256
+    of its bytes, e.g. cas/3f/a2/3fa2...e1.jpg, so identical uploads are stored once.
+
+    Each name has a StoredBlob row counting the model fields that point at it. save() adds a
+    reference, retain() adds one for a field that reuses an existing name, and delete() drops
+    one; the file is only removed with its last reference. Names outside the prefix (media
+    saved before the switch) are passed straight through to the wrapped storage.
+
+    Files are removed once the transaction that dropped the last reference commits, so a rollback
+    never loses a file that is still referenced. A new file has to be written straight away (the
+    request goes on to read it); if its transaction then rolls back, the file has no StoredBlob row
+    and `manage.py purge_orphan_blobs` deletes it.
+    """
+
+    def __init__(self, base=None, prefix='cas'):
+        self._base = base
+        self.prefix = prefix
+
+    @property
+    def base(self):
+        return self._base or default_storage
+
+    def is_blob(self, name: str) -> bool:
+        return bool(name) and name.startswith(self.prefix + '/')
+
+    def blob_name(self, digest: str, name: str) -> str:
+        ext = posixpath.splitext(name)[1].lower()
+        return f"{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save.
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        blob_name = self.blob_name(digest.hexdigest(), name)
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                name=blob_name, defaults={'size': size, 'refcount': 0},
+            )
+            if created or not self.base.exists(blob_name):
+                content.seek(0)
+                saved = self.base.save(blob_name, content)
+                if saved != blob_name:
+                    raise OSError(f"Storage renamed content-addressed file {blob_name} to {saved}")
+            else:
+                metrics.incr('media.dedup_hits')
+                metrics.incr('media.dedup_bytes', size)
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+        return blob_name
+
+    def retain(self, name: str, count: int = 1):
+        """Count count more references to an already stored name."""
+        from .models import StoredBlob
+
+        if self.is_blob(name) and count > 0:
+            StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + count)
+
+    def release(self, name: str) -> bool:
+        """Drop one reference to name. Returns True if that was the last one, in which case the
+        file is deleted when the current transaction commits.
+        """
+        from .models import StoredBlob
+
+        if not self.is_blob(name):
+            transaction.on_commit(lambda: self.base.delete(name))
+            return True
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return False
+            if blob is not None:
+                blob.delete()
+        transaction.on_commit(lambda: self._delete_unreferenced(name))
+        return True
+
+    def _delete_unreferenced(self, name: str):
+        from .models import StoredBlob
+
+        # The same bytes may have been saved again since the last reference went.
+        if not StoredBlob.objects.filter(name=name).exists():
+            self.base.delete(name)
+
+    def is_orphan(self, name: str) -> bool:
+        """True for a stored blob file that no StoredBlob row accounts for."""
+        from .models import StoredBlob
+
+        return self.is_blob(name) and not StoredBlob.objects.filter(name=name).exists()
+
+    def delete(self, name):
+        self.release(name)
+
+    def _open(self, name, mode='rb'):
+        return self.base.open(name, mode)
+
+    def exists(self, name):
+        return self.base.exists(name)
+
+    def path(self, name):
+        return self.base.path(name)
+
+    def url(self, name):
+        return self.base.url(name)
+
+    def size(self, name):
+        return self.base.size(name)
+
+    def listdir(self, path):
+        return self.base.listdir(path)
+
+    def get_accessed_time(self, name):
+        return self.base.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.base.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.base.get_modified_time(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage for user media fields: content-addressed unless MEDIA_CONTENT_ADDRESSED is off."""
+    return content_addressed_storage if settings.MEDIA_CONTENT_ADDRESSED else default_storage
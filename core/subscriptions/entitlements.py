@@ -0,0 +1,60 @@
+# app/subscriptions/entitlements.py
+"""Cached, read-only view of a user's subscription.
+
+The entitlement ({'active', 'expires_at', 'subscription'}) is loaded once and kept in the
+shared cache; saving or deleting the UserSubscription drops it. Expiry is applied when it is
+read, so a cached entry never reports pro past expires_at, and expire_subscriptions flips
+the stored flag in bulk.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserSubscription
+from .serializers import SubscriptionSerializer
+
+
+def cache_key(user_id) -> str:
+    return f"entitlement:{user_id}"
+
+
+def load(user_id) -> dict:
+    sub = UserSubscription.objects.filter(user_id=user_id).first()
+    entitlement = {
+        'active': bool(sub and sub.active),
+        'expires_at': sub.expires_at if sub else None,
+        'subscription': dict(SubscriptionSerializer(sub or UserSubscription(user_id=user_id)).data),
+    }
+    cache.set(cache_key(user_id), entitlement, timeout=settings.ENTITLEMENT_CACHE_TTL)
+    return entitlement
+
+
+def get(user_id) -> dict:
+    return cache.get(cache_key(user_id)) or load(user_id)
+
+
+def is_active(entitlement: dict) -> bool:
+    expires_at = entitlement['expires_at']
+    return entitlement['active'] and (expires_at is None or expires_at > timezone.now())
+
+
+def is_pro(user_id) -> bool:
+    return is_active(get(user_id))
+
+
+def tier_of(entitlement: dict) -> str:
+    return 'pro' if is_active(entitlement) else 'free'
+
+
+def user_tier(user_id) -> str:
+    """'free' or 'pro', for quotas and job scheduling."""
+    return tier_of(get(user_id))
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def forget(sender, instance, **kwargs):
+    # post_save/post_delete receiver for UserSubscription (see CoreConfig.ready).
+    invalidate(instance.user_id)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['active', 'expires_at'], name='subscription_expiry_idx'),
+        ),
+    ]
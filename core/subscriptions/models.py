@@ -12,5 +12,11 @@ class UserSubscription(models.Model):
     platform = models.CharField(max_length=16, choices=PLATFORM_CHOICES, blank=True, default='')
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # expire_subscriptions: UPDATE ... WHERE active AND expires_at <= now.
+            models.Index(fields=['active', 'expires_at'], name='subscription_expiry_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user} | {self.product_id} | active={self.active}'
\ No newline at end of file
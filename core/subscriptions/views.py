@@ -2,7 +2,7 @@
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status, generics
-from django.utils import timezone
+from . import entitlements
 from .models import UserSubscription
 from .serializers import SubscriptionSerializer, SubscriptionSyncSerializer
 
@@ -10,14 +10,12 @@ class SubscriptionView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        sub, _ = UserSubscription.objects.get_or_create(user=request.user)
-        # Optional auto-expiry check
-        if sub.expires_at and sub.expires_at < timezone.now():
-            sub.active = False
-            sub.save(update_fields=['active'])
+        # Read-only: the cached entitlement, with expiry applied (expire_subscriptions stores it).
+        entitlement = entitlements.get(request.user.pk)
+        is_pro = entitlements.is_active(entitlement)
         return Response({
-            'is_pro': bool(sub.active),
-            'subscription': SubscriptionSerializer(sub).data
+            'is_pro': is_pro,
+            'subscription': {**entitlement['subscription'], 'active': is_pro}
         })
 
 class SubscriptionSyncView(generics.GenericAPIView):
@@ -29,11 +27,12 @@ class SubscriptionSyncView(generics.GenericAPIView):
         # In production, verify purchase server-side with Google/Apple before trusting client.
         ser = self.get_serializer(data=request.data)
         ser.is_valid(raise_exception=True)
-        sub, _ = UserSubscription.objects.get_or_create(user=request.user)
+        sub, _ = UserSubscription.objects.get_or_create(user_id=request.user.pk)
         sub.active = ser.validated_data['active']
         sub.product_id = ser.validated_data.get('product_id', sub.product_id)
         sub.platform = ser.validated_data.get('platform', sub.platform) or ''
         sub.expires_at = ser.validated_data.get('expires_at', sub.expires_at)
+        # Saving drops the cached entitlement (entitlements.forget).
         sub.save()
         return Response({
             'is_pro': bool(sub.active),
@@ -0,0 +1,47 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import snapshots
+from core.models import User
+from core.subscriptions.models import UserSubscription
+
+
+class SnapshotInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member@example.com', 'pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.key = str(self.user.pk)
+
+    def authenticate(self):
+        return self.client.get('/api/history/').status_code
+
+    def test_requests_after_the_first_use_the_snapshot(self):
+        self.assertEqual(self.authenticate(), 200)
+        self.assertEqual(snapshots.get(self.key)['tier'], 'free')
+        with self.assertNumQueries(1):  # The history page itself.
+            self.assertEqual(self.authenticate(), 200)
+
+    def test_saving_the_user_drops_the_snapshot(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(snapshots.get(self.key))
+        self.assertEqual(self.authenticate(), 401)
+
+    def test_saving_the_subscription_drops_the_snapshot(self):
+        self.authenticate()
+        subscription = UserSubscription.objects.create(user=self.user, active=True)
+        self.assertIsNone(snapshots.get(self.key))
+        self.authenticate()
+        self.assertEqual(snapshots.get(self.key)['tier'], 'pro')
+        subscription.delete()
+        self.assertIsNone(snapshots.get(self.key))
+
+    def test_works_without_the_newer_simplejwt_settings(self):
+        with mock.patch('core.authentication.jwt_settings', spec=['USER_ID_CLAIM'], USER_ID_CLAIM='user_id'):
+            self.assertEqual(self.authenticate(), 200)
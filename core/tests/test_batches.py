@@ -0,0 +1,50 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.models import StoredBlob, User
+from core.services import batches
+
+
+def photo() -> SimpleUploadedFile:
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), 'blue').save(buf, format='JPEG')
+    return SimpleUploadedFile('room.jpg', buf.getvalue(), content_type='image/jpeg')
+
+
+class CreateBatchTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('batch@example.com', 'pw')
+
+    def test_preprocesses_outside_the_transaction(self):
+        depth = len(connection.atomic_blocks)
+        depths = []
+        prepare = batches.prepare_for_edit
+
+        def spy(path):
+            depths.append(len(connection.atomic_blocks))
+            return prepare(path)
+
+        with mock.patch.object(batches, 'prepare_for_edit', spy):
+            batch, _, redesigns = batches.create_batch(self.user, photo(), ['modern', 'luxury'])
+        self.assertEqual(depths, [depth])
+        refcounts = dict(StoredBlob.objects.values_list('name', 'refcount'))
+        self.assertEqual(refcounts, {batch.original_image.name: 3, batch.prepared_image.name: 1})
+        self.assertEqual({r.original_image.name for r in redesigns}, {batch.original_image.name})
+
+    def test_failure_releases_the_stored_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(batches, 'build_redesign_prompt', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    batches.create_batch(self.user, photo(), ['modern'])
+        self.assertFalse(StoredBlob.objects.exists())
@@ -0,0 +1,147 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.services import circuit_breaker
+from core.services.circuit_breaker import BackendUnavailable, CircuitBreaker, InflightLimiter
+from core.services.openai_service import image_breaker
+
+BREAKER = dict(
+    CIRCUIT_WINDOW=4, CIRCUIT_MIN_CALLS=4, CIRCUIT_ERROR_RATE=0.5, CIRCUIT_SLOW_CALL_SECONDS=10,
+    CIRCUIT_SLOW_CALL_RATE=0.5, CIRCUIT_OPEN_SECONDS=30, OPENAI_DEADLINE=60,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+
+@override_settings(**BREAKER)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        patcher = mock.patch.object(circuit_breaker, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', is_failure=lambda exc: isinstance(exc, IOError))
+
+    def call(self, fails=False, seconds=0.0):
+        try:
+            with self.breaker.guard():
+                self.clock.now += seconds
+                if fails:
+                    raise IOError('backend down')
+        except IOError:
+            pass
+
+    def trip(self):
+        for fails in (False, True, False, True):
+            self.call(fails)
+
+    def test_opens_at_the_error_rate_once_enough_calls_are_seen(self):
+        for _ in range(3):
+            self.call(fails=True)
+        self.assertEqual(self.breaker.state(), 'closed')  # below CIRCUIT_MIN_CALLS
+        self.call()
+        self.assertEqual(self.breaker.state(), 'open')
+        with self.assertRaises(BackendUnavailable) as ctx:
+            self.breaker.before_call()
+        self.assertEqual(ctx.exception.retry_after, 30)
+
+    def test_slow_calls_open_it_too(self):
+        for seconds in (0, 11, 0, 11):
+            self.call(seconds=seconds)
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_half_open_probe_success_closes(self):
+        self.trip()
+        self.clock.now += 31
+        self.assertEqual(self.breaker.state(), 'half_open')
+        self.assertTrue(self.breaker.before_call())
+        # Only one probe at a time; the others keep failing fast.
+        with self.assertRaises(BackendUnavailable):
+            self.breaker.before_call()
+        self.breaker.record(False, 0.1, probe=True)
+        self.assertEqual(self.breaker.state(), 'closed')
+        self.call()
+
+    def test_half_open_probe_failure_reopens(self):
+        self.trip()
+        self.clock.now += 31
+        self.call(fails=True)
+        self.assertEqual(self.breaker.state(), 'open')
+        with self.assertRaises(BackendUnavailable) as ctx:
+            self.breaker.before_call()
+        self.assertEqual(ctx.exception.retry_after, 30)
+
+    def test_client_errors_do_not_count(self):
+        for _ in range(4):
+            try:
+                with self.breaker.guard():
+                    raise ValueError('bad request')
+            except ValueError:
+                pass
+        self.assertEqual(self.breaker.state(), 'closed')
+
+
+@override_settings(IMAGE_MAX_INFLIGHT=2, IMAGE_SHED_RETRY_AFTER=5)
+class InflightLimiterTests(SimpleTestCase):
+    def test_sheds_calls_over_the_limit(self):
+        limiter = InflightLimiter('test')
+        with limiter.slot(), limiter.slot():
+            with self.assertRaises(BackendUnavailable) as ctx:
+                with limiter.slot():
+                    pass
+            self.assertEqual(ctx.exception.retry_after, 5)
+        with limiter.slot():
+            pass
+
+    def test_slots_are_returned_on_errors(self):
+        limiter = InflightLimiter('test')
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                with limiter.slot():
+                    raise RuntimeError
+        self.assertEqual(limiter._inflight, 0)
+
+
+@override_settings(QUOTA_ENABLED=False, RATE_LIMIT_ENABLED=False, RESULT_CACHE_ENABLED=False, **BREAKER)
+class UnavailableResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+
+    def generate(self):
+        buf = io.BytesIO()
+        Image.new('RGB', (64, 64), 'green').save(buf, format='JPEG')
+        buf.name = 'room.jpg'
+        buf.seek(0)
+        return APIClient().post('/api/guest/generate/', {'style_choice': 'modern', 'original_image': buf})
+
+    def test_open_circuit_is_a_503_with_retry_after(self):
+        image_breaker._open()
+        response = self.generate()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(IMAGE_MAX_INFLIGHT=0, IMAGE_SHED_RETRY_AFTER=5)
+    def test_shed_load_is_a_503_with_retry_after(self):
+        response = self.generate()
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '5'))
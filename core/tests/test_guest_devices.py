@@ -0,0 +1,113 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import GuestGeneration, User
+from core.services import otp_store
+from core.services.guest_generation import device_id_from, device_token
+
+
+def guest_row(device_id, uid):
+    return GuestGeneration.objects.create(
+        uid=uid, device_id=device_id, style_choice='modern', input_path=f"uploads/guest/{uid}.jpg",
+        expires_at=timezone.now() + timedelta(hours=1),
+    )
+
+
+class DeviceTokenTests(TestCase):
+    def test_only_a_signed_token_names_a_device(self):
+        factory = RequestFactory()
+        self.assertEqual(device_id_from(factory.get('/', HTTP_X_DEVICE_TOKEN=device_token('abc'))), 'abc')
+        self.assertEqual(device_id_from(factory.get('/', HTTP_X_DEVICE_ID='abc')), '')
+        self.assertEqual(device_id_from(factory.get('/', HTTP_X_DEVICE_TOKEN='abc')), '')
+        self.assertEqual(device_id_from(factory.get('/', HTTP_X_DEVICE_TOKEN='abc:forged')), '')
+
+    def test_a_bare_device_id_cannot_read_another_devices_history(self):
+        guest_row('victim', 'a' * 32)
+        client = APIClient()
+        for headers in ({'HTTP_X_DEVICE_ID': 'victim'}, {'HTTP_X_DEVICE_TOKEN': 'victim'}):
+            response = client.get('/api/guest/history/', **headers)
+            self.assertEqual(response.json()['results'], [])
+        response = client.get('/api/guest/history/', HTTP_X_DEVICE_TOKEN=device_token('victim'))
+        self.assertEqual([row['id'] for row in response.json()['results']], ['a' * 32])
+
+
+@override_settings(OTP_CACHE_ENABLED=False, MAIL_QUEUE_EAGER=False, RATE_LIMIT_ENABLED=False)
+class MergeOnVerifyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.row = guest_row('device-1', 'b' * 32)
+        response = self.client.post('/auth/register/', {'email': 'guest@example.com', 'password': 'S3cure-pass!'},
+                                    format='json', HTTP_X_DEVICE_TOKEN=device_token('device-1'))
+        self.assertEqual(response.status_code, 201)
+        self.user = User.objects.get(email='guest@example.com')
+
+    def verify(self, **headers):
+        code = otp_store.issue(self.user, 'verify')
+        return self.client.post('/auth/verify-otp/', {'email': self.user.email, 'code': code},
+                                format='json', **headers)
+
+    def test_registering_alone_merges_nothing(self):
+        self.row.refresh_from_db()
+        self.assertIsNone(self.row.user_id)
+
+    def test_a_bare_header_cannot_claim_a_devices_rows(self):
+        self.assertEqual(self.verify(HTTP_X_DEVICE_ID='device-1').status_code, 200)
+        self.row.refresh_from_db()
+        self.assertIsNone(self.row.user_id)
+
+    def test_wrong_code_merges_nothing(self):
+        response = self.client.post('/auth/verify-otp/', {'email': self.user.email, 'code': '000000'},
+                                    format='json', HTTP_X_DEVICE_TOKEN=device_token('device-1'))
+        self.assertEqual(response.status_code, 400)
+        self.row.refresh_from_db()
+        self.assertIsNone(self.row.user_id)
+
+    def test_verifying_with_the_device_token_merges(self):
+        self.assertEqual(self.verify(HTTP_X_DEVICE_TOKEN=device_token('device-1')).status_code, 200)
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.user_id, self.user.pk)
+        self.assertIsNone(self.row.expires_at)
+
+
+@override_settings(QUOTA_ENABLED=False, RATE_LIMIT_ENABLED=False, OPENAI_IMAGE_BACKEND='stub')
+class GuestGenerateTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def generate(self, **headers):
+        buf = io.BytesIO()
+        Image.new('RGB', (64, 64), 'green').save(buf, format='JPEG')
+        buf.name = 'room.jpg'
+        buf.seek(0)
+        return APIClient().post('/api/guest/generate/', {'style_choice': 'modern', 'original_image': buf}, **headers)
+
+    def test_first_generation_issues_a_token_that_is_kept(self):
+        first = self.generate(HTTP_X_DEVICE_ID='chosen-by-client')
+        self.assertEqual(first.status_code, 200, first.content)
+        token = first.json()['device_token']
+        device_id = device_id_from(RequestFactory().get('/', HTTP_X_DEVICE_TOKEN=token))
+        self.assertNotIn(device_id, ('', 'chosen-by-client'))
+
+        second = self.generate(HTTP_X_DEVICE_TOKEN=token)
+        self.assertEqual(second.json()['device_token'], token)
+        self.assertEqual(GuestGeneration.objects.filter(device_id=device_id).count(), 2)
+
+    def test_generate_and_history_return_the_same_url_shape(self):
+        generated = self.generate().json()
+        history = APIClient().get('/api/guest/history/', HTTP_X_DEVICE_TOKEN=generated['device_token']).json()
+        row = history['results'][0]
+        for key in ('input_image_url', 'output_image_url'):
+            self.assertTrue(generated[key].startswith('http://testserver/'), generated[key])
+            self.assertEqual(generated[key], row[key])
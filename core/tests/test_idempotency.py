@@ -0,0 +1,78 @@
+import threading
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.services.guest_generation import device_token
+from core.services.idempotency import (
+    IdempotencyError,
+    IdempotentRequest,
+    guest_owner,
+    has_response,
+    upload_fingerprint,
+)
+
+
+def post(key='key-1', ip='198.51.100.1', **headers):
+    return RequestFactory().post('/', REMOTE_ADDR=ip, HTTP_IDEMPOTENCY_KEY=key, **headers)
+
+
+class IdempotentRequestTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_duplicates_claim_the_key_once(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def begin():
+            barrier.wait()
+            results.append(IdempotentRequest.begin(post(), 'redesign', 1, 'fp'))
+
+        threads = [threading.Thread(target=begin) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sum(idem.claimed for idem in results), 1)
+        self.assertTrue(all(idem.record['fingerprint'] == 'fp' for idem in results))
+
+    def test_retry_replays_the_stored_response(self):
+        first = IdempotentRequest.begin(post(), 'redesign', 1, 'fp')
+        first.save_response(200, {'id': 7})
+        retry = IdempotentRequest.begin(post(), 'redesign', 1, 'fp')
+        self.assertFalse(retry.claimed)
+        self.assertEqual(retry.wait(has_response)['response'], {'status': 200, 'body': {'id': 7}})
+
+    def test_key_reused_for_a_different_request(self):
+        IdempotentRequest.begin(post(), 'redesign', 1, 'fp')
+        with self.assertRaises(IdempotencyError) as ctx:
+            IdempotentRequest.begin(post(), 'redesign', 1, 'other')
+        self.assertEqual(ctx.exception.status_code, 422)
+
+    def test_in_flight_original_answers_409_without_blocking(self):
+        IdempotentRequest.begin(post(), 'redesign', 1, 'fp')
+        retry = IdempotentRequest.begin(post(), 'redesign', 1, 'fp')
+        with override_settings(IDEMPOTENCY_SYNC_WAIT_TIMEOUT=0, IDEMPOTENCY_POLL_INTERVAL=5):
+            with self.assertRaises(IdempotencyError) as ctx:
+                retry.wait(has_response)
+        self.assertEqual((ctx.exception.status_code, ctx.exception.retry_after), (409, 5))
+
+    def test_guests_do_not_share_keys(self):
+        a, b = post(ip='198.51.100.1'), post(ip='198.51.100.2')
+        first = IdempotentRequest.begin(a, 'guest', guest_owner(a), 'fp')
+        first.save_response(200, {'result': 'a'})
+        other = IdempotentRequest.begin(b, 'guest', guest_owner(b), 'fp')
+        self.assertTrue(other.claimed)
+        # Nor do two devices behind one address.
+        c = post(ip='198.51.100.1', HTTP_X_DEVICE_TOKEN=device_token('device-c'))
+        self.assertTrue(IdempotentRequest.begin(c, 'guest', guest_owner(c), 'fp').claimed)
+
+
+class UploadFingerprintTests(SimpleTestCase):
+    def test_covers_the_uploaded_bytes(self):
+        a = SimpleUploadedFile('room.jpg', b'a' * 100)
+        b = SimpleUploadedFile('room.jpg', b'b' * 100)
+        self.assertNotEqual(upload_fingerprint('modern', a), upload_fingerprint('modern', b))
+        self.assertEqual(upload_fingerprint('modern', a), upload_fingerprint('modern', SimpleUploadedFile('x.jpg', b'a' * 100)))
+        self.assertEqual(a.read(), b'a' * 100)
@@ -0,0 +1,34 @@
+import io
+import os
+import tempfile
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from core.services.image_pipeline import prepare_for_edit, preprocess_format
+
+
+class PreprocessFormatTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        Image.new('RGB', (300, 200), 'red').save(self.path, format='JPEG')
+        self.addCleanup(os.remove, self.path)
+
+    @override_settings(IMAGE_PREPROCESS_FORMAT='webp')
+    def test_webp(self):
+        prepared = prepare_for_edit(self.path)
+        self.assertEqual(prepared.content_type, 'image/webp')
+        self.assertEqual(prepared.filename, 'input.webp')
+
+    @override_settings(IMAGE_PREPROCESS_FORMAT='PNG', IMAGE_PREPROCESS_SIZE=64)
+    def test_png(self):
+        prepared = prepare_for_edit(self.path)
+        self.assertEqual(prepared.content_type, 'image/png')
+        with Image.open(io.BytesIO(prepared.content)) as img:
+            self.assertEqual((img.format, img.size), ('PNG', (64, 64)))
+
+    @override_settings(IMAGE_PREPROCESS_FORMAT='JPEG')
+    def test_unsupported_format_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            preprocess_format()
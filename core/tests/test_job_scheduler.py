@@ -0,0 +1,67 @@
+import os
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.settings import _tier_numbers
+from core.models import RoomRedesign, User
+from core.services.redesign_jobs import DatabaseJobBackend
+
+
+class TierSettingTests(SimpleTestCase):
+    def parse(self, value, **kwargs):
+        with mock.patch.dict(os.environ, {'TIERS': value}):
+            return _tier_numbers('TIERS', 'pro:4,free:1', **kwargs)
+
+    def test_parses_pairs_and_skips_blank_items(self):
+        self.assertEqual(self.parse('pro:2, free:1,'), {'pro': 2, 'free': 1})
+        self.assertEqual(self.parse(''), {'pro': 4, 'free': 1})
+
+    def test_malformed_values_are_rejected(self):
+        for value in ('pro', 'pro:x', ':3', 'pro:-1'):
+            with self.assertRaises(ImproperlyConfigured):
+                self.parse(value)
+        with self.assertRaises(ImproperlyConfigured):
+            self.parse('pro:0', minimum=1)
+
+
+@override_settings(REDESIGN_DEPTH_REFRESH_INTERVAL=60, REDESIGN_TIER_MAX_RUNNING={})
+class ClaimTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('worker@example.com', 'pw')
+        self.backend = DatabaseJobBackend()
+
+    def job(self, tier='free', **fields):
+        return RoomRedesign.objects.create(
+            user=self.user, original_image='uploads/originals/room.jpg', style_choice='modern', tier=tier, **fields,
+        )
+
+    def claim(self):
+        with CaptureQueriesContext(connection) as queries:
+            job = self.backend.claim('worker-1')
+        recounts = sum('GROUP BY' in q['sql'] for q in queries.captured_queries)
+        return job, recounts
+
+    def test_depths_are_recounted_once_per_interval(self):
+        first, second = self.job(), self.job()
+        self.assertEqual(self.claim(), (first, 1))
+        self.assertEqual(self.claim(), (second, 0))
+
+    def test_jobs_queued_after_the_snapshot_are_still_claimed(self):
+        self.assertEqual(self.claim(), (None, 1))
+        job = self.job(tier='pro')
+        self.assertEqual(self.claim(), (job, 0))
+
+    def test_tier_limits_use_a_live_count(self):
+        self.claim()
+        self.job(tier='pro', status='processing', started_at=timezone.now())
+        queued_pro, free = self.job(tier='pro'), self.job(tier='free')
+        with override_settings(REDESIGN_TIER_MAX_RUNNING={'pro': 1}):
+            self.assertEqual(self.claim()[0], free)
+        queued_pro.refresh_from_db()
+        self.assertEqual(queued_pro.status, 'pending')
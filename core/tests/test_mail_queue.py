@@ -0,0 +1,101 @@
+import io
+from datetime import timedelta
+from smtplib import SMTPException
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import OutboundEmail
+from core.services.mail_queue import claim_batch, deliver_batch, enqueue_email
+from core.utils import send_otp_email
+
+connections = []
+
+
+class CountingBackend(EmailBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        connections.append(self)
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException('mailbox unavailable')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', MAIL_QUEUE_EAGER=False,
+    MAIL_BATCH_SIZE=2, MAIL_MAX_ATTEMPTS=3, MAIL_RETRY_DELAY=30, OTP_TTL=300,
+)
+class MailQueueTests(TestCase):
+    def drain(self):
+        # What a burst-mode worker does, minus closing the test's database connection.
+        while batch := claim_batch():
+            deliver_batch(batch)
+
+    def make_due(self):
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+
+    @override_settings(EMAIL_BACKEND='core.tests.test_mail_queue.CountingBackend')
+    def test_batches_share_a_connection(self):
+        connections.clear()
+        for i in range(3):
+            enqueue_email(f"user{i}@example.com", 'Hello', 'Body')
+        self.assertEqual(deliver_batch(claim_batch()), 2)
+        self.assertEqual(len(connections), 1)
+        self.drain()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = enqueue_email('user@example.com', 'Hello', 'Body')
+        with override_settings(EMAIL_BACKEND='core.tests.test_mail_queue.FailingBackend'):
+            self.drain()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body), ('pending', 1, 'Body'))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        self.make_due()
+        self.drain()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='core.tests.test_mail_queue.FailingBackend')
+    def test_dead_letter_after_max_attempts_drops_the_body(self):
+        email = enqueue_email('user@example.com', 'Hello', 'Secret body')
+        for _ in range(3):
+            self.make_due()
+            self.drain()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body), ('dead', 3, ''))
+        self.assertEqual(email.last_error, 'mailbox unavailable')
+
+    def test_expired_otp_mail_is_not_sent(self):
+        send_otp_email('user@example.com', '123456')
+        OutboundEmail.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.drain()
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.body), ('dead', ''))
+
+    @override_settings(EMAIL_BACKEND='core.tests.test_mail_queue.FailingBackend', OTP_TTL=60)
+    def test_otp_mail_is_not_retried_past_the_code_ttl(self):
+        send_otp_email('user@example.com', '123456')
+        self.drain()
+        email = OutboundEmail.objects.get()
+        # The next try (30s) would fall inside the 60s TTL, the one after (60s) would not.
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.make_due()
+        self.drain()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body), ('dead', 2, ''))
+
+    def test_purge_dead_emails(self):
+        old = OutboundEmail.objects.create(to='a@example.com', subject='s', body='', status='dead')
+        OutboundEmail.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=8))
+        recent = OutboundEmail.objects.create(to='b@example.com', subject='s', body='', status='dead')
+        pending = enqueue_email('c@example.com', 's', 'b')
+        call_command('purge_dead_emails', stdout=io.StringIO())
+        self.assertEqual(set(OutboundEmail.objects.values_list('pk', flat=True)), {recent.pk, pending.pk})
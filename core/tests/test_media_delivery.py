@@ -0,0 +1,99 @@
+import io
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import GuestGeneration, RoomRedesign, User
+from core.services.guest_generation import device_token
+from core.services.media_delivery import redesign_file_url, signature
+
+
+def png_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), 'purple').save(buf, format='PNG')
+    return buf.getvalue()
+
+
+@override_settings(MEDIA_SIGNED_URLS=True, MEDIA_ACCEL='')
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = User.objects.create_user('owner@example.com', 'pw')
+        self.redesign = RoomRedesign(user=self.owner, style_choice='modern')
+        self.redesign.original_image.save('room.png', ContentFile(png_bytes()), save=False)
+        self.redesign.save()
+        self.url = redesign_file_url(self.redesign, 'original')
+        self.length = len(png_bytes())
+
+    def get(self, url=None, token=None, **headers):
+        client = APIClient()
+        if token:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.get(url or self.url, **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_signed_url_ignores_a_stale_bearer_token(self):
+        response = self.get(token='expired.or.garbage')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), png_bytes())
+
+    def test_etag_round_trip(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range_request(self):
+        response = self.get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 0-9/{self.length}")
+        self.assertEqual(self.body(response), png_bytes()[:10])
+        self.assertEqual(self.get(HTTP_RANGE=f"bytes={self.length}-").status_code, 416)
+
+    def test_tampered_or_expired_signature_is_refused(self):
+        path = urlsplit(self.url).path
+        self.assertEqual(self.get(self.url[:-1] + ('0' if self.url[-1] != '0' else '1')).status_code, 404)
+        other = reverse('redesign-media', kwargs={'key': self.redesign.pk, 'kind': 'result'})
+        self.assertEqual(self.get(other + '?' + urlsplit(self.url).query).status_code, 404)
+        expires = int(time.time()) - 10
+        self.assertEqual(self.get(f"{path}?expires={expires}&sig={signature(path, expires)}").status_code, 404)
+
+    def test_unsigned_requests_need_the_owners_token(self):
+        path = urlsplit(self.url).path
+        self.assertEqual(self.get(path, token=str(AccessToken.for_user(self.owner))).status_code, 200)
+        stranger = User.objects.create_user('stranger@example.com', 'pw')
+        self.assertEqual(self.get(path, token=str(AccessToken.for_user(stranger))).status_code, 404)
+        self.assertEqual(self.get(path, token='garbage').status_code, 404)
+        self.assertEqual(self.get(path).status_code, 404)
+
+    @override_settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_nginx_offload(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f"/protected-media/{self.redesign.original_image.name}")
+        self.assertEqual(response.content, b'')
+
+    def test_guest_media_needs_the_device_token(self):
+        self.redesign.original_image.storage.base.save('uploads/guest/in.png', ContentFile(png_bytes()))
+        GuestGeneration.objects.create(
+            uid='c' * 32, device_id='device-1', style_choice='modern', input_path='uploads/guest/in.png',
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        path = reverse('guest-media', kwargs={'key': 'c' * 32, 'kind': 'input'})
+        self.assertEqual(self.get(path, HTTP_X_DEVICE_TOKEN=device_token('device-1')).status_code, 200)
+        self.assertEqual(self.get(path, HTTP_X_DEVICE_ID='device-1').status_code, 404)
@@ -0,0 +1,40 @@
+import threading
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core import metrics
+
+
+class MetricNamesTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._registered.clear()
+
+    def test_snapshot_lists_counters_and_gauges(self):
+        metrics.incr('a.count', 2)
+        metrics.incr('a.count')
+        metrics.set_gauge('a.gauge', 7)
+        self.assertEqual(metrics.snapshot(), {'a.count': 3, 'a.gauge': 7})
+
+    def test_names_registered_by_other_processes_are_kept(self):
+        metrics.incr('first')
+        # Another process: same shared cache, empty per-process set.
+        metrics._registered.clear()
+        metrics.incr('second')
+        metrics._registered.clear()
+        metrics.incr('first')
+        self.assertEqual(metrics.names(), ['first', 'second'])
+
+    def test_concurrent_registrations_are_not_lost(self):
+        barrier = threading.Barrier(8)
+
+        def register(i):
+            barrier.wait()
+            metrics.set_gauge(f"gauge.{i}", i)
+
+        threads = [threading.Thread(target=register, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(metrics.names(), sorted(f"gauge.{i}" for i in range(8)))
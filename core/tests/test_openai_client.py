@@ -0,0 +1,128 @@
+import asyncio
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase, override_settings
+from openai import APIStatusError, BadRequestError
+
+from core.services import openai_client
+from core.services.openai_client import acall_with_retry, call_with_retry, configure_transport
+
+MODEL = {'id': 'gpt-image-1', 'object': 'model', 'created': 0, 'owned_by': 'openai'}
+
+
+class FakeTime:
+    """Stands in for the module's time: sleeping advances the clock instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def responder(*responses):
+    """An httpx handler answering with responses in turn (the last one repeats)."""
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        status, headers = responses[min(len(requests), len(responses)) - 1]
+        body = MODEL if status == 200 else {'error': {'message': f"status {status}"}}
+        return httpx.Response(status, json=body, headers=headers)
+
+    return handle, requests
+
+
+@override_settings(
+    OPENAI_API_KEY='test-key', OPENAI_BASE_URL='http://openai.test/v1', OPENAI_MAX_RETRIES=3,
+    OPENAI_DEADLINE=60, OPENAI_REQUEST_TIMEOUT=30, OPENAI_BACKOFF_BASE=1.0, OPENAI_BACKOFF_MAX=20,
+)
+class CallWithRetryTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeTime()
+        patcher = mock.patch.object(openai_client, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(configure_transport)
+
+    def call(self, *responses):
+        handle, requests = responder(*responses)
+        configure_transport(httpx.MockTransport(handle))
+        try:
+            return call_with_retry(lambda timeout: openai_client.get_client().models.retrieve('gpt-image-1', timeout=timeout))
+        finally:
+            self.requests = requests
+
+    def test_retries_429_and_5xx_until_success(self):
+        model = self.call((503, {}), (429, {}), (200, {}))
+        self.assertEqual(model.id, 'gpt-image-1')
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        # Full jitter under base * 2^attempt.
+        self.assertLessEqual(self.clock.sleeps[0], 1.0)
+        self.assertLessEqual(self.clock.sleeps[1], 2.0)
+
+    def test_honours_retry_after(self):
+        self.call((429, {'retry-after': '7'}), (503, {'retry-after-ms': '1500'}), (200, {}))
+        self.assertEqual(self.clock.sleeps, [7.0, 1.5])
+
+    def test_gives_up_at_the_max_retries(self):
+        with self.assertRaises(APIStatusError) as ctx:
+            self.call((500, {'retry-after': '1'}))
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertEqual(len(self.requests), 4)
+
+    @override_settings(OPENAI_DEADLINE=10)
+    def test_gives_up_rather_than_sleep_past_the_deadline(self):
+        with self.assertRaises(APIStatusError):
+            self.call((503, {'retry-after': '4'}))
+        # 4s + 4s fit in the 10s deadline; a third wait would not.
+        self.assertEqual(self.clock.sleeps, [4.0, 4.0])
+        self.assertEqual(len(self.requests), 3)
+
+    def test_attempts_get_the_remaining_time_as_timeout(self):
+        timeouts = []
+
+        def fn(timeout):
+            timeouts.append(timeout)
+            self.clock.now += 45
+            if len(timeouts) == 1:
+                raise openai_client.APIConnectionError(request=httpx.Request('GET', 'http://openai.test'))
+            return 'ok'
+
+        with mock.patch.object(openai_client.random, 'uniform', return_value=0.0):
+            self.assertEqual(call_with_retry(fn), 'ok')
+        self.assertEqual(timeouts, [30, 15])
+
+    def test_does_not_retry_a_400(self):
+        with self.assertRaises(BadRequestError):
+            self.call((400, {}), (200, {}))
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+
+@override_settings(OPENAI_API_KEY='test-key', OPENAI_BASE_URL='http://openai.test/v1', OPENAI_MAX_RETRIES=3,
+                   OPENAI_DEADLINE=60)
+class AsyncCallWithRetryTests(SimpleTestCase):
+    def test_retries_then_succeeds(self):
+        handle, requests = responder((502, {'retry-after': '2'}), (200, {}))
+        configure_transport(async_transport=httpx.MockTransport(handle))
+        self.addCleanup(configure_transport)
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+
+        async def run():
+            return await acall_with_retry(
+                lambda timeout: openai_client.get_async_client().models.retrieve('gpt-image-1', timeout=timeout)
+            )
+
+        with mock.patch.object(openai_client.asyncio, 'sleep', fake_sleep):
+            model = asyncio.run(run())
+        self.assertEqual((model.id, len(requests), sleeps), ('gpt-image-1', 2, [2.0]))
@@ -0,0 +1,40 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import User
+from core.services import otp_store
+from core.utils import generate_otp
+
+
+class GenerateOTPTests(SimpleTestCase):
+    def test_six_digits_from_a_csprng(self):
+        with mock.patch('core.utils.secrets.randbelow', return_value=42) as randbelow:
+            self.assertEqual(generate_otp(), '000042')
+        randbelow.assert_called_once_with(1_000_000)
+
+
+@override_settings(OTP_CACHE_ENABLED=True, RATE_LIMIT_ENABLED=False, MAIL_QUEUE_EAGER=False)
+class ResetPasswordTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reset@example.com', 'old-pass')
+
+    def reset(self, code):
+        return APIClient().post('/auth/reset-password/', {
+            'email': 'reset@example.com', 'code': code, 'new_password': 'N3w-password!',
+        }, format='json')
+
+    def test_resets_the_password(self):
+        response = self.reset(otp_store.issue(self.user, 'reset'))
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-password!'))
+
+    def test_code_of_a_deleted_user_is_a_400_not_a_500(self):
+        code = otp_store.issue(self.user, 'reset')
+        self.user.delete()
+        response = self.reset(code)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'detail': 'Invalid or expired code'})
@@ -0,0 +1,140 @@
+import io
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import RoomRedesign, User
+from core.services import quotas
+from core.services.guest_generation import device_token
+from core.services.idempotency import IdempotentRequest, guest_owner, upload_fingerprint
+from core.services.redesign_jobs import _fail
+
+QUOTAS = dict(
+    QUOTA_ENABLED=True, RATE_LIMIT_ENABLED=False,
+    QUOTA_GUEST_DAILY=2, QUOTA_GUEST_MONTHLY=10, QUOTA_GUEST_IP_DAILY=3, QUOTA_GUEST_IP_MONTHLY=10,
+    QUOTA_FREE_DAILY=2, QUOTA_FREE_MONTHLY=10,
+)
+
+
+def guest_request(ip='198.51.100.1', **extra):
+    return RequestFactory().post('/', REMOTE_ADDR=ip, **extra)
+
+
+def photo() -> SimpleUploadedFile:
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), 'blue').save(buf, format='JPEG')
+    return SimpleUploadedFile('room.jpg', buf.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(**QUOTAS)
+class GenerationQuotaTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def values(self, quota, now=None):
+        return [cache.get(c.key, 0) for c in quota.counters(now) if c.limit]
+
+    def test_consume_takes_nothing_when_any_counter_is_over(self):
+        first = quotas.GenerationQuota.for_request(guest_request(HTTP_X_DEVICE_TOKEN=device_token('device-a')))
+        first.consume(2)
+        # Same IP, new device: the IP has one unit left of 3, so 2 more must fail as a whole.
+        other = quotas.GenerationQuota.for_request(guest_request(HTTP_X_DEVICE_TOKEN=device_token('device-b')))
+        with self.assertRaises(quotas.QuotaExceeded) as ctx:
+            other.consume(2)
+        self.assertEqual((ctx.exception.tier, ctx.exception.period, ctx.exception.limit), ('guest', 'day', 3))
+        self.assertEqual(self.values(other), [2, 2, 0, 0])
+        other.consume(1)
+        self.assertEqual(self.values(other), [3, 3, 1, 1])
+
+    def test_refund_gives_back_consumed_units_only(self):
+        quota = quotas.GenerationQuota.for_request(guest_request())
+        quota.consume(2)
+        quota.refund(5)
+        self.assertEqual(self.values(quota), [0, 0])
+        quota.refund()
+        self.assertEqual(self.values(quota), [0, 0])
+
+    def test_refund_after_the_window_rolled_over(self):
+        charged = datetime(2026, 3, 31, 23, 59, tzinfo=dt_timezone.utc)
+        quota = quotas.GenerationQuota.for_request(guest_request())
+        with mock.patch('django.utils.timezone.now', return_value=charged):
+            quota.consume()
+        later = charged + timedelta(minutes=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            quotas.GenerationQuota.for_request(guest_request()).consume()
+            quota.refund()
+            # The new day's and month's counters keep the unit charged after the rollover.
+            self.assertEqual(self.values(quota, later), [1, 1])
+        self.assertEqual(self.values(quota, charged), [1, 1])
+
+    def test_forwarded_for_does_not_change_the_guest_ip(self):
+        a = quotas.GenerationQuota.for_request(guest_request(HTTP_X_FORWARDED_FOR='203.0.113.1'))
+        b = quotas.GenerationQuota.for_request(guest_request(HTTP_X_FORWARDED_FOR='203.0.113.2'))
+        self.assertEqual(a.subjects, b.subjects)
+
+
+@override_settings(**QUOTAS)
+class QuotaViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quotas.GenerationQuota.for_request(guest_request()).consume(3)
+
+    def generate(self, **extra):
+        return APIClient(REMOTE_ADDR='198.51.100.1').post(
+            '/api/guest/generate/', {'style_choice': 'modern', 'original_image': photo()}, format='multipart', **extra,
+        )
+
+    def test_new_idempotency_key_does_not_skip_the_check(self):
+        with mock.patch('core.uploads.read_bounded_files') as read_upload:
+            response = self.generate(HTTP_IDEMPOTENCY_KEY='fresh-key')
+        self.assertEqual(response.status_code, 429)
+        read_upload.assert_not_called()
+
+    def test_retry_of_a_stored_request_is_replayed(self):
+        request = guest_request()
+        idem = IdempotentRequest.begin(
+            RequestFactory().post('/', REMOTE_ADDR='198.51.100.1', HTTP_IDEMPOTENCY_KEY='done'),
+            'guest', guest_owner(request), upload_fingerprint('modern', photo()),
+        )
+        idem.save_response(200, {'uid': 'abc'})
+        response = self.generate(HTTP_IDEMPOTENCY_KEY='done')
+        self.assertEqual((response.status_code, response.data), (200, {'uid': 'abc'}))
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+
+@override_settings(**QUOTAS)
+class JobRefundTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_job_failing_in_the_worker_is_refunded(self):
+        user = User.objects.create_user(email='w@x.com', password='x')
+        quota = quotas.GenerationQuota([f"user:{user.pk}"], tier='free', user_id=user.pk)
+        quota.consume()
+        redesign = RoomRedesign.objects.create(
+            user=user, original_image='uploads/originals/x.jpg', style_choice='modern', prompt='p', tier='free',
+        )
+        _fail(redesign, 'boom')
+        self.assertEqual([cache.get(c.key, 0) for c in quota.counters()], [0, 0])
+
+
+@override_settings(**QUOTAS)
+class BatchRefundTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='batch@example.com', password='x')
+
+    def test_failed_batch_creation_is_refunded(self):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(self.user)
+        with mock.patch('core.views_ai.create_batch', side_effect=OSError('disk full')):
+            response = client.post('/api/redesign-room/batch/', {
+                'original_image': photo(), 'styles': 'modern,luxury',
+            }, format='multipart')
+        self.assertEqual(response.status_code, 500)
+        quota = quotas.GenerationQuota([f"user:{self.user.pk}"], tier='free', user_id=self.user.pk)
+        self.assertEqual([cache.get(c.key, 0) for c in quota.counters()], [0, 0])
@@ -0,0 +1,34 @@
+import io
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import ResultCacheEntry
+from core.services import result_cache
+
+
+@override_settings(RESULT_CACHE_ENABLED=True, RESULT_CACHE_MAX_ENTRIES=1, RESULT_CACHE_TTL=3600)
+class EvictionTests(TestCase):
+    def store(self, n):
+        for i in range(n):
+            result_cache.store(f"key-{i}", 'modern', f"uploads/results/{i}.webp")
+
+    @override_settings(RESULT_CACHE_EVICT_EVERY=0)
+    def test_stores_do_not_sweep_when_sampling_is_off(self):
+        self.store(3)
+        self.assertEqual(ResultCacheEntry.objects.count(), 3)
+
+    @override_settings(RESULT_CACHE_EVICT_EVERY=1)
+    def test_sampled_sweep_keeps_the_most_recent(self):
+        self.store(3)
+        self.assertEqual(list(ResultCacheEntry.objects.values_list('key', flat=True)), ['key-2'])
+
+    @override_settings(RESULT_CACHE_EVICT_EVERY=0, RESULT_CACHE_MAX_ENTRIES=10)
+    def test_command_drops_expired_entries(self):
+        self.store(2)
+        ResultCacheEntry.objects.filter(key='key-0').update(created_at=timezone.now() - timedelta(hours=2))
+        out = io.StringIO()
+        call_command('evict_result_cache', stdout=out)
+        self.assertIn('Evicted 1', out.getvalue())
+        self.assertEqual(list(ResultCacheEntry.objects.values_list('key', flat=True)), ['key-1'])
@@ -0,0 +1,54 @@
+import io
+from unittest import mock
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from core.services import result_encoding
+from core.services.result_encoding import encode_result, negotiate, result_format
+
+
+def png_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(buf, format='PNG')
+    return buf.getvalue()
+
+
+@override_settings(RESULT_AVIF_ENABLED=False, RESULT_KEEP_PNG_MASTER=False)
+class ResultFormatTests(SimpleTestCase):
+    @override_settings(RESULT_IMAGE_FORMAT='JPEG')
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            result_format()
+        with self.assertRaises(ImproperlyConfigured):
+            encode_result(png_bytes())
+
+    @override_settings(RESULT_IMAGE_FORMAT='AVIF')
+    def test_avif_falls_back_to_webp_without_an_encoder(self):
+        with mock.patch.object(result_encoding, 'avif_supported', return_value=False):
+            encoded = encode_result(png_bytes())
+        self.assertEqual(encoded.extension, 'webp')
+        with Image.open(io.BytesIO(encoded.content)) as img:
+            self.assertEqual(img.format, 'WEBP')
+
+    @override_settings(RESULT_IMAGE_FORMAT='PNG')
+    def test_bytes_match_the_extension(self):
+        encoded = encode_result(png_bytes())
+        with Image.open(io.BytesIO(encoded.content)) as img:
+            self.assertEqual((encoded.extension, img.format), ('png', 'PNG'))
+
+
+class NegotiateTests(SimpleTestCase):
+    formats = ['webp', 'avif', 'png']
+
+    def test_preference(self):
+        self.assertEqual(negotiate('image/avif,image/webp,*/*', self.formats), 'avif')
+        self.assertEqual(negotiate('image/webp', self.formats), 'webp')
+        self.assertEqual(negotiate('image/png', self.formats), 'png')
+        self.assertEqual(negotiate('', self.formats), 'webp')
+
+    def test_zero_quality_refuses_a_type(self):
+        for q in ('q=0', 'q=0.0', 'q=0.000', ' Q=0 '):
+            self.assertEqual(negotiate(f"image/avif;{q},image/webp", self.formats), 'webp', q)
+        self.assertEqual(negotiate('image/avif;q=0.5,image/webp', self.formats), 'avif')
+        self.assertEqual(negotiate('IMAGE/AVIF;q=bogus,image/webp', self.formats), 'webp')
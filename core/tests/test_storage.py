@@ -0,0 +1,98 @@
+import io
+import shutil
+import tempfile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from core.models import RoomRedesign, StoredBlob, User
+
+
+class RefcountTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('owner@example.com', 'pw')
+
+    def redesign(self, content=b'same bytes'):
+        redesign = RoomRedesign(user=self.user, style_choice='modern')
+        redesign.original_image.save('room.jpg', ContentFile(content), save=False)
+        redesign.save()
+        return redesign
+
+    def refcount(self, name):
+        return StoredBlob.objects.filter(name=name).values_list('refcount', flat=True).first()
+
+    def test_shared_blob_is_stored_once_and_deleted_with_its_last_reference(self):
+        first, second = self.redesign(), self.redesign()
+        name = first.original_image.name
+        self.assertEqual(second.original_image.name, name)
+        self.assertEqual(self.refcount(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.refcount(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomRedesign.objects.get(pk=second.pk).delete()
+        self.assertIsNone(self.refcount(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_replacing_a_file_releases_the_old_one(self):
+        self.user.profile_image.save('a.png', ContentFile(b'old'))
+        old = self.user.profile_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile_image.save('b.png', ContentFile(b'new'))
+        new = self.user.profile_image.name
+        self.assertNotEqual(new, old)
+        self.assertIsNone(self.refcount(old))
+        self.assertFalse(default_storage.exists(old))
+        self.assertEqual(self.refcount(new), 1)
+
+    def test_queryset_delete_releases(self):
+        name = self.redesign().original_image.name
+        self.redesign()
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomRedesign.objects.filter(user=self.user).delete()
+        self.assertIsNone(self.refcount(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_queryset_update_of_a_media_field_is_refused(self):
+        redesign = self.redesign()
+        with self.assertRaises(TypeError):
+            RoomRedesign.objects.filter(pk=redesign.pk).update(original_image='cas/elsewhere.jpg')
+        self.assertEqual(RoomRedesign.objects.filter(pk=redesign.pk).update(prompt='x'), 1)
+
+    def test_rolled_back_delete_keeps_the_file(self):
+        redesign = self.redesign()
+        name = redesign.original_image.name
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    redesign.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.refcount(name), 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_file_of_a_rolled_back_save_is_purged_as_an_orphan(self):
+        try:
+            with transaction.atomic():
+                name = self.redesign(b'rolled back').original_image.name
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertTrue(default_storage.exists(name))
+        kept = self.redesign().original_image.name
+
+        call_command('purge_orphan_blobs', min_age=0, stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(kept))
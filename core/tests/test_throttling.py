@@ -0,0 +1,98 @@
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core import throttling
+
+LOGIN_LIMITS = {'login': {'ip': '3/m', 'account': '2/m'}}
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_allows_up_to_the_limit_within_a_window(self):
+        start = 60 * 1000
+        results = [throttling.hit('k', 3, 60, now=start + i) for i in range(4)]
+        self.assertEqual(results[:3], [None, None, None])
+        self.assertAlmostEqual(results[3], 57)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        start = 60 * 1000
+        for i in range(10):
+            self.assertIsNone(throttling.hit('k', 10, 60, now=start + i))
+        # Halfway through the next window, half of the previous 10 still count.
+        mid = start + 60 + 30
+        self.assertEqual([throttling.hit('k', 10, 60, now=mid) for _ in range(5)], [None] * 5)
+        # Rejected: wait until one more of the previous requests slides out.
+        self.assertAlmostEqual(throttling.hit('k', 10, 60, now=mid), 6)
+        self.assertIsNone(throttling.hit('k', 10, 60, now=mid + 6))
+
+    def test_rejected_requests_are_not_counted(self):
+        start = 60 * 1000
+        for _ in range(5):
+            throttling.hit('k', 2, 60, now=start)
+        self.assertEqual(cache.get(f"ratelimit:k:{1000}"), 2)
+
+    def test_counter_evicted_between_add_and_incr(self):
+        def evict(key, *args, **kwargs):
+            cache.delete(key)
+            raise ValueError(f"Key '{key}' not found")
+
+        with mock.patch.object(cache, 'incr', side_effect=evict):
+            self.assertIsNone(throttling.hit('k', 2, 60, now=60 * 1000))
+        self.assertEqual(cache.get(f"ratelimit:k:{1000}"), 1)
+
+
+class RateParsingTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/15m'), (10, 900))
+        self.assertEqual(throttling.parse_rate('3/hour'), (3, 3600))
+        self.assertEqual(throttling.parse_rate('30/min'), (30, 60))
+
+    def test_invalid_policies_are_rejected(self):
+        for policies in ({'login': {'ip': 'lots'}}, {'login': {'ip': '0/m'}}, {'login': {'email': '1/m'}}):
+            with self.subTest(policies=policies), self.assertRaises(ImproperlyConfigured):
+                throttling.validate_rates(policies)
+        throttling.validate_rates({'login': {'ip': '5/m', 'account': ''}})
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LOGIN_LIMITS)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, email, **extra):
+        return APIClient().post('/auth/login/', {'email': email, 'password': 'wrong'}, format='json', **extra)
+
+    def test_account_limit_answers_429_with_retry_after(self):
+        self.assertEqual([self.login('a@x.com').status_code for _ in range(2)], [400, 400])
+        with self.assertNumQueries(0), mock.patch('django.contrib.auth.hashers.check_password') as check:
+            response = self.login('A@x.com ')
+        check.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+
+    def test_ip_limit_covers_other_accounts(self):
+        codes = [self.login(f"user{i}@x.com").status_code for i in range(4)]
+        self.assertEqual(codes, [400, 400, 400, 429])
+
+    def test_forwarded_for_cannot_rotate_the_ip(self):
+        codes = [
+            self.login(f"user{i}@x.com", HTTP_X_FORWARDED_FOR=f"203.0.113.{i}").status_code
+            for i in range(4)
+        ]
+        self.assertEqual(codes[-1], 429)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1})
+    def test_trusted_proxy_hop_is_used(self):
+        from rest_framework.settings import api_settings
+        api_settings.reload()
+        self.addCleanup(api_settings.reload)
+        codes = [
+            self.login(f"user{i}@x.com", HTTP_X_FORWARDED_FOR=f"203.0.113.{i}").status_code
+            for i in range(4)
+        ]
+        self.assertEqual(codes, [400, 400, 400, 400])
@@ -0,0 +1,81 @@
+import io
+import os
+import shutil
+import tempfile
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import GuestGeneration
+from core.uploads import HEADER_PROBE_BYTES, _file_size
+
+
+def upload(content, name='room.jpg'):
+    buf = io.BytesIO(content)
+    buf.name = name
+    return buf
+
+
+def jpeg(size=(64, 64)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+class FileSizeTests(SimpleTestCase):
+    def test_sizes_below_a_megabyte_fall_back_to_smaller_units(self):
+        self.assertEqual(_file_size(20 * 1024 * 1024), '20 MB')
+        self.assertEqual(_file_size(1536 * 1024), '1.5 MB')
+        self.assertEqual(_file_size(500 * 1024), '500 KB')
+        self.assertEqual(_file_size(1000), '1000 bytes')
+
+
+@override_settings(QUOTA_ENABLED=False, RATE_LIMIT_ENABLED=False, OPENAI_IMAGE_BACKEND='stub')
+class BoundedUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def generate(self, content):
+        return APIClient().post('/api/guest/generate/', {'style_choice': 'modern', 'original_image': upload(content)})
+
+    def test_a_valid_image_is_accepted(self):
+        response = self.generate(jpeg())
+        self.assertEqual(response.status_code, 200, response.content)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1000)
+    def test_oversize_content_length_is_refused_before_parsing(self):
+        response = self.generate(os.urandom(100 * 1024))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['detail'], 'Request body is larger than 1000 bytes')
+        self.assertFalse(GuestGeneration.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=512)
+    def test_oversize_file_is_refused_while_streaming(self):
+        # Small enough to pass the Content-Length check, which allows for the form overhead.
+        response = self.generate(jpeg((256, 256)) + os.urandom(2048))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['detail'], 'Image is larger than 512 bytes')
+
+    @override_settings(IMAGE_UPLOAD_MAX_DIMENSION=32)
+    def test_oversize_dimensions_are_refused(self):
+        response = self.generate(jpeg((64, 16)))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('32px per side', response.json()['detail'])
+        self.assertFalse(GuestGeneration.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_oversize_pixel_count_is_refused(self):
+        response = self.generate(jpeg((40, 40)))
+        self.assertEqual(response.status_code, 413)
+
+    def test_a_body_that_is_not_an_image_is_refused(self):
+        response = self.generate(b'\0' * (HEADER_PROBE_BYTES + 1024))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('valid image', response.json()['detail'])
+        self.assertFalse(GuestGeneration.objects.exists())
@@ -0,0 +1,136 @@
+"""Brute-force protection for the auth and guest endpoints.
+
+Views name a policy with throttle_scope; RATE_LIMITS gives each policy a rate per client IP
+and per account (the email in the request body), e.g. '10/15m'. Both are sliding windows
+approximated from two fixed-window counters in the Django cache: the current window's count,
+incremented atomically with cache.incr, plus the previous window's count weighted by how much
+of it still overlaps the sliding window. Only allowed requests are counted.
+
+DRF runs throttles in APIView.initial, so rejected requests get 429 with Retry-After before
+the handler hashes a password or queries the database. Client IPs come from utils.client_ip,
+which only trusts X-Forwarded-For as far as REST_FRAMEWORK['NUM_PROXIES'] says.
+"""
+import hashlib
+import math
+import re
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+from .utils import client_ip
+
+KINDS = ('ip', 'account')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])')
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """'10/15m' -> (10 requests, 900 seconds). Units are s, m, h or d ('min', 'hour' work too)."""
+    match = RATE_RE.match(rate.strip())
+    if match is None:
+        raise ValueError(f"Invalid rate {rate!r}")
+    count, multiplier, unit = match.groups()
+    limit, window = int(count), int(multiplier or 1) * UNITS[unit]
+    if not limit or not window:
+        raise ValueError(f"Invalid rate {rate!r}")
+    return limit, window
+
+
+def validate_rates(policies: dict):
+    for scope, rates in policies.items():
+        for kind, rate in rates.items():
+            if kind not in KINDS:
+                raise ImproperlyConfigured(f"RATE_LIMITS[{scope!r}]: unknown kind {kind!r}, use {' or '.join(KINDS)}")
+            if rate:
+                try:
+                    parse_rate(rate)
+                except ValueError as e:
+                    raise ImproperlyConfigured(f"RATE_LIMITS[{scope!r}][{kind!r}]: {e}, e.g. '10/15m'") from e
+
+
+def _incr(key: str, timeout: int) -> int:
+    # Kept for two windows: the one it counts and the next, where it is the previous window.
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        if cache.add(key, 1, timeout=timeout):
+            return 1
+        return cache.incr(key)
+
+
+def hit(key: str, limit: int, window: int, now: float | None = None) -> float | None:
+    """Count a request against key. Returns None if it is allowed, else the seconds until it
+    would be.
+    """
+    now = time.time() if now is None else now
+    current = int(now // window)
+    elapsed = now - current * window
+    current_key = f"ratelimit:{key}:{current}"
+    count = _incr(current_key, 2 * window + 1)
+    previous = cache.get(f"ratelimit:{key}:{current - 1}", 0)
+    overlap = (window - elapsed) / window
+    if previous * overlap + count <= limit:
+        return None
+    try:
+        cache.decr(current_key)
+    except ValueError:
+        pass
+    count -= 1
+    if count + 1 > limit or not previous:
+        return window - elapsed
+    # Wait for enough of the previous window to slide out.
+    return max(1.0, (window - elapsed) - (limit - count - 1) * window / previous)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Applies the view's RATE_LIMITS[throttle_scope][kind] rate, if there is one."""
+    kind = None
+
+    def subject(self, request) -> str | None:
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = getattr(view, 'throttle_scope', None)
+        rate = settings.RATE_LIMITS.get(scope, {}).get(self.kind) if settings.RATE_LIMIT_ENABLED else None
+        if not rate:
+            return True
+        subject = self.subject(request)
+        if not subject:
+            return True
+        limit, window = parse_rate(rate)
+        self.retry_after = hit(f"{scope}:{self.kind}:{subject}", limit, window)
+        if self.retry_after is None:
+            return True
+        metrics.incr(f"ratelimit.{scope}.{self.kind}.rejected")
+        return False
+
+    def wait(self):
+        return math.ceil(self.retry_after) if self.retry_after is not None else None
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = 'ip'
+
+    def subject(self, request):
+        return client_ip(request)
+
+
+class AccountRateThrottle(SlidingWindowThrottle):
+    """Keyed on the email the request is about, whoever sends it (JSON or form bodies only)."""
+    kind = 'account'
+
+    def subject(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+# Fail at startup on a malformed policy rather than on the first request that uses it.
+validate_rates(settings.RATE_LIMITS)
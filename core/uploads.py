@@ -0,0 +1,116 @@
+"""Streaming, size-bounded handling of image uploads.
+
+The generation endpoints swap Django's default upload handlers (memory buffer, then temp file)
+for BoundedImageUploadHandler, which always streams to a temporary file and checks the upload
+while it arrives: the request's Content-Length before any of the body is read, the image
+header (format and pixel dimensions) from the first chunks, and the running byte count.
+Rejected uploads stop the parse without reading the rest of the body.
+
+The resulting TemporaryUploadedFile is moved, not copied, into MEDIA_ROOT by the storage.
+"""
+import io
+import warnings
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+
+# JPEG headers can sit behind large EXIF/ICC segments; give up identifying the image after this.
+HEADER_PROBE_BYTES = 256 * 1024
+# Room for the multipart boundaries and the small form fields next to the image.
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload rejected.'
+    default_code = 'upload_rejected'
+
+    def __init__(self, detail=None, status_code=None):
+        super().__init__(detail)
+        if status_code is not None:
+            self.status_code = status_code
+
+
+def _file_size(n: int) -> str:
+    for unit, scale in (('MB', 1024 * 1024), ('KB', 1024)):
+        if n >= scale:
+            return f"{round(n / scale, 1):g} {unit}"
+    return f"{n} bytes"
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = bytearray()
+        self.header_checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self._reject(f"Image is larger than {_file_size(settings.IMAGE_UPLOAD_MAX_BYTES)}",
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if not self.header_checked:
+            self.header += raw_data
+            self._check_header()
+        return super().receive_data_chunk(raw_data, start)
+
+    def _check_header(self):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                # Image.open only parses the header; pixel data is never decoded here.
+                with Image.open(io.BytesIO(self.header)) as image:
+                    width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = None
+        except Exception:
+            # Not enough of the header yet, or not an image at all.
+            if len(self.header) < HEADER_PROBE_BYTES:
+                return
+            self._reject('Upload a valid image. The file you uploaded was either not an image or a corrupted image.',
+                         status.HTTP_400_BAD_REQUEST)
+        self.header_checked = True
+        self.header = bytearray()
+        max_side = settings.IMAGE_UPLOAD_MAX_DIMENSION
+        if width is None or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS or max(width, height) > max_side:
+            self._reject(f"Image dimensions exceed {settings.IMAGE_UPLOAD_MAX_PIXELS} pixels "
+                         f"or {max_side}px per side", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def _reject(self, detail: str, status_code: int):
+        self.request.upload_rejection = UploadRejected(detail, status_code)
+        metrics.incr('uploads.rejected')
+        # Abort the parse without draining the remaining body.
+        raise StopUpload(connection_reset=True)
+
+
+def read_bounded_files(request):
+    """Parse a multipart image upload through BoundedImageUploadHandler and return request.FILES.
+    Works with DRF and plain Django requests; raises UploadRejected.
+    """
+    django_request = getattr(request, '_request', request)
+    content_length = int(django_request.META.get('CONTENT_LENGTH') or 0)
+    if content_length > settings.IMAGE_UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES:
+        metrics.incr('uploads.rejected')
+        raise UploadRejected(f"Request body is larger than {_file_size(settings.IMAGE_UPLOAD_MAX_BYTES)}")
+    django_request.upload_handlers = [BoundedImageUploadHandler(django_request)]
+    files = request.FILES
+    rejection = getattr(django_request, 'upload_rejection', None)
+    if rejection is not None:
+        raise rejection
+    return files
+
+
+class BoundedImageUploadMixin:
+    """For DRF views taking a multipart image: parse it through BoundedImageUploadHandler
+    right after authentication and permission checks, before the handler runs.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method == 'POST':
+            read_bounded_files(request)
@@ -1,13 +1,51 @@
-import random
-from django.core.mail import EmailMessage
+import secrets
+from datetime import timedelta
 from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .services.mail_queue import enqueue_email
 
 
 def generate_otp() -> str:
-    return f"{random.randint(0, 999999):06d}"
+    return f"{secrets.randbelow(1_000_000):06d}"
 
 
 def send_otp_email(email: str, code: str, subject: str = 'Your OTP Code'):
-    body = f"Your OTP code is: {code}. It expires in 5 minutes."
-    msg = EmailMessage(subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL, to=[email])
-    msg.send(fail_silently=True)
+    # Queued; run_mail_worker sends it.
+    body = f"Your OTP code is: {code}. It expires in {settings.OTP_TTL // 60} minutes."
+    # No use delivering a code that has already expired.
+    enqueue_email(email, subject, body, expires_at=timezone.now() + timedelta(seconds=settings.OTP_TTL))
+
+
+def client_ip(request) -> str:
+    """REMOTE_ADDR, or with REST_FRAMEWORK['NUM_PROXIES'] reverse proxies in front, the client
+    address they recorded in X-Forwarded-For. Works on DRF and plain Django requests.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+def retry_after_response(detail: str, retry_after: int, status_code: int = 503) -> Response:
+    return Response(
+        {'detail': detail, 'retry_after': retry_after},
+        status=status_code,
+        headers={'Retry-After': str(retry_after)},
+    )
+
+
+def quota_exceeded_response(exc) -> Response:
+    response = retry_after_response(exc.detail, exc.retry_after, status_code=429)
+    response.data.update({
+        'tier': exc.tier,
+        'period': exc.period,
+        'limit': exc.limit,
+        'reset_at': exc.reset_at.isoformat(),
+    })
+    return response
+
+
+def idempotency_error_response(exc) -> Response:
+    if exc.retry_after:
+        return retry_after_response(exc.detail, exc.retry_after, status_code=exc.status_code)
+    return Response({'detail': exc.detail}, status=exc.status_code)
@@ -2,64 +2,242 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
-from drf_spectacular.utils import extend_schema, OpenApiResponse
-from django.db import transaction
-from django.core.files.base import ContentFile
-import base64
-from .serializers import RoomRedesignRequestSerializer, RoomRedesignResponseSerializer
-from .models import RoomRedesign
-from .services.openai_service import generate_redesign_image
+from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
+from .serializers import (
+    RedesignBatchRequestSerializer,
+    RedesignBatchResponseSerializer,
+    RoomRedesignRequestSerializer,
+    RoomRedesignResponseSerializer,
+    redesign_response_context,
+)
+from .models import RedesignBatch, RoomRedesign
+from .pagination import KeysetPagination
+from .services.openai_service import build_redesign_prompt
+from .services.circuit_breaker import BackendUnavailable
+from .services.idempotency import IdempotencyError, IdempotentRequest, has_job_or_response, upload_fingerprint
+from .services.batches import create_batch, enqueue_batch
+from .services.quotas import GenerationQuotaMixin, QuotaExceeded
+from .services.redesign_jobs import enqueue_redesign
+from .subscriptions.entitlements import user_tier
+from .uploads import BoundedImageUploadMixin
+from .utils import idempotency_error_response, retry_after_response
 
 
-class RedesignRoomView(APIView):
+INCLUDE_BASE64_PARAM = OpenApiParameter(
+    'include_base64', bool, description='Inline the result image as base64 in addition to its URL.',
+)
+IDEMPOTENCY_KEY_PARAM = OpenApiParameter(
+    'Idempotency-Key', str, location=OpenApiParameter.HEADER,
+    description='Retries with the same key return the original job instead of starting a new one.',
+)
+REPLAYED_HEADERS = {'Idempotent-Replayed': 'true'}
+QUOTA_RESPONSE = OpenApiResponse(description='Generation quota used up; see Retry-After and reset_at')
+
+
+def redesign_response(request, redesign, headers=None) -> Response:
+    data = RoomRedesignResponseSerializer(redesign, context=redesign_response_context(request)).data
+    if redesign.status == 'completed':
+        code = status.HTTP_200_OK
+    elif redesign.status == 'failed':
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    else:
+        code = status.HTTP_202_ACCEPTED
+    return Response(data, status=code, headers=headers)
+
+
+def charge_quota(request, idem=None, cost: int = 1):
+    # Retries attached to an earlier request never get here, so each generation is charged once.
+    if request.quota is None:
+        return
+    try:
+        request.quota.consume(cost)
+    except QuotaExceeded:
+        if idem:
+            idem.release()
+        raise
+
+
+def refund_quota(request, cost: int | None = None):
+    if request.quota is not None:
+        request.quota.refund(cost)
+
+
+class RedesignRoomView(BoundedImageUploadMixin, GenerationQuotaMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    idempotency_scope = 'redesign'
 
     @extend_schema(
         request={
             'multipart/form-data': RoomRedesignRequestSerializer,
         },
         responses={
-            200: RoomRedesignResponseSerializer,
+            202: RoomRedesignResponseSerializer,
             400: OpenApiResponse(description='Validation error'),
-            500: OpenApiResponse(description='Generation failed'),
+            413: OpenApiResponse(description='Image too large (bytes or pixel dimensions)'),
+            409: OpenApiResponse(description='A request with this Idempotency-Key is still starting'),
+            422: OpenApiResponse(description='Idempotency-Key reused for a different request'),
+            429: QUOTA_RESPONSE,
+            503: OpenApiResponse(description='Generation backend unavailable; see Retry-After'),
         },
+        parameters=[INCLUDE_BASE64_PARAM, IDEMPOTENCY_KEY_PARAM],
         tags=['AI'],
     )
     def post(self, request):
         serializer = RoomRedesignRequestSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        with transaction.atomic():
-            redesign = serializer.save(user=request.user)
-            prompt = f"Redesign this interior room photo into a {redesign.style_choice} style. High realism, photorealistic, maintain room layout, professional interior design render."
-            redesign.prompt = prompt
-            redesign.status = 'processing'
-            redesign.save()
+        style_choice = serializer.validated_data['style_choice']
+        try:
+            idem = IdempotentRequest.begin(
+                request, 'redesign', request.user.pk,
+                upload_fingerprint(style_choice, serializer.validated_data['original_image']),
+            )
+            if idem and not idem.claimed:
+                return self.replay(request, idem)
+        except IdempotencyError as exc:
+            return idempotency_error_response(exc)
+
+        charge_quota(request, idem)
+        redesign = serializer.save(
+            user_id=request.user.pk,
+            prompt=build_redesign_prompt(style_choice),
+            status='pending',
+            tier=user_tier(request.user.pk),
+        )
+        if idem:
+            # Retries from now on attach to this job.
+            idem.attach_job(redesign.id)
         try:
-            result = generate_redesign_image(prompt=prompt, image_path=redesign.original_image.path)
-            if result.get('image_bytes'):
-                redesign.result_base64 = result['image_bytes']
-                decoded = base64.b64decode(result['image_bytes'])
-                image_file = ContentFile(decoded, name=f"redesign_{redesign.id}.png")
-                redesign.result_image.save(image_file.name, image_file, save=False)
-            redesign.status = 'completed'
-            redesign.save()
-            return Response(RoomRedesignResponseSerializer(redesign).data, status=status.HTTP_200_OK)
-        except Exception as e:
-            redesign.status = 'failed'
-            redesign.save()
-            return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            enqueue_redesign(redesign)
+        except BackendUnavailable as exc:
+            if idem:
+                idem.release()
+            return retry_after_response(exc.detail, exc.retry_after)
+        response = redesign_response(request, redesign)
+        if idem and response.status_code != status.HTTP_202_ACCEPTED:
+            idem.save_response(response.status_code, response.data)
+        return response
+
+    def replay(self, request, idem):
+        record = idem.wait(has_job_or_response)
+        if record['response']:
+            stored = record['response']
+            return Response(stored['body'], status=stored['status'], headers=REPLAYED_HEADERS)
+        redesign = RoomRedesign.objects.filter(user_id=request.user.pk, pk=record['job_id']).first()
+        if redesign is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return redesign_response(request, redesign, headers=REPLAYED_HEADERS)
+
+
+class RedesignJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        responses={
+            200: RoomRedesignResponseSerializer,
+            404: OpenApiResponse(description='Not found'),
+        },
+        parameters=[INCLUDE_BASE64_PARAM],
+        tags=['AI'],
+    )
+    def get(self, request, pk):
+        redesign = RoomRedesign.objects.filter(user_id=request.user.pk, pk=pk).first()
+        if redesign is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        data = RoomRedesignResponseSerializer(redesign, context=redesign_response_context(request)).data
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class RedesignBatchView(BoundedImageUploadMixin, GenerationQuotaMixin, APIView):
+    """One photo, several styles: the original is stored and preprocessed once and each
+    style becomes a RoomRedesign in the batch (and in history).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @extend_schema(
+        request={
+            'multipart/form-data': RedesignBatchRequestSerializer,
+        },
+        responses={
+            202: RedesignBatchResponseSerializer,
+            400: OpenApiResponse(description='Validation error'),
+            413: OpenApiResponse(description='Image too large (bytes or pixel dimensions)'),
+            429: QUOTA_RESPONSE,
+        },
+        parameters=[INCLUDE_BASE64_PARAM],
+        tags=['AI'],
+    )
+    def post(self, request):
+        serializer = RedesignBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # One generation per style.
+        cost = len(serializer.validated_data['styles'])
+        charge_quota(request, cost=cost)
+        try:
+            batch, _, redesigns = create_batch(
+                request.user,
+                serializer.validated_data['original_image'],
+                serializer.validated_data['styles'],
+                tier=user_tier(request.user.pk),
+            )
+        except Exception:
+            refund_quota(request, cost)
+            raise
+        # Members the backend refused are recorded as failed on their rows (and refunded).
+        enqueue_batch(redesigns)
+        context = {**redesign_response_context(request), 'items': redesigns}
+        data = RedesignBatchResponseSerializer(batch, context=context).data
+        done = all(r.status in ('completed', 'failed') for r in redesigns)
+        return Response(data, status=status.HTTP_200_OK if done else status.HTTP_202_ACCEPTED)
+
+
+class RedesignBatchDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        responses={
+            200: RedesignBatchResponseSerializer,
+            404: OpenApiResponse(description='Not found'),
+        },
+        parameters=[INCLUDE_BASE64_PARAM],
+        tags=['AI'],
+    )
+    def get(self, request, pk):
+        batch = RedesignBatch.objects.filter(user_id=request.user.pk, pk=pk).first()
+        if batch is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        data = RedesignBatchResponseSerializer(batch, context=redesign_response_context(request)).data
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class HistoryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     @extend_schema(
-        responses={200: OpenApiResponse(response=RoomRedesignResponseSerializer(many=True))},
+        responses={200: RoomRedesignResponseSerializer(many=True)},
+        parameters=[
+            INCLUDE_BASE64_PARAM,
+            OpenApiParameter('fields', str, description='Comma-separated subset of fields to return.'),
+            OpenApiParameter('cursor', str, description='Opaque cursor from the previous page.'),
+            OpenApiParameter('limit', int, description='Page size (max 100).'),
+        ],
         tags=['AI'],
     )
     def get(self, request):
-        items = RoomRedesign.objects.filter(user=request.user).order_by('-created_at')
-        data = RoomRedesignResponseSerializer(items, many=True).data
-        return Response(data, status=status.HTTP_200_OK)
+        context = redesign_response_context(request)
+        unknown = set(context['fields']) - set(RoomRedesignResponseSerializer.Meta.fields)
+        if unknown:
+            return Response({'fields': [f"Unknown field: {name}" for name in sorted(unknown)]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer_fields = RoomRedesignResponseSerializer(context=context).fields
+        # id and created_at are always needed for the cursor.
+        columns = RoomRedesignResponseSerializer.columns_for(serializer_fields) | {'id', 'created_at'}
+        items = RoomRedesign.objects.filter(user_id=request.user.pk).only(*columns)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(items, request, view=self)
+        data = RoomRedesignResponseSerializer(page, many=True, context=context).data
+        return paginator.get_paginated_response(data)
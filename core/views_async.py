@@ -0,0 +1,297 @@
+"""Native async versions of the AI endpoints, used when AI_ASYNC_VIEWS is on (run under ASGI).
+
+They await the image backend on the event loop instead of holding a thread per request;
+ORM, Pillow and file storage work is pushed to threads.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .models import RoomRedesign
+from .serializers import (
+    RedesignBatchRequestSerializer,
+    RedesignBatchResponseSerializer,
+    RoomRedesignRequestSerializer,
+    RoomRedesignResponseSerializer,
+    redesign_response_context,
+)
+from .uploads import UploadRejected, read_bounded_files
+from .services.batches import arun_batch, create_batch
+from .services.circuit_breaker import BackendUnavailable
+from .services.generation import agenerate_result_bytes, lookup_generation
+from .services.idempotency import (
+    IdempotencyError,
+    IdempotentRequest,
+    guest_owner,
+    has_job_or_response,
+    has_response,
+    upload_fingerprint,
+)
+from .services.guest_generation import complete_guest_job, device_id_from, save_guest_input, validate_guest_form
+from .services.image_pipeline import prepare_for_edit
+from .services.job_events import stream as job_event_stream
+from .services.openai_service import build_redesign_prompt
+from .services.quotas import QuotaExceeded, check_request_quota
+from .services.redesign_jobs import arun_redesign_job
+from .subscriptions.entitlements import user_tier
+from .throttling import IPRateThrottle
+
+
+def _authenticate(request):
+    # Same authenticator chain as the DRF views.
+    for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _unavailable(exc: BackendUnavailable) -> JsonResponse:
+    response = JsonResponse({'detail': exc.detail, 'retry_after': exc.retry_after}, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _quota_exceeded(exc: QuotaExceeded) -> JsonResponse:
+    response = JsonResponse({
+        'detail': exc.detail,
+        'retry_after': exc.retry_after,
+        'tier': exc.tier,
+        'period': exc.period,
+        'limit': exc.limit,
+        'reset_at': exc.reset_at.isoformat(),
+    }, status=429)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _throttled(wait: int) -> JsonResponse:
+    response = JsonResponse({'detail': f"Request was throttled. Expected available in {wait} seconds."}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def _idempotency_error(exc: IdempotencyError) -> JsonResponse:
+    if not exc.retry_after:
+        return JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    response = JsonResponse({'detail': exc.detail, 'retry_after': exc.retry_after}, status=exc.status_code)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _replayed(body, status: int) -> JsonResponse:
+    response = JsonResponse(body, status=status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _redesign_status_code(redesign) -> int:
+    return {'completed': 200, 'failed': 500}.get(redesign.status, 202)
+
+
+class AsyncAPIView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token-authenticated API, exempt from CSRF like DRF's APIView.
+        view.csrf_exempt = True
+        return view
+
+    async def get_user(self, request):
+        try:
+            return await sync_to_async(_authenticate)(request)
+        except exceptions.AuthenticationFailed:
+            return None
+
+
+class AsyncRedesignRoomView(AsyncAPIView):
+    async def post(self, request):
+        user = await self.get_user(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        try:
+            quota = await sync_to_async(check_request_quota)(request, user, 'redesign')
+        except QuotaExceeded as exc:
+            return _quota_exceeded(exc)
+        # Multipart parsing and image validation are blocking; keep them off the loop.
+        try:
+            files = await sync_to_async(read_bounded_files)(request)
+        except UploadRejected as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        serializer = RoomRedesignRequestSerializer(data={**request.POST.dict(), **files.dict()})
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=400)
+        style_choice = serializer.validated_data['style_choice']
+        context = redesign_response_context(request)
+        try:
+            idem = await sync_to_async(IdempotentRequest.begin)(
+                request, 'redesign', user.pk,
+                upload_fingerprint(style_choice, serializer.validated_data['original_image']),
+            )
+            if idem and not idem.claimed:
+                record = await idem.await_ready(has_job_or_response)
+                if record['response']:
+                    return _replayed(record['response']['body'], record['response']['status'])
+                redesign = await RoomRedesign.objects.filter(user_id=user.pk, pk=record['job_id']).afirst()
+                if redesign is None:
+                    return JsonResponse({'detail': 'Not found'}, status=404)
+                data = await sync_to_async(lambda: RoomRedesignResponseSerializer(redesign, context=context).data)()
+                return _replayed(data, _redesign_status_code(redesign))
+        except IdempotencyError as exc:
+            return _idempotency_error(exc)
+        if quota:
+            try:
+                await sync_to_async(quota.consume)()
+            except QuotaExceeded as exc:
+                if idem:
+                    await sync_to_async(idem.release)()
+                return _quota_exceeded(exc)
+
+        redesign = RoomRedesign(
+            user_id=user.pk,
+            original_image=serializer.validated_data['original_image'],
+            style_choice=style_choice,
+            prompt=build_redesign_prompt(style_choice),
+            tier=await sync_to_async(user_tier)(user.pk),
+            status='processing',
+            attempts=1,
+            started_at=timezone.now(),
+        )
+        await redesign.asave()
+        if idem:
+            await sync_to_async(idem.attach_job)(redesign.id)
+        try:
+            await arun_redesign_job(redesign)
+        except BackendUnavailable as exc:
+            # The failed job was refunded (redesign_jobs._fail).
+            if idem:
+                await sync_to_async(idem.release)()
+            return _unavailable(exc)
+        data = await sync_to_async(lambda: RoomRedesignResponseSerializer(redesign, context=context).data)()
+        status = _redesign_status_code(redesign)
+        if idem:
+            await sync_to_async(idem.save_response)(status, data)
+        return JsonResponse(data, status=status)
+
+
+class AsyncRedesignBatchView(AsyncAPIView):
+    async def post(self, request):
+        user = await self.get_user(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        try:
+            quota = await sync_to_async(check_request_quota)(request, user)
+        except QuotaExceeded as exc:
+            return _quota_exceeded(exc)
+        try:
+            files = await sync_to_async(read_bounded_files)(request)
+        except UploadRejected as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        data = request.POST.copy()
+        data.update(files)
+        serializer = RedesignBatchRequestSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=400)
+        if quota:
+            try:
+                await sync_to_async(quota.consume)(len(serializer.validated_data['styles']))
+            except QuotaExceeded as exc:
+                return _quota_exceeded(exc)
+        try:
+            batch, prepared, redesigns = await sync_to_async(create_batch)(
+                user,
+                serializer.validated_data['original_image'],
+                serializer.validated_data['styles'],
+                tier=await sync_to_async(user_tier)(user.pk),
+                status='processing',
+                attempts=1,
+                started_at=timezone.now(),
+            )
+        except Exception:
+            if quota:
+                await sync_to_async(quota.refund)()
+            raise
+        # Every member reuses the in-memory preprocessed image.
+        await arun_batch(redesigns, prepared)
+        context = {**redesign_response_context(request), 'items': redesigns}
+        data = await sync_to_async(lambda: RedesignBatchResponseSerializer(batch, context=context).data)()
+        return JsonResponse(data, status=200)
+
+
+class AsyncGuestGenerateView(AsyncAPIView):
+    throttle_scope = 'guest_generate'
+
+    async def post(self, request):
+        throttle = IPRateThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, self):
+            return _throttled(throttle.wait())
+        try:
+            quota = await sync_to_async(check_request_quota)(request, None, 'guest')
+        except QuotaExceeded as exc:
+            return _quota_exceeded(exc)
+        try:
+            files = await sync_to_async(read_bounded_files)(request)
+        except UploadRejected as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        style_choice = request.POST.get('style_choice')
+        image = files.get('original_image')
+        errors = validate_guest_form(style_choice, image)
+        if errors:
+            return JsonResponse(errors, status=400)
+        try:
+            idem = await sync_to_async(IdempotentRequest.begin)(
+                request, 'guest', guest_owner(request), upload_fingerprint(style_choice, image),
+            )
+            if idem and not idem.claimed:
+                stored = (await idem.await_ready(has_response))['response']
+                return _replayed(stored['body'], stored['status'])
+        except IdempotencyError as exc:
+            return _idempotency_error(exc)
+        if quota:
+            try:
+                await sync_to_async(quota.consume)()
+            except QuotaExceeded as exc:
+                if idem:
+                    await sync_to_async(idem.release)()
+                return _quota_exceeded(exc)
+
+        job = await sync_to_async(save_guest_input)(image, style_choice, device_id_from(request))
+        try:
+            prepared = await asyncio.to_thread(prepare_for_edit, job.input_abs_path)
+            generation = await sync_to_async(lookup_generation)(prepared, style_choice)
+            image_bytes = await agenerate_result_bytes(generation, build_redesign_prompt(style_choice))
+            payload = await sync_to_async(complete_guest_job)(job, image_bytes, generation, request)
+        except Exception as exc:
+            if idem:
+                await sync_to_async(idem.release)()
+            if quota:
+                await sync_to_async(quota.refund)()
+            if isinstance(exc, BackendUnavailable):
+                return _unavailable(exc)
+            return JsonResponse({'detail': str(exc)}, status=500)
+        if idem:
+            await sync_to_async(idem.save_response)(200, payload)
+        return JsonResponse(payload, status=200)
+
+
+class RedesignEventsView(AsyncAPIView):
+    """Server-Sent Events stream of a redesign job's status (serve under ASGI)."""
+
+    async def get(self, request, pk):
+        user = await self.get_user(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        redesign = await RoomRedesign.objects.filter(user_id=user.pk, pk=pk).only(
+            'id', 'status', 'result_image', 'result_formats', 'error',
+        ).afirst()
+        if redesign is None:
+            return JsonResponse({'detail': 'Not found'}, status=404)
+        response = StreamingHttpResponse(job_event_stream(redesign), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -1,8 +1,3 @@
-from datetime import timedelta
-import os
-import uuid
-import base64
-from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework import status, serializers, permissions
 from rest_framework.response import Response
@@ -10,10 +5,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.conf import settings
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
-from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, inline_serializer
 
 from .serializers import (
     RegisterSerializer,
@@ -24,13 +16,39 @@ from .serializers import (
     UserSerializer,
     ChangePasswordSerializer,
     UpdateProfileSerializer,
+    GuestGenerationSerializer,
 )
-from .models import OTP, RoomRedesign
-from .utils import send_otp_email, generate_otp
-from .services.openai_service import generate_redesign_image
+from .models import RoomRedesign
+from .utils import send_otp_email, idempotency_error_response, retry_after_response
+from .throttling import AccountRateThrottle, IPRateThrottle
+from .uploads import BoundedImageUploadMixin
+from .views_ai import IDEMPOTENCY_KEY_PARAM, QUOTA_RESPONSE, REPLAYED_HEADERS, charge_quota, refund_quota
+from .services import otp_store
+from .services.circuit_breaker import BackendUnavailable
+from .services.idempotency import IdempotencyError, IdempotentRequest, guest_owner, has_response, upload_fingerprint
+from .services.generation import generate_result_bytes, prepare_generation
+from .services.quotas import GenerationQuotaMixin
+from .pagination import KeysetPagination
+from .services.guest_generation import (
+    DEVICE_HEADER,
+    complete_guest_job,
+    device_id_from,
+    guest_history,
+    merge_guest_history,
+    save_guest_input,
+    validate_guest_form,
+)
+from .services.openai_service import build_redesign_prompt
 
 User = get_user_model()
 
+DEVICE_ID_PARAM = OpenApiParameter(
+    DEVICE_HEADER, str, location=OpenApiParameter.HEADER,
+    description='Device token from a guest generate response; keys guest history until the guest '
+                'verifies an account.',
+)
+THROTTLED_RESPONSE = OpenApiResponse(description='Too many attempts; see Retry-After')
+
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -47,13 +65,7 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            code = generate_otp()
-            OTP.objects.create(
-                user=user,
-                code=code,
-                purpose='verify',
-                expires_at=timezone.now() + timedelta(minutes=5)
-            )
+            code = otp_store.issue(user, 'verify')
             send_otp_email(user.email, code, subject='Verify your email')
             return Response({'message': 'Registration successful. OTP sent to email.'}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -61,14 +73,17 @@ class RegisterView(APIView):
 
 class VerifyOTPView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPRateThrottle, AccountRateThrottle]
+    throttle_scope = 'verify_otp'
 
     @extend_schema(
         request=VerifyOTPSerializer,
         responses={
             200: OpenApiResponse(description='Email verified successfully'),
             400: OpenApiResponse(description='Invalid or expired code'),
-            404: OpenApiResponse(description='User not found'),
+            429: THROTTLED_RESPONSE,
         },
+        parameters=[DEVICE_ID_PARAM],
         tags=['Auth'],
     )
     def post(self, request):
@@ -77,26 +92,26 @@ class VerifyOTPView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         email = serializer.validated_data['email']
         code = serializer.validated_data['code']
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-        otp = OTP.objects.filter(user=user, code=code, purpose='verify', is_used=False).order_by('-created_at').first()
-        if not otp or not otp.is_valid():
+        # Unknown emails get the same answer as wrong codes.
+        user_id = otp_store.consume(email, code, 'verify')
+        if user_id is None:
             return Response({'detail': 'Invalid or expired code'}, status=status.HTTP_400_BAD_REQUEST)
-        otp.is_used = True
-        otp.save()
+        # Only now is the account proven to be the guest's; the device token proves the rows are.
+        merge_guest_history(user_id, device_id_from(request))
         return Response({'message': 'Email verified successfully'}, status=status.HTTP_200_OK)
 
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPRateThrottle, AccountRateThrottle]
+    throttle_scope = 'login'
 
     @extend_schema(
         request=LoginSerializer,
         responses={
             200: OpenApiResponse(description='Returns access and refresh tokens with user data'),
             400: OpenApiResponse(description='Invalid credentials'),
+            429: THROTTLED_RESPONSE,
         },
         tags=['Auth'],
     )
@@ -116,10 +131,15 @@ class LoginView(APIView):
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPRateThrottle, AccountRateThrottle]
+    throttle_scope = 'forgot_password'
 
     @extend_schema(
         request=ForgotPasswordSerializer,
-        responses={200: OpenApiResponse(description='OTP sent if email exists')},
+        responses={
+            200: OpenApiResponse(description='OTP sent if email exists'),
+            429: THROTTLED_RESPONSE,
+        },
         tags=['Auth'],
     )
     def post(self, request):
@@ -131,25 +151,22 @@ class ForgotPasswordView(APIView):
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             return Response({'message': 'If the email exists, an OTP has been sent.'}, status=status.HTTP_200_OK)
-        code = generate_otp()
-        OTP.objects.create(
-            user=user,
-            code=code,
-            purpose='reset',
-            expires_at=timezone.now() + timedelta(minutes=5)
-        )
+        code = otp_store.issue(user, 'reset')
         send_otp_email(email, code, subject='Password reset code')
         return Response({'message': 'If the email exists, an OTP has been sent.'}, status=status.HTTP_200_OK)
 
 
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPRateThrottle, AccountRateThrottle]
+    throttle_scope = 'reset_password'
 
     @extend_schema(
         request=ResetPasswordSerializer,
         responses={
             200: OpenApiResponse(description='Password reset successful'),
             400: OpenApiResponse(description='Invalid email or code'),
+            429: THROTTLED_RESPONSE,
         },
         tags=['Auth'],
     )
@@ -160,17 +177,13 @@ class ResetPasswordView(APIView):
         email = serializer.validated_data['email']
         code = serializer.validated_data['code']
         new_password = serializer.validated_data['new_password']
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return Response({'detail': 'Invalid email or code'}, status=status.HTTP_400_BAD_REQUEST)
-        otp = OTP.objects.filter(user=user, code=code, purpose='reset', is_used=False).order_by('-created_at').first()
-        if not otp or not otp.is_valid():
+        user_id = otp_store.consume(email, code, 'reset')
+        # A cached code can outlive its user (deleted after it was issued).
+        user = User.objects.filter(pk=user_id).first() if user_id is not None else None
+        if user is None:
             return Response({'detail': 'Invalid or expired code'}, status=status.HTTP_400_BAD_REQUEST)
         user.set_password(new_password)
         user.save()
-        otp.is_used = True
-        otp.save()
         return Response({'message': 'Password reset successful'}, status=status.HTTP_200_OK)
 
 
@@ -218,9 +231,12 @@ class UpdateProfileView(APIView):
 
 
 
-class GuestGenerateView(APIView):
+class GuestGenerateView(BoundedImageUploadMixin, GenerationQuotaMixin, APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [IPRateThrottle]
+    throttle_scope = 'guest_generate'
     parser_classes = [MultiPartParser, FormParser]
+    idempotency_scope = 'guest'
 
     @extend_schema(
         request={
@@ -236,53 +252,67 @@ class GuestGenerateView(APIView):
         responses={
             200: OpenApiResponse(description='Generation completed'),
             400: OpenApiResponse(description='Validation error'),
+            409: OpenApiResponse(description='A request with this Idempotency-Key is still in progress'),
+            413: OpenApiResponse(description='Image too large (bytes or pixel dimensions)'),
+            422: OpenApiResponse(description='Idempotency-Key reused for a different request'),
+            429: QUOTA_RESPONSE,
             500: OpenApiResponse(description='Generation failed'),
+            503: OpenApiResponse(description='Generation backend unavailable; see Retry-After'),
         },
+        parameters=[IDEMPOTENCY_KEY_PARAM, DEVICE_ID_PARAM],
         tags=['AI'],
     )
     def post(self, request):
         style_choice = request.data.get('style_choice')
         image = request.FILES.get('original_image')
-        if not style_choice:
-            return Response({'style_choice': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
-        if style_choice not in [c[0] for c in RoomRedesign.STYLE_CHOICES]:
-            return Response({'style_choice': ['Invalid choice.']}, status=status.HTTP_400_BAD_REQUEST)
-        if not image:
-            return Response({'original_image': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
-
-        uid = uuid.uuid4().hex
-        in_name = f"guest_{uid}_{image.name}"
-        in_path = os.path.join('uploads', 'guest', 'inputs', in_name)
-        # Save input image to MEDIA_ROOT
-        input_rel_path = default_storage.save(in_path, image)
-        input_abs_path = os.path.join(settings.MEDIA_ROOT, input_rel_path)
-
-        prompt = f"Redesign this interior room photo into a {style_choice} style. High realism, photorealistic, maintain room layout, professional interior design render."
-
+        errors = validate_guest_form(style_choice, image)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            idem = IdempotentRequest.begin(request, 'guest', guest_owner(request), upload_fingerprint(style_choice, image))
+            if idem and not idem.claimed:
+                # Wait for the original to finish and replay its response.
+                stored = idem.wait(has_response)['response']
+                return Response(stored['body'], status=stored['status'], headers=REPLAYED_HEADERS)
+        except IdempotencyError as exc:
+            return idempotency_error_response(exc)
+
+        charge_quota(request, idem)
+        job = save_guest_input(image, style_choice, device_id_from(request))
         try:
-            result = generate_redesign_image(prompt=prompt, image_path=input_abs_path)
-            output_rel_url = None
-            if result.get('image_bytes'):
-                decoded = base64.b64decode(result['image_bytes'])
-                out_name = f"guest_{uid}.png"
-                out_rel_path = os.path.join('uploads', 'guest', 'outputs', out_name)
-                default_storage.save(out_rel_path, ContentFile(decoded, name=out_name))
-                output_rel_url = f"{settings.MEDIA_URL}{out_rel_path}"
-
-            payload = {
-                'id': uid,
-                'input_image_url': f"{settings.MEDIA_URL}{input_rel_path}",
-                'output_image_url': output_rel_url,
-                'style': style_choice,
-                'created_at': timezone.now().isoformat(),
-                'status': 'completed' if output_rel_url else 'processing',
-            }
-            return Response(payload, status=status.HTTP_200_OK)
+            generation = prepare_generation(job.input_abs_path, style_choice)
+            image_bytes = generate_result_bytes(generation, build_redesign_prompt(style_choice))
+            payload = complete_guest_job(job, image_bytes, generation, request)
+        except BackendUnavailable as exc:
+            if idem:
+                idem.release()
+            refund_quota(request)
+            return retry_after_response(exc.detail, exc.retry_after)
         except Exception as e:
+            if idem:
+                idem.release()
+            refund_quota(request)
             return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if idem:
+            idem.save_response(status.HTTP_200_OK, payload)
+        return Response(payload, status=status.HTTP_200_OK)
 
 class GuestHistoryView(APIView):
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+
+    @extend_schema(
+        responses={200: GuestGenerationSerializer(many=True)},
+        parameters=[
+            DEVICE_ID_PARAM,
+            OpenApiParameter('cursor', str, description='Opaque cursor from the previous page.'),
+            OpenApiParameter('limit', int, description='Page size (max 100).'),
+        ],
+        tags=['AI'],
+    )
     def get(self, request):
-        # Optional: return server-side history keyed by device-id
-        return Response([], status=status.HTTP_200_OK)
\ No newline at end of file
+        items = guest_history(request.user, device_id_from(request))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(items, request, view=self)
+        data = GuestGenerationSerializer(page, many=True, context={'request': request}).data
+        return paginator.get_paginated_response(data)
\ No newline at end of file
@@ -0,0 +1,128 @@
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework import permissions
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+
+from . import metrics
+from .models import GuestGeneration, RoomRedesign
+from .services.guest_generation import device_id_from
+from .services.media_delivery import has_valid_signature, resolve_name, serve
+
+SIGNATURE_PARAMS = [
+    OpenApiParameter('expires', int, description='Expiry (unix time) of a signed URL.'),
+    OpenApiParameter('sig', str, description='HMAC signature of a signed URL.'),
+]
+MEDIA_RESPONSES = {
+    200: OpenApiResponse(description='The image (or an X-Accel-Redirect/X-Sendfile hand-off)'),
+    206: OpenApiResponse(description='Partial content for a Range request'),
+    304: OpenApiResponse(description='Not modified'),
+    404: OpenApiResponse(description='Not found or not yours'),
+}
+
+
+class MediaContentNegotiation(BaseContentNegotiation):
+    """Accept here asks for an image format, which the views negotiate themselves; DRF's
+    renderer negotiation would answer 406 to e.g. 'image/png'.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def bearer_user(request):
+    """The user of a valid Authorization header, else None. The media views skip DRF's
+    authentication (a signed URL is the credential, and a stale token sent alongside one must
+    not turn it into a 401); unsigned requests are checked here, a bad token counting as none.
+    """
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authenticator().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+def vary_on_format(response, formats):
+    # Result files are negotiated on Accept; caches must key on it.
+    if formats is not None:
+        patch_vary_headers(response, ['Accept'])
+        if response.status_code in (200, 206):
+            metrics.incr(f"media.served_{response['Content-Type'].split('/')[-1]}")
+    return response
+
+
+class RedesignMediaView(APIView):
+    """Original or result image (or a rendition) of a redesign: for its owner, or anyone
+    holding a signed URL.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    content_negotiation_class = MediaContentNegotiation
+    KINDS = ('original', 'result')
+
+    @extend_schema(responses=MEDIA_RESPONSES, parameters=SIGNATURE_PARAMS, tags=['Media'])
+    def get(self, request, key, kind, size=None):
+        if kind not in self.KINDS:
+            return HttpResponse(status=404)
+        redesigns = RoomRedesign.objects.filter(pk=key)
+        if not has_valid_signature(request):
+            user = bearer_user(request)
+            if user is None:
+                return HttpResponse(status=404)
+            redesigns = redesigns.filter(user_id=user.pk)
+        redesign = redesigns.only('id', f"{kind}_image", 'result_formats').first()
+        field_file = getattr(redesign, f"{kind}_image", None)
+        if not field_file:
+            return HttpResponse(status=404)
+        formats = redesign.result_formats if kind == 'result' else None
+        name = resolve_name(field_file.name, field_file.storage, size, formats, request)
+        if name is None:
+            return HttpResponse(status=404)
+        return vary_on_format(serve(request, name, field_file.storage), formats)
+
+
+class GuestMediaView(APIView):
+    """Input or output image of a guest generation: for the device (X-Device-Token) that made it,
+    the user it was merged into, or anyone holding a signed URL.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    content_negotiation_class = MediaContentNegotiation
+    KINDS = ('input', 'output')
+
+    @extend_schema(responses=MEDIA_RESPONSES, parameters=SIGNATURE_PARAMS, tags=['Media'])
+    def get(self, request, key, kind, size=None):
+        if kind not in self.KINDS:
+            return HttpResponse(status=404)
+        generation = GuestGeneration.objects.filter(uid=key).first()
+        if generation is None or not self.has_access(request, generation):
+            return HttpResponse(status=404)
+        name = getattr(generation, f"{kind}_path")
+        if not name:
+            return HttpResponse(status=404)
+        formats = generation.output_formats if kind == 'output' else None
+        name = resolve_name(name, default_storage, size, formats, request)
+        if name is None:
+            return HttpResponse(status=404)
+        return vary_on_format(serve(request, name, default_storage), formats)
+
+    def has_access(self, request, generation) -> bool:
+        if has_valid_signature(request):
+            return True
+        if generation.user_id is not None:
+            user = bearer_user(request)
+            return user is not None and user.pk == generation.user_id
+        device_id = device_id_from(request)
+        return (bool(device_id) and device_id == generation.device_id
+                and generation.expires_at is not None and generation.expires_at > timezone.now())
@@ -0,0 +1,17 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from drf_spectacular.utils import extend_schema, OpenApiResponse
+
+from . import metrics
+
+
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(
+        responses={200: OpenApiResponse(description='Counters and gauges keyed by metric name')},
+        tags=['Ops'],
+    )
+    def get(self, request):
+        return Response(metrics.snapshot(), status=status.HTTP_200_OK)